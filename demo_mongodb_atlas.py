@@ -15,6 +15,12 @@ import json
 import warnings
 warnings.filterwarnings('ignore')
 
+from scripts.fluxo_comportamento import gerar_documentos_comportamento
+from scripts.carga_mongodb import carregar_documentos
+from scripts.features_comportamento import materializar_features, obter_features
+from scripts.eventos_buckets import COLECAO_BUCKETS, gravar_comportamento, registrar_evento
+from scripts.consultas_analiticas import resumo_produtos, resumo_usuarios
+
 # Configurações de visualização
 plt.style.use('default')
 sns.set_palette("husl")
@@ -157,61 +163,37 @@ def configurar_dados_completos(db):
         }
     ]
     
-    produtos_collection.insert_many(produtos_exemplo)
+    carregar_documentos(produtos_collection, produtos_exemplo, verbose=False)
     print(f"✅ {len(produtos_exemplo)} produtos inseridos")
     
     # Coleção: usuarios_comportamento
     comportamento_collection = db['usuarios_comportamento']
     comportamento_collection.delete_many({})
     
-    comportamento_exemplo = []
-    for i in range(1, 51):  # 50 usuários
-        usuario_id = f"U{i:03d}"
-        eventos = []
-        
-        # Gerar eventos aleatórios
-        num_eventos = random.randint(5, 30)
-        
-        for j in range(num_eventos):
-            tipos_evento = ["page_view", "click", "add_to_cart", "search", "view_product"]
-            tipo = random.choice(tipos_evento)
-            
-            evento = {
-                "tipo": tipo,
-                "timestamp": datetime.now() - timedelta(days=random.randint(0, 30)),
-                "tempo_pagina": random.randint(10, 180),
-                "sessao_id": f"S{i:03d}_{j}"
-            }
-            
-            if tipo in ["page_view", "click", "add_to_cart", "view_product"]:
-                evento["produto_id"] = random.choice(["P001", "P002", "P003", "P004", "P005"])
-            
-            if tipo == "search":
-                evento["termo"] = random.choice(["smartphone", "notebook", "tablet", "eletrônicos", "apple", "samsung"])
-            
-            eventos.append(evento)
-        
-        comportamento = {
-            "usuario_id": usuario_id,
-            "sessao_id": f"S{i:03d}",
-            "timestamp": datetime.now(),
-            "eventos": eventos,
-            "pagina_atual": f"/produto/P{random.randint(1,5):03d}",
-            "referrer": random.choice(["https://google.com/search", "https://facebook.com", "https://instagram.com", "direct"]),
-            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "localizacao": {
-                "pais": "Brasil",
-                "estado": random.choice(["São Paulo", "Rio de Janeiro", "Minas Gerais", "Bahia", "Paraná"]),
-                "cidade": random.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Salvador", "Curitiba"])
-            },
-            "dispositivo": random.choice(["desktop", "mobile", "tablet"]),
-            "navegador": random.choice(["Chrome", "Firefox", "Safari", "Edge"])
-        }
-        
-        comportamento_exemplo.append(comportamento)
-    
-    comportamento_collection.insert_many(comportamento_exemplo)
-    print(f"✅ {len(comportamento_exemplo)} registros de comportamento inseridos")
+    # Documentos gerados sob demanda e gravados em lotes limitados
+    comportamento_exemplo = gerar_documentos_comportamento(
+        50,
+        produtos=["P001", "P002", "P003", "P004", "P005"],
+        termos=["smartphone", "notebook", "tablet", "eletrônicos", "apple", "samsung"]
+    )
+    # Sessões em usuarios_comportamento e eventos no bucket corrente de cada usuário
+    total_sessoes, total_eventos = gravar_comportamento(db, comportamento_exemplo, recriar=True)
+    print(f"✅ {total_sessoes} registros de comportamento inseridos")
+    print(f"✅ {total_eventos} eventos gravados em buckets")
+    
+    # Agregar os eventos uma única vez em features_comportamento
+    total_features = materializar_features(db, recriar=True)
+    print(f"✅ Features de comportamento materializadas para {total_features} usuários")
+    
+    # Novo evento: um $push no bucket corrente do usuário, somado às
+    # features pela atualização incremental da análise
+    registrar_evento(db[COLECAO_BUCKETS], "U001", {
+        "tipo": "view_product",
+        "timestamp": datetime.now(),
+        "produto_id": "P001",
+        "tempo_pagina": 45
+    })
+    print("✅ Novo evento registrado no bucket corrente de U001")
     
     # Coleção: usuarios_perfil
     usuarios_collection = db['usuarios_perfil']
@@ -250,7 +232,7 @@ def configurar_dados_completos(db):
         
         usuarios_exemplo.append(usuario)
     
-    usuarios_collection.insert_many(usuarios_exemplo)
+    carregar_documentos(usuarios_collection, usuarios_exemplo, verbose=False)
     print(f"✅ {len(usuarios_exemplo)} perfis de usuários inseridos")
 
 def analisar_produtos(db):
@@ -258,28 +240,13 @@ def analisar_produtos(db):
     print("\n📊 ANÁLISE DE PRODUTOS")
     print("=" * 50)
     
-    produtos_collection = db['produtos']
+    # Totais, categorias e marcas em uma única agregação ($facet)
+    resumo = resumo_produtos(db, marcas=True)
     
-    # Contar produtos
-    total_produtos = produtos_collection.count_documents({})
-    produtos_ativos = produtos_collection.count_documents({"ativo": True})
+    print(f"📦 Total de produtos: {resumo.total}")
+    print(f"✅ Produtos ativos: {resumo.ativos}")
     
-    print(f"📦 Total de produtos: {total_produtos}")
-    print(f"✅ Produtos ativos: {produtos_ativos}")
-    
-    # Análise por categoria
-    pipeline_categoria = [
-        {"$group": {
-            "_id": "$categoria",
-            "total_produtos": {"$sum": 1},
-            "preco_medio": {"$avg": "$preco"},
-            "estoque_total": {"$sum": "$estoque"},
-            "avaliacao_media": {"$avg": "$avaliacao_media"}
-        }},
-        {"$sort": {"total_produtos": -1}}
-    ]
-    
-    resultado_categoria = list(produtos_collection.aggregate(pipeline_categoria))
+    resultado_categoria = resumo.por_categoria
     
     print("\n📈 Análise por Categoria:")
     for cat in resultado_categoria:
@@ -290,17 +257,7 @@ def analisar_produtos(db):
         print(f"    Avaliação média: {cat['avaliacao_media']:.1f}")
     
     # Análise por marca
-    pipeline_marca = [
-        {"$group": {
-            "_id": "$marca",
-            "total_produtos": {"$sum": 1},
-            "preco_medio": {"$avg": "$preco"},
-            "avaliacao_media": {"$avg": "$avaliacao_media"}
-        }},
-        {"$sort": {"total_produtos": -1}}
-    ]
-    
-    resultado_marca = list(produtos_collection.aggregate(pipeline_marca))
+    resultado_marca = resumo.por_marca
     
     print("\n🏷️ Análise por Marca:")
     for marca in resultado_marca:
@@ -316,62 +273,9 @@ def analisar_comportamento(db):
     print("\n👥 ANÁLISE DE COMPORTAMENTO")
     print("=" * 50)
     
-    comportamento_collection = db['usuarios_comportamento']
-    
-    # Pipeline para análise de comportamento
-    pipeline_comportamento = [
-        {"$unwind": "$eventos"},
-        {"$group": {
-            "_id": "$usuario_id",
-            "total_eventos": {"$sum": 1},
-            "page_views": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "page_view"]}, 1, 0]}
-            },
-            "clicks": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "click"]}, 1, 0]}
-            },
-            "add_to_cart": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "add_to_cart"]}, 1, 0]}
-            },
-            "searches": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "search"]}, 1, 0]}
-            },
-            "view_product": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "view_product"]}, 1, 0]}
-            },
-            "tempo_total": {"$sum": "$eventos.tempo_pagina"},
-            "produtos_unicos": {"$addToSet": "$eventos.produto_id"}
-        }},
-        {"$project": {
-            "usuario_id": "$_id",
-            "total_eventos": 1,
-            "page_views": 1,
-            "clicks": 1,
-            "add_to_cart": 1,
-            "searches": 1,
-            "view_product": 1,
-            "tempo_total": 1,
-            "produtos_unicos": {"$size": "$produtos_unicos"},
-            "taxa_conversao": {
-                "$cond": [
-                    {"$gt": ["$page_views", 0]},
-                    {"$divide": ["$add_to_cart", "$page_views"]},
-                    0
-                ]
-            },
-            "tempo_medio_evento": {
-                "$cond": [
-                    {"$gt": ["$total_eventos", 0]},
-                    {"$divide": ["$tempo_total", "$total_eventos"]},
-                    0
-                ]
-            }
-        }},
-        {"$sort": {"total_eventos": -1}}
-    ]
-    
-    # Executar pipeline
-    comportamento_data = list(comportamento_collection.aggregate(pipeline_comportamento))
+    # Features por usuário já agregadas na coleção materializada
+    # (recalculada com $merge a cada carga de eventos)
+    comportamento_data = obter_features(db, incremental=True)
     
     if comportamento_data:
         comportamento_df = pd.DataFrame(comportamento_data)
@@ -407,24 +311,10 @@ def analisar_usuarios(db):
     print("\n👤 ANÁLISE DE USUÁRIOS")
     print("=" * 50)
     
-    usuarios_collection = db['usuarios_perfil']
+    # Segmentos e faixas etárias em uma única agregação ($facet)
+    resumo = resumo_usuarios(db)
     
-    # Pipeline para análise de usuários
-    pipeline_usuarios = [
-        {"$group": {
-            "_id": "$segmento",
-            "total_usuarios": {"$sum": 1},
-            "valor_medio": {"$avg": "$valor_total_compras"},
-            "valor_total": {"$sum": "$valor_total_compras"},
-            "pedidos_medio": {"$avg": "$total_pedidos"},
-            "ticket_medio": {"$avg": "$ticket_medio"},
-            "idade_media": {"$avg": "$idade"},
-            "dias_sem_comprar_medio": {"$avg": "$dias_sem_comprar"}
-        }},
-        {"$sort": {"valor_total": -1}}
-    ]
-    
-    resultado_usuarios = list(usuarios_collection.aggregate(pipeline_usuarios))
+    resultado_usuarios = resumo.por_segmento
     
     print("📊 Análise por Segmento:")
     for seg in resultado_usuarios:
@@ -438,20 +328,7 @@ def analisar_usuarios(db):
         print(f"    Dias sem comprar: {seg['dias_sem_comprar_medio']:.1f}")
     
     # Análise por idade
-    pipeline_idade = [
-        {"$bucket": {
-            "groupBy": "$idade",
-            "boundaries": [18, 25, 35, 45, 55, 65],
-            "default": "65+",
-            "output": {
-                "total": {"$sum": 1},
-                "valor_medio": {"$avg": "$valor_total_compras"},
-                "ticket_medio": {"$avg": "$ticket_medio"}
-            }
-        }}
-    ]
-    
-    resultado_idade = list(usuarios_collection.aggregate(pipeline_idade))
+    resultado_idade = resumo.por_faixa_etaria
     
     print("\n📊 Análise por Faixa Etária:")
     for faixa in resultado_idade:
@@ -9,12 +9,17 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
 import json
 import warnings
 warnings.filterwarnings('ignore')
 
+from scripts.fluxo_comportamento import gerar_documentos_comportamento
+from scripts.carga_mongodb import carregar_documentos
+from scripts.features_comportamento import materializar_features, obter_features
+from scripts.eventos_buckets import gravar_comportamento
+from scripts.consultas_analiticas import resumo_produtos
+
 # Configurações de visualização
 plt.style.use('default')
 sns.set_palette("husl")
@@ -105,86 +110,47 @@ def configurar_dados_completos(db):
         }
     ]
     
-    produtos_collection.insert_many(produtos_exemplo)
+    carregar_documentos(produtos_collection, produtos_exemplo, verbose=False)
     print(f"OK - {len(produtos_exemplo)} produtos inseridos")
     
     # Coleção: usuarios_comportamento
     comportamento_collection = db['usuarios_comportamento']
     comportamento_collection.delete_many({})
     
-    comportamento_exemplo = []
-    for i in range(1, 21):  # 20 usuários
-        usuario_id = f"U{i:03d}"
-        eventos = []
-        
-        # Gerar eventos aleatórios
-        num_eventos = random.randint(5, 20)
-        
-        for j in range(num_eventos):
-            tipos_evento = ["page_view", "click", "add_to_cart", "search"]
-            tipo = random.choice(tipos_evento)
-            
-            evento = {
-                "tipo": tipo,
-                "timestamp": datetime.now() - timedelta(days=random.randint(0, 30)),
-                "tempo_pagina": random.randint(10, 120)
-            }
-            
-            if tipo in ["page_view", "click", "add_to_cart"]:
-                evento["produto_id"] = random.choice(["P001", "P002", "P003"])
-            
-            if tipo == "search":
-                evento["termo"] = random.choice(["smartphone", "notebook", "eletrônicos"])
-            
-            eventos.append(evento)
-        
-        comportamento = {
-            "usuario_id": usuario_id,
-            "sessao_id": f"S{i:03d}",
-            "timestamp": datetime.now(),
-            "eventos": eventos,
-            "pagina_atual": f"/produto/P{random.randint(1,3):03d}",
-            "referrer": "https://google.com/search",
-            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "localizacao": {
-                "pais": "Brasil",
-                "estado": random.choice(["São Paulo", "Rio de Janeiro", "Minas Gerais"]),
-                "cidade": random.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte"])
-            }
-        }
-        
-        comportamento_exemplo.append(comportamento)
+    # Documentos gerados sob demanda e gravados em lotes limitados
+    comportamento_exemplo = gerar_documentos_comportamento(
+        20,
+        produtos=["P001", "P002", "P003"],
+        termos=["smartphone", "notebook", "eletrônicos"],
+        tipos_evento=["page_view", "click", "add_to_cart", "search"],
+        eventos_por_usuario=(5, 20),
+        tempo_pagina=(10, 120),
+        estados=["São Paulo", "Rio de Janeiro", "Minas Gerais"],
+        cidades=["São Paulo", "Rio de Janeiro", "Belo Horizonte"],
+        referrers=["https://google.com/search"],
+        detalhado=False
+    )
+    # Sessões em usuarios_comportamento e eventos no bucket corrente de cada usuário
+    total_sessoes, total_eventos = gravar_comportamento(db, comportamento_exemplo, recriar=True)
+    print(f"OK - {total_sessoes} registros de comportamento inseridos")
+    print(f"OK - {total_eventos} eventos gravados em buckets")
     
-    comportamento_collection.insert_many(comportamento_exemplo)
-    print(f"OK - {len(comportamento_exemplo)} registros de comportamento inseridos")
+    # Agregar os eventos uma única vez em features_comportamento
+    total_features = materializar_features(db, recriar=True)
+    print(f"OK - Features de comportamento materializadas para {total_features} usuarios")
 
 def analisar_produtos(db):
     """Analisar produtos no MongoDB"""
     print("\nANALISE DE PRODUTOS")
     print("=" * 50)
     
-    produtos_collection = db['produtos']
+    # Totais e categorias em uma única agregação ($facet)
+    resumo = resumo_produtos(db)
     
-    # Contar produtos
-    total_produtos = produtos_collection.count_documents({})
-    produtos_ativos = produtos_collection.count_documents({"ativo": True})
+    print(f"Total de produtos: {resumo.total}")
+    print(f"Produtos ativos: {resumo.ativos}")
     
-    print(f"Total de produtos: {total_produtos}")
-    print(f"Produtos ativos: {produtos_ativos}")
-    
-    # Análise por categoria
-    pipeline_categoria = [
-        {"$group": {
-            "_id": "$categoria",
-            "total_produtos": {"$sum": 1},
-            "preco_medio": {"$avg": "$preco"},
-            "estoque_total": {"$sum": "$estoque"},
-            "avaliacao_media": {"$avg": "$avaliacao_media"}
-        }},
-        {"$sort": {"total_produtos": -1}}
-    ]
-    
-    resultado_categoria = list(produtos_collection.aggregate(pipeline_categoria))
+    resultado_categoria = resumo.por_categoria
     
     print("\nAnalise por Categoria:")
     for cat in resultado_categoria:
@@ -201,58 +167,9 @@ def analisar_comportamento(db):
     print("\nANALISE DE COMPORTAMENTO")
     print("=" * 50)
     
-    comportamento_collection = db['usuarios_comportamento']
-    
-    # Pipeline para análise de comportamento
-    pipeline_comportamento = [
-        {"$unwind": "$eventos"},
-        {"$group": {
-            "_id": "$usuario_id",
-            "total_eventos": {"$sum": 1},
-            "page_views": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "page_view"]}, 1, 0]}
-            },
-            "clicks": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "click"]}, 1, 0]}
-            },
-            "add_to_cart": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "add_to_cart"]}, 1, 0]}
-            },
-            "searches": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "search"]}, 1, 0]}
-            },
-            "tempo_total": {"$sum": "$eventos.tempo_pagina"},
-            "produtos_unicos": {"$addToSet": "$eventos.produto_id"}
-        }},
-        {"$project": {
-            "usuario_id": "$_id",
-            "total_eventos": 1,
-            "page_views": 1,
-            "clicks": 1,
-            "add_to_cart": 1,
-            "searches": 1,
-            "tempo_total": 1,
-            "produtos_unicos": {"$size": "$produtos_unicos"},
-            "taxa_conversao": {
-                "$cond": [
-                    {"$gt": ["$page_views", 0]},
-                    {"$divide": ["$add_to_cart", "$page_views"]},
-                    0
-                ]
-            },
-            "tempo_medio_evento": {
-                "$cond": [
-                    {"$gt": ["$total_eventos", 0]},
-                    {"$divide": ["$tempo_total", "$total_eventos"]},
-                    0
-                ]
-            }
-        }},
-        {"$sort": {"total_eventos": -1}}
-    ]
-    
-    # Executar pipeline
-    comportamento_data = list(comportamento_collection.aggregate(pipeline_comportamento))
+    # Features por usuário já agregadas na coleção materializada
+    # (recalculada com $merge a cada carga de eventos)
+    comportamento_data = obter_features(db, incremental=True)
     
     if comportamento_data:
         comportamento_df = pd.DataFrame(comportamento_data)
@@ -5,87 +5,31 @@ Versão que funciona sem bancos de dados, usando apenas dados simulados
 """
 
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
-import random
 import warnings
 warnings.filterwarnings('ignore')
 
+from scripts.recomendacao_lote import (
+    preparar_features_usuarios, preparar_features_produtos,
+    calcular_scores, motivos_recomendacao
+)
+from scripts.estatisticas_populacao import obter_estatisticas
+from scripts.gerador_dados import gerar_dados
+from scripts.selecao_top_k import top_k
+
 # Configurações de visualização
 plt.style.use('default')
 sns.set_palette("husl")
 plt.rcParams['figure.figsize'] = (12, 8)
 
-def gerar_dados_simulados():
+def gerar_dados_simulados(n_usuarios=100, n_produtos=20):
     """Gerar dados simulados para demonstração"""
     print("📊 Gerando dados simulados...")
     
-    # Configurar seed para reprodutibilidade
-    np.random.seed(42)
-    random.seed(42)
-    
-    # Dados de usuários
-    usuarios = []
-    for i in range(1, 101):
-        usuario = {
-            'usuario_id': f'U{i:03d}',
-            'nome': f'Usuário {i}',
-            'email': f'usuario{i}@exemplo.com',
-            'segmento': random.choice(['high_value', 'medium_value', 'low_value', 'new_user']),
-            'valor_total_compras': np.random.exponential(2000),
-            'total_pedidos': np.random.poisson(5),
-            'ticket_medio': np.random.normal(500, 200),
-            'produtos_unicos': np.random.randint(1, 15),
-            'dias_sem_comprar': np.random.exponential(30),
-            'pedidos_concluidos': np.random.poisson(4),
-            'pedidos_pendentes': np.random.poisson(1),
-            'variabilidade_gastos': np.random.exponential(100)
-        }
-        usuarios.append(usuario)
-    
-    usuarios_df = pd.DataFrame(usuarios)
-    
-    # Dados de comportamento
-    comportamento = []
-    for i in range(1, 101):
-        comp = {
-            'usuario_id': f'U{i:03d}',
-            'total_eventos': np.random.poisson(15),
-            'page_views': np.random.poisson(10),
-            'clicks': np.random.poisson(8),
-            'add_to_cart': np.random.poisson(2),
-            'searches': np.random.poisson(3),
-            'produtos_unicos': np.random.randint(1, 8),
-            'taxa_conversao': np.random.beta(2, 8),
-            'tempo_medio_evento': np.random.normal(45, 15)
-        }
-        comportamento.append(comp)
-    
-    comportamento_df = pd.DataFrame(comportamento)
-    
-    # Dados de produtos
-    produtos = []
-    categorias = ['Smartphones', 'Notebooks', 'Tablets', 'Acessórios']
-    marcas = ['Samsung', 'Apple', 'Dell', 'Xiaomi', 'LG']
-    
-    for i in range(1, 21):
-        produto = {
-            'produto_id': f'P{i:03d}',
-            'nome': f'Produto {i}',
-            'categoria': random.choice(categorias),
-            'marca': random.choice(marcas),
-            'preco': np.random.uniform(100, 5000),
-            'estoque': np.random.randint(0, 100),
-            'avaliacao_media': np.random.uniform(3, 5),
-            'total_avaliacoes': np.random.randint(10, 1000),
-            'total_vendas': np.random.randint(0, 500),
-            'receita_total': np.random.uniform(1000, 50000)
-        }
-        produtos.append(produto)
-    
-    produtos_df = pd.DataFrame(produtos)
+    # Colunas inteiras sorteadas com NumPy (seed fixa para reprodutibilidade)
+    usuarios_df, comportamento_df, produtos_df = gerar_dados(n_usuarios, n_produtos, seed=42)
     
     print(f"✅ {len(usuarios_df)} usuários gerados")
     print(f"✅ {len(comportamento_df)} registros de comportamento gerados")
@@ -259,87 +203,17 @@ def sistema_recomendacoes(usuarios_df, comportamento_df, produtos_df):
     print("\n🎯 SISTEMA DE RECOMENDAÇÕES")
     print("=" * 50)
     
-    def gerar_recomendacoes(usuario_id, usuarios_df, comportamento_df, produtos_df):
-        """Gerar recomendações para um usuário específico"""
-        
-        # Buscar dados do usuário
-        user_data = usuarios_df[usuarios_df['usuario_id'] == usuario_id]
-        user_comp = comportamento_df[comportamento_df['usuario_id'] == usuario_id]
-        
-        recomendacoes = []
-        
-        for _, produto in produtos_df.iterrows():
-            score = 0.0
-            motivos = []
-            
-            # Score baseado em comportamento
-            if not user_comp.empty:
-                comp_data = user_comp.iloc[0]
-                
-                # Usuários ativos têm preferência por produtos similares
-                if comp_data['total_eventos'] > comportamento_df['total_eventos'].mean():
-                    score += 0.3
-                    motivos.append("usuário_ativo")
-                
-                # Usuários com alta conversão preferem produtos premium
-                if comp_data['taxa_conversao'] > comportamento_df['taxa_conversao'].mean():
-                    if produto['preco'] > 2000:
-                        score += 0.2
-                        motivos.append("preferencia_premium")
-                    else:
-                        score += 0.1
-                        motivos.append("produto_acessivel")
-            
-            # Score baseado em dados transacionais
-            if not user_data.empty:
-                user_trans = user_data.iloc[0]
-                
-                # Usuários high_value preferem produtos caros
-                if user_trans['segmento'] == 'high_value':
-                    if produto['preco'] > 2000:
-                        score += 0.4
-                        motivos.append("segmento_high_value")
-                    else:
-                        score += 0.1
-                        motivos.append("produto_economico")
-                
-                # Usuários com muitos pedidos preferem produtos populares
-                if user_trans['total_pedidos'] > usuarios_df['total_pedidos'].mean():
-                    score += 0.2
-                    motivos.append("cliente_frequente")
-            
-            # Score baseado em cluster (se disponível)
-            if 'cluster' in comportamento_df.columns and not user_comp.empty:
-                cluster = user_comp.iloc[0]['cluster']
-                
-                if cluster == 2:  # Usuários ativos e convertidos
-                    score += 0.25
-                    motivos.append("cluster_ativo_convertido")
-                elif cluster == 1:  # Usuários ativos mas baixa conversão
-                    if produto['preco'] < 1500:  # Produtos mais baratos
-                        score += 0.2
-                        motivos.append("cluster_ativo_baixa_conv")
-                elif cluster == 0:  # Usuários passivos
-                    if produto['preco'] < 1000:  # Produtos muito baratos
-                        score += 0.15
-                        motivos.append("cluster_passivo")
-            
-            # Adicionar ruído aleatório para simular variação
-            score += random.uniform(-0.1, 0.1)
-            score = max(0, min(1, score))  # Manter entre 0 e 1
-            
-            recomendacoes.append({
-                'produto_id': produto['produto_id'],
-                'nome': produto['nome'],
-                'categoria': produto['categoria'],
-                'preco': produto['preco'],
-                'score': score,
-                'motivos': motivos
-            })
-        
-        # Ordenar por score e retornar top 5
-        recomendacoes.sort(key=lambda x: x['score'], reverse=True)
-        return recomendacoes[:5]
+    # Limiares da população calculados uma vez para esta versão dos dados
+    estatisticas = obter_estatisticas(usuarios_df, comportamento_df)
+    
+    # Montar as matrizes de features uma única vez e pontuar todos os usuários
+    ids_usuarios, U = preparar_features_usuarios(usuarios_df, comportamento_df, estatisticas)
+    _, P = preparar_features_produtos(produtos_df)
+    precos = produtos_df['preco'].to_numpy()
+    
+    scores = calcular_scores(U, P, ids_usuarios, execucao=42)
+    indices, top_scores = top_k(scores, 5)
+    posicao_usuario = {usuario_id: i for i, usuario_id in enumerate(ids_usuarios)}
     
     # Gerar recomendações para alguns usuários
     usuarios_exemplo = ['U001', 'U002', 'U003', 'U004', 'U005']
@@ -368,15 +242,17 @@ def sistema_recomendacoes(usuarios_df, comportamento_df, produtos_df):
         
         print(f"📊 Perfil: {user_info}")
         
-        # Gerar recomendações
-        recomendacoes = gerar_recomendacoes(usuario, usuarios_df, comportamento_df, produtos_df)
+        # Recomendações já calculadas em lote
+        i_usuario = posicao_usuario[usuario]
         
         print("🎯 Top 3 Recomendações:")
-        for i, rec in enumerate(recomendacoes[:3], 1):
-            print(f"  {i}. {rec['nome']}")
-            print(f"     Preço: R$ {rec['preco']:,.2f}")
-            print(f"     Score: {rec['score']:.2f}")
-            print(f"     Motivos: {', '.join(rec['motivos'])}")
+        for i, (i_produto, score) in enumerate(zip(indices[i_usuario, :3], top_scores[i_usuario, :3]), 1):
+            produto = produtos_df.iloc[i_produto]
+            motivos = motivos_recomendacao(U, P, i_usuario, i_produto, precos)
+            print(f"  {i}. {produto['nome']}")
+            print(f"     Preço: R$ {produto['preco']:,.2f}")
+            print(f"     Score: {score:.2f}")
+            print(f"     Motivos: {', '.join(motivos)}")
             print()
 
 def criar_visualizacoes(usuarios_df, comportamento_df, produtos_df):
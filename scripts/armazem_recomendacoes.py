@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Armazém de Recomendações - Análise Preditiva E-commerce
+Grava listas top-k pré-calculadas na coleção `recomendacoes` (um documento
+por usuário), expira-as com índice TTL em `valido_ate` e serve leituras por
+`usuario_id` com um cache LRU em memória na frente do MongoDB. As datas são
+gravadas em UTC, o mesmo relógio do monitor TTL do servidor
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, UpdateOne
+
+COLECAO_RECOMENDACOES = 'recomendacoes'
+
+# Tempo de vida padrão de uma lista pré-calculada
+VALIDADE_PADRAO = timedelta(days=1)
+
+# Operações por chamada de bulk_write
+TAMANHO_LOTE_ESCRITA = 1000
+
+# Entradas mantidas no cache em memória
+CAPACIDADE_CACHE_PADRAO = 100000
+
+
+def _em_utc(momento):
+    """Datetime com fuso UTC (datas ingênuas lidas sem `tz_aware` já são UTC)"""
+    return momento.replace(tzinfo=timezone.utc) if momento.tzinfo is None else momento
+
+
+class CacheLRU:
+    """Cache LRU thread-safe que respeita o `valido_ate` de cada entrada"""
+
+    def __init__(self, capacidade=CAPACIDADE_CACHE_PADRAO):
+        self.capacidade = capacidade
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave, agora=None):
+        """Valor da chave, ou None se ausente/expirado"""
+        agora = agora or datetime.now(timezone.utc)
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None or entrada[0] <= agora:
+                if entrada is not None:
+                    del self._dados[chave]
+                self.faltas += 1
+                return None
+
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave, valor, valido_ate):
+        """Guardar um valor até `valido_ate`, descartando o menos recente se cheio"""
+        with self._lock:
+            self._dados[chave] = (valido_ate, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, chave=None):
+        """Remover uma chave (ou todas, se nenhuma for informada)"""
+        with self._lock:
+            if chave is None:
+                self._dados.clear()
+            else:
+                self._dados.pop(chave, None)
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class ArmazemRecomendacoes:
+    """Leitura e escrita das recomendações pré-calculadas por usuário
+
+    Se `versao` for informada, apenas documentos dessa versão do modelo são
+    servidos; documentos de outras versões são tratados como ausentes. O
+    cliente deve ser criado com `tz_aware=True`, para que `valido_ate` volte
+    em UTC com fuso.
+    """
+
+    def __init__(self, db, versao=None, capacidade_cache=CAPACIDADE_CACHE_PADRAO,
+                 colecao=COLECAO_RECOMENDACOES):
+        self.collection = db[colecao]
+        self.versao = versao
+        self.cache = CacheLRU(capacidade_cache)
+
+    def criar_indices(self):
+        """Criar (de forma idempotente) os índices de leitura e de expiração"""
+        self.collection.create_index([("usuario_id", ASCENDING)], unique=True,
+                                     name="idx_recomendacoes_usuario")
+        # expireAfterSeconds=0: o documento expira exatamente em `valido_ate`
+        self.collection.create_index([("valido_ate", ASCENDING)], expireAfterSeconds=0,
+                                     name="ttl_recomendacoes_valido_ate")
+
+    def gravar_lote(self, documentos, versao, validade=VALIDADE_PADRAO,
+                    tamanho_lote=TAMANHO_LOTE_ESCRITA):
+        """Gravar (upsert) um documento por usuário com bulk_write não ordenado
+
+        Cada documento precisa de `usuario_id` e `recomendacoes`; os campos
+        `versao`, `data_geracao` e `valido_ate` são preenchidos aqui.
+        Retorna o número de documentos gravados.
+        """
+        agora = datetime.now(timezone.utc)
+        valido_ate = agora + validade
+        gravados = 0
+        operacoes = []
+
+        def enviar():
+            nonlocal gravados, operacoes
+            if operacoes:
+                resultado = self.collection.bulk_write(operacoes, ordered=False)
+                gravados += resultado.upserted_count + resultado.matched_count
+                operacoes = []
+
+        for documento in documentos:
+            documento = dict(documento)
+            documento.pop("_id", None)
+            documento.update({"versao": versao, "data_geracao": agora, "valido_ate": valido_ate})
+            operacoes.append(UpdateOne({"usuario_id": documento["usuario_id"]},
+                                       {"$set": documento}, upsert=True))
+            self.cache.invalidar(documento["usuario_id"])
+            if len(operacoes) >= tamanho_lote:
+                enviar()
+        enviar()
+
+        return gravados
+
+    def obter(self, usuario_id):
+        """Recomendações válidas do usuário (cache LRU e, na falta, MongoDB)"""
+        agora = datetime.now(timezone.utc)
+        documento = self.cache.obter(usuario_id, agora)
+        if documento is not None:
+            return documento
+
+        filtro = {"usuario_id": usuario_id, "valido_ate": {"$gt": agora}}
+        if self.versao is not None:
+            filtro["versao"] = self.versao
+
+        documento = self.collection.find_one(filtro, {"_id": 0})
+        if documento is not None:
+            self.cache.guardar(usuario_id, documento, _em_utc(documento["valido_ate"]))
+        return documento
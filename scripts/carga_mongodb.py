@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Carga em Massa no MongoDB - Análise Preditiva E-commerce
+Divide os documentos em lotes e os insere com `insert_many(ordered=False)`
+a partir de um pool de threads que compartilham o pool de conexões do
+`MongoClient`, com novas tentativas por lote e relatório de documentos/s
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure, NetworkTimeout
+
+from scripts.fluxo_comportamento import BYTES_POR_LOTE, DOCUMENTOS_POR_LOTE, agrupar_em_lotes
+
+THREADS_PADRAO = 4
+TENTATIVAS_PADRAO = 3
+ESPERA_INICIAL = 0.5
+
+# Código de erro de chave duplicada
+ERRO_DUPLICADO = 11000
+
+ERROS_TRANSITORIOS = (AutoReconnect, ConnectionFailure, NetworkTimeout)
+
+
+@dataclass
+class ResultadoCarga:
+    """Resumo de uma carga em massa"""
+    inseridos: int = 0
+    duplicados: int = 0
+    falhas: int = 0
+    lotes: int = 0
+    segundos: float = 0.0
+
+    @property
+    def documentos_por_segundo(self):
+        return self.inseridos / self.segundos if self.segundos else 0.0
+
+
+def _inserir_lote(collection, lote, tentativas, espera):
+    """Inserir um lote; retorna (inseridos, duplicados, falhas)
+
+    Chaves duplicadas são ignoradas. Erros transitórios e erros de escrita
+    não duplicados provocam nova tentativa do lote com espera exponencial;
+    como o `insert_many` atribui `_id` aos documentos na primeira tentativa,
+    os que já tinham sido gravados voltam como duplicados e não são repetidos.
+    """
+    inseridos = duplicados = 0
+    for tentativa in range(1, tentativas + 1):
+        try:
+            resultado = collection.insert_many(lote, ordered=False)
+            return inseridos + len(resultado.inserted_ids), duplicados, 0
+        except BulkWriteError as e:
+            detalhes = e.details
+            erros = detalhes.get('writeErrors', [])
+            inseridos += detalhes.get('nInserted', 0)
+            duplicados += sum(1 for erro in erros if erro.get('code') == ERRO_DUPLICADO)
+            lote = [lote[erro['index']] for erro in erros if erro.get('code') != ERRO_DUPLICADO]
+            if not lote:
+                return inseridos, duplicados, 0
+            if tentativa == tentativas:
+                return inseridos, duplicados, len(lote)
+        except ERROS_TRANSITORIOS:
+            if tentativa == tentativas:
+                return inseridos, duplicados, len(lote)
+
+        time.sleep(espera * 2 ** (tentativa - 1))
+
+    return inseridos, duplicados, len(lote)
+
+
+def carregar_documentos(collection, documentos, n_threads=THREADS_PADRAO,
+                        max_documentos=DOCUMENTOS_POR_LOTE, max_bytes=BYTES_POR_LOTE,
+                        tentativas=TENTATIVAS_PADRAO, espera=ESPERA_INICIAL, verbose=True):
+    """Inserir um iterável de documentos em paralelo, lote a lote
+
+    No máximo `2 * n_threads` lotes ficam em memória ao mesmo tempo, de
+    modo que `documentos` pode ser um gerador de qualquer tamanho.
+    """
+    resultado = ResultadoCarga()
+    em_voo = threading.BoundedSemaphore(2 * n_threads)
+    lock = threading.Lock()
+    erros = []
+    comeco = time.time()
+
+    def concluir(tarefa):
+        try:
+            inseridos, duplicados, falhas = tarefa.result()
+            with lock:
+                resultado.inseridos += inseridos
+                resultado.duplicados += duplicados
+                resultado.falhas += falhas
+        except Exception as e:
+            erros.append(e)
+        finally:
+            em_voo.release()
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for lote in agrupar_em_lotes(documentos, max_documentos, max_bytes):
+            em_voo.acquire()
+            if erros:
+                break
+            resultado.lotes += 1
+            executor.submit(_inserir_lote, collection, lote, tentativas, espera).add_done_callback(concluir)
+
+    if erros:
+        raise erros[0]
+
+    resultado.segundos = time.time() - comeco
+    if verbose:
+        print(f"  📥 {collection.name}: {resultado.inseridos} inseridos em {resultado.lotes} lotes "
+              f"({resultado.documentos_por_segundo:,.0f} docs/s)"
+              + (f", {resultado.duplicados} duplicados ignorados" if resultado.duplicados else "")
+              + (f", {resultado.falhas} falhas" if resultado.falhas else ""))
+    return resultado
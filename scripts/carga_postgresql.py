@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Carga em Massa no PostgreSQL - Análise Preditiva E-commerce
+Envia DataFrames com `COPY ... FROM STDIN` a partir de buffers em memória,
+resolve chaves estrangeiras no cliente com ids reservados na sequência e
+cria os índices secundários somente depois da carga
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+# Linhas serializadas por buffer enviado ao COPY
+LINHAS_POR_BUFFER = 100_000
+
+STATUS_PEDIDO = ['concluido', 'pendente', 'cancelado']
+METODOS_PAGAMENTO = ['cartao_credito', 'pix', 'boleto']
+CIDADES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte"]
+ESTADOS = ["SP", "RJ", "MG"]
+
+# Índices secundários, criados após a carga dos dados
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)",
+    "CREATE INDEX IF NOT EXISTS idx_usuarios_usuario_id ON usuarios(usuario_id)",
+    "CREATE INDEX IF NOT EXISTS idx_usuarios_segmento ON usuarios(segmento)",
+    "CREATE INDEX IF NOT EXISTS idx_pedidos_usuario ON pedidos(usuario_id)",
+    "CREATE INDEX IF NOT EXISTS idx_pedidos_status ON pedidos(status)",
+    "CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos(data_pedido)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido(pedido_id)",
+    "CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos_relacional(categoria_id)",
+    "CREATE INDEX IF NOT EXISTS idx_produtos_marca ON produtos_relacional(marca)",
+    "CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos_relacional(preco)"
+]
+
+
+def copiar_dataframe(cursor, tabela, df, linhas_por_buffer=LINHAS_POR_BUFFER):
+    """Copiar um DataFrame para `tabela` com COPY FROM STDIN (formato CSV)
+
+    As colunas do DataFrame devem ter os nomes das colunas da tabela e as
+    colunas JSONB devem vir serializadas como texto. Valores nulos (e
+    strings vazias) chegam como NULL. Retorna o número de linhas copiadas.
+    """
+    colunas = ', '.join(df.columns)
+    comando = f"COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT csv)"
+
+    for inicio in range(0, len(df), linhas_por_buffer):
+        bloco = df.iloc[inicio:inicio + linhas_por_buffer]
+        buffer = io.StringIO()
+        bloco.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(comando, buffer)
+
+    return len(df)
+
+
+def copiar_com_conflito(cursor, tabela, df, chave):
+    """Copiar para uma tabela temporária e inserir ignorando conflitos em `chave`
+
+    Equivale a `INSERT ... ON CONFLICT (chave) DO NOTHING` linha a linha,
+    mas com um único COPY e um único INSERT ... SELECT. A tabela temporária
+    tem só as colunas do DataFrame, sem os defaults da tabela (que gastariam
+    valores das sequências SERIAL), e as linhas com `chave` já existente
+    são descartadas antes do INSERT pelo mesmo motivo.
+    """
+    temporaria = f"tmp_carga_{tabela}"
+    colunas = ', '.join(df.columns)
+    cursor.execute(f"CREATE TEMP TABLE {temporaria} ON COMMIT DROP AS "
+                   f"SELECT {colunas} FROM {tabela} WITH NO DATA")
+    copiar_dataframe(cursor, temporaria, df)
+    cursor.execute(f"""
+        INSERT INTO {tabela} ({colunas})
+        SELECT {colunas} FROM {temporaria} t
+        WHERE NOT EXISTS (SELECT 1 FROM {tabela} e WHERE e.{chave} = t.{chave})
+        ON CONFLICT ({chave}) DO NOTHING
+    """)
+    inseridas = cursor.rowcount
+    cursor.execute(f"DROP TABLE {temporaria}")
+    return inseridas
+
+
+def reservar_ids(cursor, tabela, quantidade, coluna='id'):
+    """Reservar `quantidade` ids na sequência SERIAL da tabela
+
+    Os ids são atribuídos no cliente (e usados como chave estrangeira nas
+    tabelas filhas) sem uma consulta por linha. Cada id vem de um `nextval`
+    no servidor, então inserções e reservas concorrentes nunca recebem os
+    mesmos ids (que podem não ser consecutivos).
+    """
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (tabela, coluna))
+    sequencia = _primeiro_valor(cursor.fetchone())
+    cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", (sequencia, quantidade))
+    return np.fromiter((_primeiro_valor(linha) for linha in cursor.fetchall()),
+                       dtype=np.int64, count=quantidade)
+
+
+def mapa_ids(cursor, tabela, chave):
+    """Mapa chave de negócio -> id numérico de uma tabela (uma consulta)"""
+    cursor.execute(f"SELECT {chave}, id FROM {tabela}")
+    return {_valores(linha)[0]: _valores(linha)[1] for linha in cursor.fetchall()}
+
+
+def _valores(linha):
+    """Valores de uma linha de cursor comum (tupla) ou RealDictCursor (dict)"""
+    return list(linha.values()) if isinstance(linha, dict) else list(linha)
+
+
+def _primeiro_valor(linha):
+    return _valores(linha)[0]
+
+
+def _enderecos(rng, numeros):
+    """Endereços JSON de exemplo, um por número
+
+    Os valores não contêm aspas nem barras, então o JSON é montado por
+    template em vez de `json.dumps` por linha.
+    """
+    n = len(numeros)
+    cidades = np.asarray(CIDADES)[rng.integers(0, len(CIDADES), n)].tolist()
+    estados = np.asarray(ESTADOS)[rng.integers(0, len(ESTADOS), n)].tolist()
+    colunas = zip(numeros, rng.integers(1, 1000, n).tolist(), cidades, estados,
+                  rng.integers(10000, 100000, n).tolist(), rng.integers(100, 1000, n).tolist())
+    return [
+        f'{{"rua": "Rua {num}, {rua}", "cidade": "{cidade}", "estado": "{estado}", "cep": "{cep}-{sufixo}"}}'
+        for num, rua, cidade, estado, cep, sufixo in colunas
+    ]
+
+
+def semear_pedidos(cursor, ids_usuarios, produtos, n_pedidos, max_itens=1, seed=None):
+    """Gerar e carregar `n_pedidos` pedidos com 1..`max_itens` itens cada
+
+    `ids_usuarios` são os ids numéricos de `usuarios` e `produtos` os
+    `produto_id` do catálogo. Os ids dos pedidos são reservados na sequência
+    e usados diretamente em `itens_pedido.pedido_id`. Retorna
+    (pedidos, itens) carregados.
+    """
+    rng = np.random.default_rng(seed)
+    ids_pedidos = reservar_ids(cursor, 'pedidos', n_pedidos)
+
+    pedidos = pd.DataFrame({
+        'id': ids_pedidos,
+        'pedido_id': [f'PED{i:03d}' for i in ids_pedidos.tolist()],
+        'usuario_id': rng.choice(np.asarray(ids_usuarios, dtype=np.int64), n_pedidos),
+        'status': rng.choice(STATUS_PEDIDO, n_pedidos),
+        'valor_total': rng.uniform(100, 5000, n_pedidos).round(2),
+        'metodo_pagamento': rng.choice(METODOS_PAGAMENTO, n_pedidos),
+        'endereco_entrega': _enderecos(rng, range(1, n_pedidos + 1)),
+    })
+
+    itens_por_pedido = rng.integers(1, max_itens + 1, n_pedidos)
+    n_itens = int(itens_por_pedido.sum())
+    produto_ids = rng.choice(np.asarray(produtos, dtype=object), n_itens)
+    quantidades = rng.integers(1, 4, n_itens)
+    precos = rng.uniform(100, 3000, n_itens).round(2)
+    itens = pd.DataFrame({
+        'pedido_id': np.repeat(ids_pedidos, itens_por_pedido),
+        'produto_id': produto_ids,
+        'nome_produto': [f'Produto {p}' for p in produto_ids],
+        'preco_unitario': precos,
+        'quantidade': quantidades,
+        'valor_total': (precos * quantidades).round(2),
+    })
+
+    copiar_dataframe(cursor, 'pedidos', pedidos)
+    copiar_dataframe(cursor, 'itens_pedido', itens)
+    return len(pedidos), len(itens)
+
+
+def criar_indices(cursor, indices=INDICES):
+    """Criar os índices secundários (depois da carga, para não mantê-los linha a linha)"""
+    for indice in indices:
+        cursor.execute(indice)
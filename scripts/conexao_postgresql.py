@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Conexões PostgreSQL - Análise Preditiva E-commerce
+Pool de conexões compartilhado (`ThreadedConnectionPool`) por todos os
+scripts: configuração por variáveis de ambiente, `statement_timeout` na
+abertura da conexão, verificação de saúde das conexões paradas e API de
+context manager que faz commit/rollback e devolve a conexão ao pool
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+# Variável de ambiente -> parâmetro de conexão (mesmos nomes da libpq)
+VARIAVEIS_AMBIENTE = {
+    'PGHOST': 'host',
+    'PGPORT': 'port',
+    'PGDATABASE': 'database',
+    'PGUSER': 'user',
+    'PGPASSWORD': 'password',
+}
+
+CONFIGURACAO_PADRAO = {
+    'host': 'localhost',
+    'port': 5432,
+    'database': 'ecommerce_demo',
+    'user': 'postgres',
+    'password': 'postgres',
+}
+
+TEMPO_LIMITE_PADRAO_MS = int(os.environ.get('PG_STATEMENT_TIMEOUT_MS', 30_000))
+MAXIMO_CONEXOES_PADRAO = int(os.environ.get('PG_POOL_MAX', 8))
+
+# Conexões paradas há mais tempo que isso são testadas com SELECT 1
+VERIFICAR_APOS_SEGUNDOS = 30
+
+
+def configuracao_postgresql(**sobrescritas):
+    """Parâmetros de conexão: argumentos (não nulos) > ambiente > padrão"""
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    for variavel, parametro in VARIAVEIS_AMBIENTE.items():
+        if os.environ.get(variavel):
+            configuracao[parametro] = os.environ[variavel]
+    configuracao.update({chave: valor for chave, valor in sobrescritas.items() if valor is not None})
+    return configuracao
+
+
+class PoolPostgreSQL:
+    """`ThreadedConnectionPool` com espera por conexão livre e verificação de saúde
+
+    `tempo_limite_ms` vira o `statement_timeout` padrão de cada conexão
+    (0 desativa); ele pode ser trocado por uso em `conexao()`.
+    """
+
+    def __init__(self, minimo=1, maximo=MAXIMO_CONEXOES_PADRAO,
+                 tempo_limite_ms=TEMPO_LIMITE_PADRAO_MS, **configuracao):
+        self.configuracao = configuracao_postgresql(**configuracao)
+        self.maximo = maximo
+        self.tempo_limite_ms = tempo_limite_ms
+        self._pool = pool.ThreadedConnectionPool(
+            minimo, maximo,
+            options=f"-c statement_timeout={int(tempo_limite_ms)}",
+            application_name='analise-preditiva-ecommerce',
+            **self.configuracao
+        )
+        # O pool do psycopg2 falha quando esgotado; o semáforo faz esperar
+        self._livres = threading.BoundedSemaphore(maximo)
+        self._ultimo_uso = {}
+
+    def _saudavel(self, conn):
+        if conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.time() - self._ultimo_uso.get(id(conn), 0) < VERIFICAR_APOS_SEGUNDOS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def obter(self, autocommit=False):
+        """Retirar uma conexão saudável do pool (espera se todas estiverem em uso)
+
+        Conexões quebradas são descartadas e substituídas. Toda conexão
+        obtida deve voltar com `devolver`.
+        """
+        self._livres.acquire()
+        try:
+            conn = self._pool.getconn()
+            if not self._saudavel(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            conn.autocommit = autocommit
+            return conn
+        except Exception:
+            self._livres.release()
+            raise
+
+    def devolver(self, conn, descartar=False):
+        """Devolver ao pool (com rollback do que ficou pendente)"""
+        try:
+            if not conn.closed and not descartar:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+            descartar = descartar or bool(conn.closed)
+            if descartar:
+                self._ultimo_uso.pop(id(conn), None)
+            else:
+                self._ultimo_uso[id(conn)] = time.time()
+            self._pool.putconn(conn, close=descartar)
+        finally:
+            self._livres.release()
+
+    @contextmanager
+    def conexao(self, autocommit=False, tempo_limite_ms=None):
+        """Conexão do pool: commit ao sair, rollback em exceção
+
+        `tempo_limite_ms` troca o `statement_timeout` só durante o bloco.
+        """
+        conn = self.obter(autocommit)
+        descartar = False
+        try:
+            if tempo_limite_ms is not None:
+                with conn.cursor() as cursor:
+                    cursor.execute("SET statement_timeout = %s", (int(tempo_limite_ms),))
+            yield conn
+            if not conn.autocommit:
+                conn.commit()
+        except psycopg2.InterfaceError:
+            descartar = True
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if tempo_limite_ms is not None and not conn.closed and not descartar:
+                try:
+                    conn.autocommit = True
+                    with conn.cursor() as cursor:
+                        cursor.execute("RESET statement_timeout")
+                except psycopg2.Error:
+                    descartar = True
+            self.devolver(conn, descartar)
+
+    @contextmanager
+    def cursor(self, cursor_factory=None, **kwargs):
+        """Cursor de uma conexão do pool (mesmas regras de `conexao`)"""
+        with self.conexao(**kwargs) as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def obter_pool(**configuracao):
+    """Pool compartilhado do processo para a configuração dada
+
+    Criado na primeira chamada; processos filhos (fork) criam o próprio.
+    Argumentos são os de `PoolPostgreSQL` e parâmetros de conexão.
+    """
+    chave = (os.getpid(), tuple(sorted((k, str(v)) for k, v in configuracao.items() if v is not None)))
+    with _lock_pools:
+        if chave not in _pools:
+            _pools[chave] = PoolPostgreSQL(**configuracao)
+        return _pools[chave]
+
+
+def fechar_pools():
+    """Fechar todos os pools deste processo"""
+    with _lock_pools:
+        for chave in [chave for chave in _pools if chave[0] == os.getpid()]:
+            _pools.pop(chave).fechar()
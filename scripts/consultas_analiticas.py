@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Consultas Analíticas - Análise Preditiva E-commerce
+Resumos de produtos e de usuários calculados em uma única agregação com
+`$facet` (uma ida ao servidor e uma varredura da coleção por resumo), em
+vez de uma contagem ou `$group` separado para cada indicador
+"""
+
+from dataclasses import dataclass, field
+
+# Limites das faixas etárias do `$bucket` (o que passar do último cai em "65+")
+FAIXAS_IDADE = [18, 25, 35, 45, 55, 65]
+
+
+@dataclass
+class ResumoProdutos:
+    """Indicadores do catálogo de produtos"""
+    total: int = 0
+    ativos: int = 0
+    por_categoria: list = field(default_factory=list)
+    por_marca: list = field(default_factory=list)
+    mais_caros: list = field(default_factory=list)
+
+
+@dataclass
+class ResumoUsuarios:
+    """Indicadores dos perfis de usuários"""
+    por_segmento: list = field(default_factory=list)
+    por_faixa_etaria: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum(segmento['total_usuarios'] for segmento in self.por_segmento)
+
+
+def pipeline_resumo_produtos(marcas=False, mais_caros=0):
+    """Pipeline `$facet` com totais, grupos por categoria (e marca) e os mais caros"""
+    facetas = {
+        "totais": [
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "ativos": {"$sum": {"$cond": [{"$eq": ["$ativo", True]}, 1, 0]}}
+            }}
+        ],
+        "por_categoria": [
+            {"$group": {
+                "_id": "$categoria",
+                "total_produtos": {"$sum": 1},
+                "preco_medio": {"$avg": "$preco"},
+                "estoque_total": {"$sum": "$estoque"},
+                "avaliacao_media": {"$avg": "$avaliacao_media"}
+            }},
+            {"$sort": {"total_produtos": -1}}
+        ],
+    }
+    if marcas:
+        facetas["por_marca"] = [
+            {"$group": {
+                "_id": "$marca",
+                "total_produtos": {"$sum": 1},
+                "preco_medio": {"$avg": "$preco"},
+                "avaliacao_media": {"$avg": "$avaliacao_media"}
+            }},
+            {"$sort": {"total_produtos": -1}}
+        ]
+    if mais_caros:
+        facetas["mais_caros"] = [
+            {"$match": {"ativo": True}},
+            {"$sort": {"preco": -1}},
+            {"$limit": mais_caros},
+            {"$project": {"_id": 0, "produto_id": 1, "nome": 1, "preco": 1}}
+        ]
+    return [{"$facet": facetas}]
+
+
+def resumo_produtos(db, marcas=False, mais_caros=0):
+    """Calcular o `ResumoProdutos` de `produtos` em uma única agregação"""
+    resultado = next(db['produtos'].aggregate(pipeline_resumo_produtos(marcas, mais_caros)), {})
+    totais = (resultado.get("totais") or [{}])[0]
+    return ResumoProdutos(
+        total=totais.get("total", 0),
+        ativos=totais.get("ativos", 0),
+        por_categoria=resultado.get("por_categoria", []),
+        por_marca=resultado.get("por_marca", []),
+        mais_caros=resultado.get("mais_caros", []),
+    )
+
+
+def pipeline_resumo_usuarios(faixas_idade=FAIXAS_IDADE):
+    """Pipeline `$facet` com o `$group` por segmento e o `$bucket` por idade"""
+    return [{"$facet": {
+        "por_segmento": [
+            {"$group": {
+                "_id": "$segmento",
+                "total_usuarios": {"$sum": 1},
+                "valor_medio": {"$avg": "$valor_total_compras"},
+                "valor_total": {"$sum": "$valor_total_compras"},
+                "pedidos_medio": {"$avg": "$total_pedidos"},
+                "ticket_medio": {"$avg": "$ticket_medio"},
+                "idade_media": {"$avg": "$idade"},
+                "dias_sem_comprar_medio": {"$avg": "$dias_sem_comprar"}
+            }},
+            {"$sort": {"valor_total": -1}}
+        ],
+        "por_faixa_etaria": [
+            {"$bucket": {
+                "groupBy": "$idade",
+                "boundaries": faixas_idade,
+                "default": f"{faixas_idade[-1]}+",
+                "output": {
+                    "total": {"$sum": 1},
+                    "valor_medio": {"$avg": "$valor_total_compras"},
+                    "ticket_medio": {"$avg": "$ticket_medio"}
+                }
+            }}
+        ],
+    }}]
+
+
+def resumo_usuarios(db, faixas_idade=FAIXAS_IDADE):
+    """Calcular o `ResumoUsuarios` de `usuarios_perfil` em uma única agregação"""
+    resultado = next(db['usuarios_perfil'].aggregate(pipeline_resumo_usuarios(faixas_idade)), {})
+    return ResumoUsuarios(
+        por_segmento=resultado.get("por_segmento", []),
+        por_faixa_etaria=resultado.get("por_faixa_etaria", []),
+    )
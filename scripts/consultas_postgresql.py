@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Consultas PostgreSQL - Análise Preditiva E-commerce
+Extração das features por usuário com agregações pré-calculadas por
+tabela (uma linha por usuário em cada CTE), sem o fan-out do join
+usuarios -> pedidos -> itens_pedido, a view materializada
+`mv_usuario_features` com essas agregações e benchmark com EXPLAIN
+ANALYZE comparando a consulta antiga e a nova
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+import psycopg2.extensions
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.extracao_postgresql import exportar_binario, extrair_dataframe
+
+# Consulta original: cada pedido aparece uma vez por item, então COUNT,
+# AVG e STDDEV dos pedidos ficam ponderados pelo tamanho da cesta
+CONSULTA_USUARIOS_LEGADA = """
+    SELECT
+        u.usuario_id,
+        u.nome,
+        u.segmento,
+        u.valor_total_compras,
+        COUNT(p.id) as total_pedidos,
+        AVG(p.valor_total) as ticket_medio,
+        COUNT(DISTINCT ip.produto_id) as produtos_unicos,
+        MAX(p.data_pedido) as ultima_compra,
+        EXTRACT(DAYS FROM NOW() - MAX(p.data_pedido)) as dias_sem_comprar,
+        COUNT(CASE WHEN p.status = 'concluido' THEN 1 END) as pedidos_concluidos,
+        COUNT(CASE WHEN p.status = 'pendente' THEN 1 END) as pedidos_pendentes,
+        COUNT(CASE WHEN p.status = 'cancelado' THEN 1 END) as pedidos_cancelados,
+        STDDEV(p.valor_total) as variabilidade_gastos
+    FROM usuarios u
+    LEFT JOIN pedidos p ON u.id = p.usuario_id
+    LEFT JOIN itens_pedido ip ON p.id = ip.pedido_id
+    GROUP BY u.usuario_id, u.nome, u.segmento, u.valor_total_compras
+    ORDER BY u.valor_total_compras DESC
+"""
+
+# Agregados por usuário (sem as colunas que dependem do momento da leitura),
+# com pedidos e itens agregados antes do join
+CONSULTA_AGREGADOS_USUARIOS = """
+    WITH pedidos_usuario AS (
+        SELECT
+            usuario_id,
+            COUNT(*) AS total_pedidos,
+            AVG(valor_total) AS ticket_medio,
+            MAX(data_pedido) AS ultima_compra,
+            COUNT(*) FILTER (WHERE status = 'concluido') AS pedidos_concluidos,
+            COUNT(*) FILTER (WHERE status = 'pendente') AS pedidos_pendentes,
+            COUNT(*) FILTER (WHERE status = 'cancelado') AS pedidos_cancelados,
+            STDDEV(valor_total) AS variabilidade_gastos
+        FROM pedidos
+        GROUP BY usuario_id
+    ),
+    produtos_usuario AS (
+        SELECT p.usuario_id, COUNT(DISTINCT ip.produto_id) AS produtos_unicos
+        FROM pedidos p
+        JOIN itens_pedido ip ON ip.pedido_id = p.id
+        GROUP BY p.usuario_id
+    )
+    SELECT
+        u.usuario_id,
+        u.nome,
+        u.segmento,
+        u.valor_total_compras,
+        COALESCE(pu.total_pedidos, 0) AS total_pedidos,
+        pu.ticket_medio,
+        COALESCE(pr.produtos_unicos, 0) AS produtos_unicos,
+        pu.ultima_compra,
+        COALESCE(pu.pedidos_concluidos, 0) AS pedidos_concluidos,
+        COALESCE(pu.pedidos_pendentes, 0) AS pedidos_pendentes,
+        COALESCE(pu.pedidos_cancelados, 0) AS pedidos_cancelados,
+        pu.variabilidade_gastos
+    FROM usuarios u
+    LEFT JOIN pedidos_usuario pu ON pu.usuario_id = u.id
+    LEFT JOIN produtos_usuario pr ON pr.usuario_id = u.id
+"""
+
+# Mesmas colunas da consulta legada, calculadas dos agregados. O desempate
+# por usuario_id deixa a ordem determinística entre leituras
+CONSULTA_USUARIOS = f"""
+    SELECT a.*, EXTRACT(DAYS FROM NOW() - a.ultima_compra) AS dias_sem_comprar
+    FROM ({CONSULTA_AGREGADOS_USUARIOS}) a
+    ORDER BY a.valor_total_compras DESC, a.usuario_id
+"""
+
+VIEW_FEATURES = 'mv_usuario_features'
+
+# `dias_sem_comprar` é calculado na leitura para não envelhecer entre refreshes
+CONSULTA_USUARIOS_VIEW = f"""
+    SELECT v.*, EXTRACT(DAYS FROM NOW() - v.ultima_compra) AS dias_sem_comprar
+    FROM {VIEW_FEATURES} v
+    ORDER BY v.valor_total_compras DESC, v.usuario_id
+"""
+
+
+def _primeiro(linha):
+    """Primeiro valor de uma linha de cursor comum (tupla) ou RealDictCursor (dict)"""
+    return list(linha.values())[0] if isinstance(linha, dict) else linha[0]
+
+
+def view_existe(cursor, view=VIEW_FEATURES):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (view,))
+    return bool(_primeiro(cursor.fetchone()))
+
+
+def criar_view_features(cursor):
+    """Criar `mv_usuario_features` (ou atualizá-la, se já existir)
+
+    O índice único em `usuario_id` permite o REFRESH ... CONCURRENTLY,
+    que não bloqueia as leituras durante a atualização. Retorna True se a
+    view foi criada agora.
+    """
+    if view_existe(cursor):
+        atualizar_view_features(cursor)
+        return False
+    cursor.execute(f"CREATE MATERIALIZED VIEW {VIEW_FEATURES} AS {CONSULTA_AGREGADOS_USUARIOS}")
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{VIEW_FEATURES}_usuario ON {VIEW_FEATURES}(usuario_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{VIEW_FEATURES}_segmento ON {VIEW_FEATURES}(segmento)")
+    return True
+
+
+def atualizar_view_features(cursor, concorrente=True):
+    """Recalcular `mv_usuario_features`
+
+    Com `concorrente`, as leituras continuam vendo a versão anterior
+    enquanto a nova é calculada (exige o índice único e a view populada).
+    """
+    modo = "CONCURRENTLY " if concorrente else ""
+    cursor.execute(f"REFRESH MATERIALIZED VIEW {modo}{VIEW_FEATURES}")
+
+
+def consulta_features_usuarios(cursor, materializada=True):
+    """SQL das features por usuário (uma linha por usuário, sem fan-out)
+
+    Com `materializada`, lê `mv_usuario_features` quando ela existe, em vez
+    de agregar `pedidos` e `itens_pedido` a cada chamada.
+    """
+    if materializada and view_existe(cursor):
+        return CONSULTA_USUARIOS_VIEW
+    return CONSULTA_USUARIOS
+
+
+def features_usuarios(cursor, materializada=True):
+    """Features por usuário como linhas do cursor"""
+    cursor.execute(consulta_features_usuarios(cursor, materializada))
+    return cursor.fetchall()
+
+
+# Colunas numéricas usadas pelo modelo de churn e seus tipos no COPY binário
+COLUNAS_FEATURES_CHURN = {
+    'valor_total_compras': 'numeric',
+    'total_pedidos': 'int8',
+    'ticket_medio': 'numeric',
+    'produtos_unicos': 'int8',
+    'dias_sem_comprar': 'numeric',
+    'variabilidade_gastos': 'numeric',
+}
+
+
+def exportar_features_churn(cursor, materializada=True, colunas=COLUNAS_FEATURES_CHURN):
+    """Features numéricas por usuário via COPY binário, direto em arrays NumPy
+
+    Para extrações grandes: evita criar um objeto Python por valor. NULLs
+    dos numéricos chegam como NaN.
+    """
+    return exportar_binario(cursor, consulta_features_usuarios(cursor, materializada), colunas)
+
+
+# Colunas de texto lidas pelo cursor, ao lado das numéricas do COPY binário
+COLUNAS_DESCRITIVAS = ['usuario_id', 'nome', 'segmento']
+
+
+def carregar_features_churn(cursor, materializada=True, colunas=COLUNAS_FEATURES_CHURN):
+    """DataFrame das features por usuário para a análise e o modelo de churn
+
+    As colunas descritivas vêm de um cursor do servidor e as numéricas de
+    `colunas` do COPY binário (`exportar_binario`), sem um objeto Python por
+    valor. As duas leituras rodam numa mesma transação REPEATABLE READ, que
+    vê um único snapshot, e por isso podem ser juntadas pela posição; a
+    conexão precisa estar ociosa (sem transação aberta) e fora de autocommit.
+    """
+    conn = cursor.connection
+    if conn.autocommit or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        raise RuntimeError("carregar_features_churn precisa de uma conexão ociosa e fora de autocommit")
+    try:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        consulta = consulta_features_usuarios(cursor, materializada)
+        descritivas = extrair_dataframe(conn, f"SELECT {', '.join(COLUNAS_DESCRITIVAS)} FROM ({consulta}) q")
+        numericas = exportar_binario(cursor, consulta, colunas)
+    finally:
+        conn.rollback()
+    return pd.concat([descritivas, numericas], axis=1)
+
+
+def _nos_plano(no):
+    yield no
+    for filho in no.get("Plans", []):
+        yield from _nos_plano(filho)
+
+
+def resumo_explain(plano):
+    """Tempo total e volume de linhas de um `EXPLAIN (ANALYZE, FORMAT JSON)`
+
+    `linhas_intermediarias` é o maior número de linhas produzido por um nó
+    do plano (linhas por execução vezes execuções), o que expõe o fan-out
+    dos joins; `linhas_processadas` soma as linhas de todos os nós.
+    """
+    if isinstance(plano, (tuple, dict)):
+        plano = _primeiro(plano)
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    raiz = plano[0]
+    linhas = [(no.get("Actual Rows", 0) * no.get("Actual Loops", 1), no["Node Type"])
+              for no in _nos_plano(raiz["Plan"])]
+    maior = max(linhas)
+    return {
+        "tempo_ms": raiz.get("Execution Time"),
+        "linhas_resultado": raiz["Plan"].get("Actual Rows"),
+        "linhas_intermediarias": maior[0],
+        "no_mais_largo": maior[1],
+        "linhas_processadas": sum(n for n, _ in linhas),
+    }
+
+
+def comparar_consultas(cursor, consultas=None, verbose=True):
+    """Rodar EXPLAIN ANALYZE em cada consulta e reportar tempo e linhas"""
+    consultas = consultas or {"legada": CONSULTA_USUARIOS_LEGADA, "pre-agregada": CONSULTA_USUARIOS}
+    relatorio = {}
+    for nome, consulta in consultas.items():
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {consulta}")
+        relatorio[nome] = resumo_explain(cursor.fetchone())
+        if verbose:
+            r = relatorio[nome]
+            print(f"  ⏱️ {nome}: {r['tempo_ms']:,.1f} ms, {r['linhas_resultado']:,} usuários, "
+                  f"{r['linhas_intermediarias']:,} linhas no nó mais largo ({r['no_mais_largo']}), "
+                  f"{r['linhas_processadas']:,} linhas processadas")
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da consulta de features de usuários")
+    # Sem os argumentos, valem PGHOST, PGDATABASE, PGUSER e PGPASSWORD (ou os padrões)
+    parser.add_argument('--host')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--pedidos', type=int, default=0,
+                        help="pedidos sintéticos adicionados só durante o benchmark (desfeitos no fim)")
+    parser.add_argument('--max-itens', type=int, default=5, help="itens por pedido sintético (1..N)")
+    args = parser.parse_args()
+
+    from scripts.carga_postgresql import mapa_ids, semear_pedidos
+    from scripts.conexao_postgresql import obter_pool
+
+    pool = obter_pool(tempo_limite_ms=0, host=args.host, database=args.database,
+                      user=args.user, password=args.password)
+    conn = pool.obter()
+    cursor = conn.cursor()
+    try:
+        if args.pedidos:
+            comeco = time.time()
+            ids_usuarios = list(mapa_ids(cursor, 'usuarios', 'usuario_id').values())
+            produtos = list(mapa_ids(cursor, 'produtos_relacional', 'produto_id'))
+            pedidos, itens = semear_pedidos(cursor, ids_usuarios, produtos, args.pedidos,
+                                            max_itens=args.max_itens, seed=42)
+            cursor.execute("ANALYZE pedidos")
+            cursor.execute("ANALYZE itens_pedido")
+            print(f"📥 {pedidos:,} pedidos e {itens:,} itens temporários em {time.time() - comeco:.1f}s")
+
+        consultas = {"legada": CONSULTA_USUARIOS_LEGADA, "pre-agregada": CONSULTA_USUARIOS}
+        if view_existe(cursor) and not args.pedidos:
+            consultas["materializada"] = CONSULTA_USUARIOS_VIEW
+        print("📊 Features de usuários - " + " x ".join(consultas) + ":")
+        relatorio = comparar_consultas(cursor, consultas)
+        legada, nova = relatorio["legada"], relatorio["pre-agregada"]
+        if nova["tempo_ms"]:
+            print(f"🚀 Speedup: {legada['tempo_ms'] / nova['tempo_ms']:.1f}x, linhas processadas "
+                  f"{legada['linhas_processadas']:,} -> {nova['linhas_processadas']:,}")
+    finally:
+        # Os pedidos sintéticos não são mantidos
+        conn.rollback()
+        cursor.close()
+        pool.devolver(conn)
+
+
+if __name__ == "__main__":
+    main()
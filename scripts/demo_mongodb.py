@@ -15,6 +15,12 @@ from pymongo import MongoClient
 import warnings
 warnings.filterwarnings('ignore')
 
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.features_comportamento import obter_features
+from scripts.consultas_analiticas import resumo_produtos
+
 # Configurações de visualização
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
@@ -39,28 +45,13 @@ def analisar_produtos(db):
     print("\n📊 ANÁLISE DE PRODUTOS")
     print("=" * 50)
     
-    produtos_collection = db['produtos']
+    # Totais, categorias e mais caros em uma única agregação ($facet)
+    resumo = resumo_produtos(db, mais_caros=3)
     
-    # Contar produtos
-    total_produtos = produtos_collection.count_documents({})
-    produtos_ativos = produtos_collection.count_documents({"ativo": True})
+    print(f"📦 Total de produtos: {resumo.total}")
+    print(f"✅ Produtos ativos: {resumo.ativos}")
     
-    print(f"📦 Total de produtos: {total_produtos}")
-    print(f"✅ Produtos ativos: {produtos_ativos}")
-    
-    # Análise por categoria
-    pipeline_categoria = [
-        {"$group": {
-            "_id": "$categoria",
-            "total_produtos": {"$sum": 1},
-            "preco_medio": {"$avg": "$preco"},
-            "estoque_total": {"$sum": "$estoque"},
-            "avaliacao_media": {"$avg": "$avaliacao_media"}
-        }},
-        {"$sort": {"total_produtos": -1}}
-    ]
-    
-    resultado_categoria = list(produtos_collection.aggregate(pipeline_categoria))
+    resultado_categoria = resumo.por_categoria
     
     print("\n📈 Análise por Categoria:")
     for cat in resultado_categoria:
@@ -70,11 +61,8 @@ def analisar_produtos(db):
         print(f"    Estoque total: {cat['estoque_total']}")
         print(f"    Avaliação média: {cat['avaliacao_media']:.1f}")
     
-    # Produtos mais caros
-    produtos_caros = produtos_collection.find({"ativo": True}).sort("preco", -1).limit(3)
-    
     print("\n💰 Top 3 Produtos Mais Caros:")
-    for produto in produtos_caros:
+    for produto in resumo.mais_caros:
         print(f"  {produto['nome']}: R$ {produto['preco']:.2f}")
     
     return resultado_categoria
@@ -84,58 +72,9 @@ def analisar_comportamento(db):
     print("\n👥 ANÁLISE DE COMPORTAMENTO")
     print("=" * 50)
     
-    comportamento_collection = db['usuarios_comportamento']
-    
-    # Pipeline para análise de comportamento
-    pipeline_comportamento = [
-        {"$unwind": "$eventos"},
-        {"$group": {
-            "_id": "$usuario_id",
-            "total_eventos": {"$sum": 1},
-            "page_views": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "page_view"]}, 1, 0]}
-            },
-            "clicks": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "click"]}, 1, 0]}
-            },
-            "add_to_cart": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "add_to_cart"]}, 1, 0]}
-            },
-            "searches": {
-                "$sum": {"$cond": [{"$eq": ["$eventos.tipo", "search"]}, 1, 0]}
-            },
-            "tempo_total": {"$sum": "$eventos.tempo_pagina"},
-            "produtos_unicos": {"$addToSet": "$eventos.produto_id"}
-        }},
-        {"$project": {
-            "usuario_id": "$_id",
-            "total_eventos": 1,
-            "page_views": 1,
-            "clicks": 1,
-            "add_to_cart": 1,
-            "searches": 1,
-            "tempo_total": 1,
-            "produtos_unicos": {"$size": "$produtos_unicos"},
-            "taxa_conversao": {
-                "$cond": [
-                    {"$gt": ["$page_views", 0]},
-                    {"$divide": ["$add_to_cart", "$page_views"]},
-                    0
-                ]
-            },
-            "tempo_medio_evento": {
-                "$cond": [
-                    {"$gt": ["$total_eventos", 0]},
-                    {"$divide": ["$tempo_total", "$total_eventos"]},
-                    0
-                ]
-            }
-        }},
-        {"$sort": {"total_eventos": -1}}
-    ]
-    
-    # Executar pipeline
-    comportamento_data = list(comportamento_collection.aggregate(pipeline_comportamento))
+    # Features por usuário já agregadas na coleção materializada
+    # (recalculada com $merge a cada carga de eventos)
+    comportamento_data = obter_features(db, incremental=True)
     
     if comportamento_data:
         comportamento_df = pd.DataFrame(comportamento_data)
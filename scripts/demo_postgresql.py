@@ -11,7 +11,6 @@ from datetime import datetime, timedelta
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -20,27 +19,29 @@ from sklearn.preprocessing import StandardScaler
 import warnings
 warnings.filterwarnings('ignore')
 
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.conexao_postgresql import obter_pool
+from scripts.consultas_postgresql import carregar_features_churn
+
 # Configurações de visualização
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 plt.rcParams['figure.figsize'] = (12, 8)
 
 def conectar_postgresql():
-    """Conectar ao PostgreSQL"""
+    """Conectar ao PostgreSQL (conexão do pool compartilhado, configurado por PGHOST, PGDATABASE, ...)"""
     try:
-        conn = psycopg2.connect(
-            host='localhost',
-            database='ecommerce_demo',
-            user='postgres',
-            password='postgres'
-        )
+        conn = obter_pool().obter()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         # Testar conexão
         cursor.execute("SELECT version();")
         version = cursor.fetchone()
+        conn.rollback()  # encerrar a transação do teste, a conexão fica ociosa
         print("✅ Conectado ao PostgreSQL com sucesso!")
-        print(f"📊 Versão: {version[0][:50]}...")
+        print(f"📊 Versão: {version['version'][:50]}...")
         
         return conn, cursor
     except Exception as e:
@@ -52,31 +53,10 @@ def analisar_usuarios(cursor):
     print("\n👥 ANÁLISE DE USUÁRIOS")
     print("=" * 50)
     
-    # Query para análise de usuários
-    query_usuarios = """
-        SELECT 
-            u.usuario_id,
-            u.nome,
-            u.segmento,
-            u.valor_total_compras,
-            COUNT(p.id) as total_pedidos,
-            AVG(p.valor_total) as ticket_medio,
-            COUNT(DISTINCT ip.produto_id) as produtos_unicos,
-            MAX(p.data_pedido) as ultima_compra,
-            EXTRACT(DAYS FROM NOW() - MAX(p.data_pedido)) as dias_sem_comprar,
-            COUNT(CASE WHEN p.status = 'concluido' THEN 1 END) as pedidos_concluidos,
-            COUNT(CASE WHEN p.status = 'pendente' THEN 1 END) as pedidos_pendentes,
-            COUNT(CASE WHEN p.status = 'cancelado' THEN 1 END) as pedidos_cancelados,
-            STDDEV(p.valor_total) as variabilidade_gastos
-        FROM usuarios u
-        LEFT JOIN pedidos p ON u.id = p.usuario_id
-        LEFT JOIN itens_pedido ip ON p.id = ip.pedido_id
-        GROUP BY u.usuario_id, u.nome, u.segmento, u.valor_total_compras
-        ORDER BY u.valor_total_compras DESC
-    """
-    
-    cursor.execute(query_usuarios)
-    usuarios_df = pd.DataFrame(cursor.fetchall())
+    # Features por usuário lidas de mv_usuario_features (ou, se a view
+    # não existir, com pedidos e itens pré-agregados na consulta): texto
+    # pelo cursor do servidor e as numéricas do churn pelo COPY binário
+    usuarios_df = carregar_features_churn(cursor)
     
     if not usuarios_df.empty:
         print(f"👤 Usuários analisados: {len(usuarios_df)}")
@@ -202,8 +182,8 @@ def main():
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
-            print("\n🔌 Conexão PostgreSQL fechada")
+            obter_pool().devolver(conn)
+            print("\n🔌 Conexão PostgreSQL devolvida ao pool")
 
 if __name__ == "__main__":
     success = main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Estatísticas da População - Análise Preditiva E-commerce
+Snapshot das estatísticas (médias, quantis, segmentos) usadas como limiares
+pelas regras de recomendação, calculado uma vez por versão dos dados
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+
+# Colunas que alimentam os limiares das regras
+COLUNAS_COMPORTAMENTO = ['usuario_id', 'total_eventos', 'taxa_conversao']
+COLUNAS_USUARIOS = ['usuario_id', 'segmento', 'total_pedidos', 'valor_total_compras']
+
+QUANTIS = [0.25, 0.5, 0.75, 0.9]
+
+# Snapshots já calculados, indexados pela versão dos dados
+_cache_estatisticas = {}
+TAMANHO_MAXIMO_CACHE = 8
+
+
+@dataclass(frozen=True)
+class EstatisticasPopulacao:
+    """Snapshot imutável das estatísticas de uma versão dos dados"""
+    versao: str
+    media_eventos: float
+    media_conversao: float
+    media_pedidos: float
+    quantis: dict = field(default_factory=dict)
+    contagem_segmentos: dict = field(default_factory=dict)
+    total_usuarios: int = 0
+    gerado_em: datetime = field(default_factory=datetime.now)
+
+    def para_documento(self):
+        """Converter o snapshot em documento (ex.: para gravar no MongoDB)"""
+        return {
+            "versao": self.versao,
+            "media_eventos": self.media_eventos,
+            "media_conversao": self.media_conversao,
+            "media_pedidos": self.media_pedidos,
+            "quantis": {coluna: {str(q): v for q, v in valores.items()}
+                        for coluna, valores in self.quantis.items()},
+            "contagem_segmentos": self.contagem_segmentos,
+            "total_usuarios": self.total_usuarios,
+            "gerado_em": self.gerado_em
+        }
+
+    @classmethod
+    def de_documento(cls, documento):
+        """Reconstruir o snapshot a partir de um documento salvo"""
+        return cls(
+            versao=documento["versao"],
+            media_eventos=documento["media_eventos"],
+            media_conversao=documento["media_conversao"],
+            media_pedidos=documento["media_pedidos"],
+            quantis={coluna: {float(q): v for q, v in valores.items()}
+                     for coluna, valores in documento.get("quantis", {}).items()},
+            contagem_segmentos=documento.get("contagem_segmentos", {}),
+            total_usuarios=documento.get("total_usuarios", 0),
+            gerado_em=documento.get("gerado_em", datetime.now())
+        )
+
+
+def versao_dados(usuarios_df, comportamento_df):
+    """Calcular a impressão digital das colunas usadas pelas regras
+
+    Qualquer alteração nos valores, na ordem ou no número de linhas gera
+    uma versão diferente, o que invalida o snapshot anterior.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for df, colunas in ((usuarios_df, COLUNAS_USUARIOS), (comportamento_df, COLUNAS_COMPORTAMENTO)):
+        presentes = [c for c in colunas if c in df.columns]
+        digest.update(','.join(presentes).encode())
+        digest.update(pd.util.hash_pandas_object(df[presentes], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def calcular_estatisticas(usuarios_df, comportamento_df, versao=None):
+    """Calcular o snapshot completo em uma única passada por coluna"""
+    if versao is None:
+        versao = versao_dados(usuarios_df, comportamento_df)
+
+    colunas_quantis = {
+        'total_eventos': comportamento_df['total_eventos'],
+        'taxa_conversao': comportamento_df['taxa_conversao'],
+        'total_pedidos': usuarios_df['total_pedidos'],
+    }
+    if 'valor_total_compras' in usuarios_df.columns:
+        colunas_quantis['valor_total_compras'] = usuarios_df['valor_total_compras']
+
+    quantis = {coluna: {q: float(v) for q, v in serie.quantile(QUANTIS).items()}
+               for coluna, serie in colunas_quantis.items()}
+
+    return EstatisticasPopulacao(
+        versao=versao,
+        media_eventos=float(comportamento_df['total_eventos'].mean()),
+        media_conversao=float(comportamento_df['taxa_conversao'].mean()),
+        media_pedidos=float(usuarios_df['total_pedidos'].mean()),
+        quantis=quantis,
+        contagem_segmentos={str(k): int(v) for k, v in usuarios_df['segmento'].value_counts().items()},
+        total_usuarios=int(usuarios_df['usuario_id'].nunique())
+    )
+
+
+def obter_estatisticas(usuarios_df, comportamento_df, versao=None):
+    """Obter o snapshot da versão atual dos dados, calculando só se mudou
+
+    Sem `versao`, a chave é a impressão digital de todas as linhas
+    (`versao_dados`), que muda com qualquer alteração dos dados, inclusive
+    no próprio DataFrame. Quem já conhece a versão do que carregou (e
+    garante que ela muda junto com os dados) pode informá-la e evitar essa
+    passada.
+    """
+    if versao is None:
+        versao = versao_dados(usuarios_df, comportamento_df)
+
+    estatisticas = _cache_estatisticas.get(versao)
+    if estatisticas is None:
+        estatisticas = calcular_estatisticas(usuarios_df, comportamento_df, versao)
+        if len(_cache_estatisticas) >= TAMANHO_MAXIMO_CACHE:
+            _cache_estatisticas.pop(next(iter(_cache_estatisticas)))
+        _cache_estatisticas[versao] = estatisticas
+
+    return estatisticas
+
+
+def limpar_cache_estatisticas():
+    """Descartar todos os snapshots em memória"""
+    _cache_estatisticas.clear()
+
+
+def salvar_estatisticas(db, estatisticas):
+    """Gravar o snapshot no MongoDB, junto dos dados que o originaram"""
+    db['estatisticas_populacao'].replace_one(
+        {"versao": estatisticas.versao},
+        estatisticas.para_documento(),
+        upsert=True
+    )
+
+
+def carregar_estatisticas(db, versao):
+    """Carregar do MongoDB o snapshot de uma versão (None se não existir)"""
+    documento = db['estatisticas_populacao'].find_one({"versao": versao}, {"_id": 0})
+    if documento is None:
+        return None
+    return EstatisticasPopulacao.de_documento(documento)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Eventos em Buckets - Análise Preditiva E-commerce
+Armazena os eventos de comportamento no padrão bucket: cada documento de
+`eventos_buckets` guarda no máximo `EVENTOS_POR_BUCKET` eventos de um
+usuário em um dia, com contadores pré-calculados. Acrescentar um evento é
+um único `$push` + `$inc` com upsert no bucket corrente, e as features de
+`features_comportamento` somam os contadores dos buckets em vez de
+desenrolar cada evento
+"""
+
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+from scripts.features_comportamento import CONTADORES_EVENTOS, RAZOES
+from scripts.fluxo_comportamento import DOCUMENTOS_POR_LOTE, agrupar_em_lotes
+
+COLECAO_BUCKETS = 'eventos_buckets'
+COLECAO_SESSOES = 'usuarios_comportamento'
+EVENTOS_POR_BUCKET = 200
+
+# Tipo de evento -> contador do bucket
+CAMPO_POR_TIPO = {tipo: campo for campo, tipo in CONTADORES_EVENTOS.items()}
+
+# (coleção, chaves, nome, opções), no formato de `indices_mongodb.INDICES`
+INDICES_BUCKETS = [
+    # Localiza o bucket corrente de um usuário no append
+    (COLECAO_BUCKETS, [("usuario_id", ASCENDING), ("dia", ASCENDING), ("n", ASCENDING)],
+     'idx_buckets_usuario_dia', {}),
+    (COLECAO_BUCKETS, [("fim", ASCENDING)], 'idx_buckets_fim', {}),
+]
+
+
+def criar_indices_buckets(db):
+    """Criar os índices de `eventos_buckets`"""
+    for colecao, chaves, nome, opcoes in INDICES_BUCKETS:
+        db[colecao].create_index(chaves, name=nome, **opcoes)
+
+
+def _dia(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def _append(usuario_id, evento, eventos_por_bucket):
+    """(filtro, atualização) que acrescentam `evento` ao bucket corrente
+
+    O filtro só casa buckets do mesmo dia com espaço livre; quando não há
+    nenhum, o upsert abre um bucket novo. O custo de escrita é o de um
+    evento, independentemente de quantos o usuário já tem.
+    """
+    timestamp = evento["timestamp"]
+    incrementos = {"n": 1, "total_eventos": 1, "tempo_total": evento.get("tempo_pagina", 0)}
+    campo = CAMPO_POR_TIPO.get(evento["tipo"])
+    if campo:
+        incrementos[campo] = 1
+
+    atualizacao = {
+        "$push": {"eventos": evento},
+        "$inc": incrementos,
+        "$min": {"inicio": timestamp},
+        "$max": {"fim": timestamp},
+    }
+    if evento.get("produto_id") is not None:
+        atualizacao["$addToSet"] = {"produtos": evento["produto_id"]}
+
+    filtro = {"usuario_id": usuario_id, "dia": _dia(timestamp), "n": {"$lt": eventos_por_bucket}}
+    return filtro, atualizacao
+
+
+def registrar_evento(collection, usuario_id, evento, eventos_por_bucket=EVENTOS_POR_BUCKET):
+    """Acrescentar um evento ao bucket corrente do usuário"""
+    filtro, atualizacao = _append(usuario_id, evento, eventos_por_bucket)
+    collection.update_one(filtro, atualizacao, upsert=True)
+
+
+def registrar_eventos(collection, eventos, eventos_por_bucket=EVENTOS_POR_BUCKET,
+                      tamanho_lote=DOCUMENTOS_POR_LOTE):
+    """Acrescentar um iterável de (usuario_id, evento) em lotes de `bulk_write`
+
+    Cada lote é um `bulk_write` ordenado: as operações são aplicadas na
+    ordem do iterável, que não é reordenado. Eventos de um usuário passados
+    em ordem cronológica preenchem um bucket antes de abrir o próximo.
+    Retorna o total gravado.
+    """
+    total = 0
+    lote = []
+    for usuario_id, evento in eventos:
+        lote.append(UpdateOne(*_append(usuario_id, evento, eventos_por_bucket), upsert=True))
+        if len(lote) >= tamanho_lote:
+            collection.bulk_write(lote, ordered=True)
+            total += len(lote)
+            lote = []
+    if lote:
+        collection.bulk_write(lote, ordered=True)
+        total += len(lote)
+    return total
+
+
+def _eventos_legados(documentos):
+    for documento in documentos:
+        for evento in sorted(documento.get("eventos", []), key=lambda e: e["timestamp"]):
+            yield documento["usuario_id"], evento
+
+
+def gravar_comportamento(db, documentos, recriar=False, eventos_por_bucket=EVENTOS_POR_BUCKET,
+                         tamanho_lote=DOCUMENTOS_POR_LOTE):
+    """Gravar documentos de comportamento com os eventos nos buckets
+
+    Cada documento (como os de `fluxo_comportamento`) vai para
+    `usuarios_comportamento` só com os dados da sessão, sem o array
+    `eventos`; os eventos seguem em ordem cronológica para os buckets por
+    `registrar_eventos`. `documentos` é consumido em lotes, podendo ser um
+    gerador. Com `recriar`, os buckets existentes são apagados antes.
+    Retorna (sessões, eventos) gravados.
+    """
+    criar_indices_buckets(db)
+    if recriar:
+        db[COLECAO_BUCKETS].delete_many({})
+    sessoes = eventos = 0
+    for lote in agrupar_em_lotes(documentos, tamanho_lote):
+        db[COLECAO_SESSOES].insert_many(
+            [{campo: valor for campo, valor in documento.items() if campo != "eventos"} for documento in lote],
+            ordered=False)
+        sessoes += len(lote)
+        eventos += registrar_eventos(db[COLECAO_BUCKETS], _eventos_legados(lote), eventos_por_bucket, tamanho_lote)
+    return sessoes, eventos
+
+
+def migrar_comportamento(db, origem=COLECAO_SESSOES, recriar=False,
+                         eventos_por_bucket=EVENTOS_POR_BUCKET):
+    """Copiar os arrays `eventos` legados de `usuarios_comportamento` para `eventos_buckets`
+
+    Para dados gravados antes dos buckets; cargas novas usam
+    `gravar_comportamento`. A coleção de origem é lida em fluxo e não é alterada. Com `recriar`,
+    os buckets existentes são apagados antes. Retorna o número de eventos
+    migrados.
+    """
+    criar_indices_buckets(db)
+    if recriar:
+        db[COLECAO_BUCKETS].delete_many({})
+    documentos = db[origem].find({}, {"usuario_id": 1, "eventos": 1}).sort("usuario_id", ASCENDING)
+    return registrar_eventos(db[COLECAO_BUCKETS], _eventos_legados(documentos), eventos_por_bucket)
+
+
+def filtro_buckets(marca=None, limite=None):
+    """Filtro dos buckets com algum evento no intervalo (`marca`, `limite`]"""
+    filtro = {}
+    if marca is not None:
+        filtro["fim"] = {"$gt": marca}
+    if limite is not None:
+        filtro["inicio"] = {"$lte": limite}
+    return filtro
+
+
+def _bucket_inteiro(marca, limite):
+    """Expressão verdadeira quando todos os eventos do bucket estão no intervalo"""
+    condicoes = []
+    if marca is not None:
+        condicoes.append({"$gt": ["$inicio", marca]})
+    if limite is not None:
+        condicoes.append({"$lte": ["$fim", limite]})
+    return {"$and": condicoes}
+
+
+def _no_intervalo(marca, limite, campo="$$e.timestamp"):
+    condicoes = []
+    if marca is not None:
+        condicoes.append({"$gt": [campo, marca]})
+    if limite is not None:
+        condicoes.append({"$lte": [campo, limite]})
+    return condicoes
+
+
+def estagios_produtos_buckets(marca=None, limite=None):
+    """Estágios que reduzem cada bucket com eventos em (`marca`, `limite`] a
+    (usuario_id, produtos), ordenados por usuário
+
+    Buckets inteiros no intervalo entregam o conjunto `produtos` gravado;
+    só os das bordas filtram os produtos dos próprios eventos.
+    """
+    filtro = filtro_buckets(marca, limite)
+    estagios = [{"$match": filtro}] if filtro else []
+    produtos = {"$ifNull": ["$produtos", []]}
+    if marca is not None or limite is not None:
+        produtos = {"$cond": [_bucket_inteiro(marca, limite), produtos, {"$map": {
+            "input": {"$filter": {"input": "$eventos", "as": "e", "cond": {"$and": [
+                *_no_intervalo(marca, limite), {"$ne": ["$$e.produto_id", None]}]}}},
+            "as": "e", "in": "$$e.produto_id"}}]}
+    return estagios + [
+        {"$sort": {"usuario_id": ASCENDING}},
+        {"$project": {"_id": 0, "usuario_id": 1, "produtos": produtos}},
+    ]
+
+
+def estagios_features_buckets(marca=None, limite=None, distintos=True):
+    """Estágios de features por usuário a partir dos contadores dos buckets
+
+    Produzem os mesmos campos de `features_comportamento._estagios_agregacao`
+    sem `$unwind`: buckets inteiros no intervalo (`marca`, `limite`]
+    contribuem com os contadores gravados, e só os das bordas do intervalo
+    filtram o próprio array `eventos`. `produtos_unicos` vem da união dos
+    conjuntos `produtos` de cada bucket (fica de fora sem `distintos`).
+    """
+    filtro = filtro_buckets(marca, limite)
+    estagios = [{"$match": filtro}] if filtro else []
+
+    if marca is None and limite is None:
+        contribuicao = {
+            "total_eventos": "$total_eventos",
+            **{campo: f"${campo}" for campo in CONTADORES_EVENTOS},
+            "tempo_total": "$tempo_total",
+            "produtos": {"$ifNull": ["$produtos", []]},
+        }
+    else:
+        no_intervalo = _no_intervalo(marca, limite)
+        estagios.append({"$set": {
+            "_inteiro": _bucket_inteiro(marca, limite),
+            "_eventos": {"$filter": {"input": "$eventos", "as": "e", "cond": {"$and": no_intervalo}}},
+        }})
+
+        def contador(campo, parcial):
+            return {"$cond": ["$_inteiro", f"${campo}", parcial]}
+
+        contribuicao = {
+            "total_eventos": contador("total_eventos", {"$size": "$_eventos"}),
+            **{
+                campo: contador(campo, {"$size": {"$filter": {
+                    "input": "$_eventos", "as": "e", "cond": {"$eq": ["$$e.tipo", tipo]}}}})
+                for campo, tipo in CONTADORES_EVENTOS.items()
+            },
+            "tempo_total": contador("tempo_total", {"$sum": "$_eventos.tempo_pagina"}),
+            # Repetições saem na união de conjuntos do `$project` final
+            "produtos": {"$cond": ["$_inteiro", {"$ifNull": ["$produtos", []]}, {"$filter": {
+                "input": "$_eventos.produto_id", "as": "p", "cond": {"$ne": ["$$p", None]}}}]},
+        }
+    estagios.append({"$project": {"_id": 0, "usuario_id": 1, **contribuicao}})
+
+    somas = {campo: {"$sum": f"${campo}"} for campo in ["total_eventos", *CONTADORES_EVENTOS, "tempo_total"]}
+    conjunto = {"produtos": {"$push": "$produtos"}} if distintos else {}
+    tamanho = {"produtos_unicos": {"$size": {
+        "$reduce": {"input": "$produtos", "initialValue": [],
+                    "in": {"$setUnion": ["$$value", "$$this"]}}
+    }}} if distintos else {}
+    return estagios + [
+        {"$group": {"_id": "$usuario_id", **somas, **conjunto}},
+        # Buckets de borda podem não ter nenhum evento dentro do intervalo
+        {"$match": {"total_eventos": {"$gt": 0}}},
+        {"$project": {
+            "_id": 0,
+            "usuario_id": "$_id",
+            "total_eventos": 1,
+            **{campo: 1 for campo in CONTADORES_EVENTOS},
+            "tempo_total": 1,
+            **tamanho,
+            **RAZOES,
+            "atualizado_em": "$$NOW"
+        }},
+    ]
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Extração PostgreSQL - Análise Preditiva E-commerce
+Lê o resultado de uma consulta por um cursor nomeado (server-side) em
+blocos de `tamanho_bloco` linhas, montando cada bloco como colunas NumPy a
+partir de tuplas (sem um dict por linha), de modo que só um bloco fica em
+memória do lado Python por vez. Para tabelas numéricas largas há também a
+exportação por `COPY ... TO STDOUT WITH (FORMAT binary)`, decodificada em
+blocos à medida que o fluxo chega, direto em arrays NumPy sem criar um
+objeto Python por valor
+
+Uso (benchmark cursor x COPY binário):
+    python scripts/extracao_postgresql.py --linhas 1000000
+"""
+
+import argparse
+import datetime
+import decimal
+import itertools
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TAMANHO_BLOCO_PADRAO = 50_000
+
+# Bytes do fluxo COPY acumulados antes de decodificar um bloco de tuplas
+BYTES_POR_BLOCO_COPY = 8 * 1024 * 1024
+
+# Cabeçalho fixo de um fluxo PGCOPY binário
+ASSINATURA_PGCOPY = b"PGCOPY\n\xff\r\n\x00"
+
+# Tipo da coluna -> (conversão no SQL, formato big-endian no fluxo, valor
+# que substitui NULL no servidor). numeric não tem largura fixa e vira
+# float8; NULL vira NaN ou -infinity para manter as tuplas de largura fixa
+TIPOS_BINARIOS = {
+    'int2': ('int2', '>i2', None),
+    'int4': ('int4', '>i4', None),
+    'int8': ('int8', '>i8', None),
+    'float4': ('float4', '>f4', "'NaN'"),
+    'float8': ('float8', '>f8', "'NaN'"),
+    'numeric': ('float8', '>f8', "'NaN'"),
+    'bool': ('bool', '?', None),
+    # Microssegundos desde 2000-01-01; timestamptz chega em UTC e vira
+    # datetime64 sem fuso em UTC, como no caminho do cursor (`_coluna`)
+    'timestamp': ('timestamp', '>i8', "'-infinity'"),
+    'timestamptz': ('timestamptz', '>i8', "'-infinity'"),
+    # Dias desde 2000-01-01
+    'date': ('date', '>i4', "'-infinity'"),
+    'text': ('text', None, None),
+}
+
+# Formato do módulo struct equivalente a cada dtype do fluxo
+FORMATOS_STRUCT = {'>i2': '>h', '>i4': '>i', '>i8': '>q', '>f4': '>f', '>f8': '>d', '?': '?'}
+
+# 2000-01-01 em relação a 1970-01-01
+EPOCA_2000_US = 946_684_800_000_000
+EPOCA_2000_DIAS = 10_957
+
+_contador_cursores = itertools.count()
+
+
+def _coluna(valores):
+    """Array de uma coluna: float64 para numéricos (NULL -> NaN), int64 para
+    inteiros sem NULL, datetime64 para datas e object para o resto
+
+    `timestamptz` (datetimes com fuso, possivelmente com offsets diferentes
+    no mesmo bloco, como numa mudança de horário de verão) vira datetime64
+    sem fuso em UTC, a mesma convenção de `decodificar_pgcopy`.
+    """
+    n = len(valores)
+    amostra = next((v for v in valores if v is not None), None)
+    if isinstance(amostra, bool):
+        return np.array(valores, dtype=object if None in valores else bool)
+    if isinstance(amostra, int) and None not in valores:
+        return np.fromiter(valores, dtype=np.int64, count=n)
+    if isinstance(amostra, (int, float, decimal.Decimal)):
+        return np.fromiter((np.nan if v is None else float(v) for v in valores), dtype=np.float64, count=n)
+    if isinstance(amostra, (datetime.datetime, datetime.date)):
+        return pd.to_datetime(pd.Series(valores, dtype=object), utc=True).dt.tz_convert(None).to_numpy()
+    colunas = np.empty(n, dtype=object)
+    colunas[:] = valores
+    return colunas
+
+
+def bloco_para_dataframe(linhas, nomes):
+    """DataFrame a partir de uma lista de tuplas, coluna a coluna"""
+    if not linhas:
+        return pd.DataFrame(columns=nomes)
+    return pd.DataFrame({nome: _coluna(valores) for nome, valores in zip(nomes, zip(*linhas))})
+
+
+def extrair_em_blocos(conn, consulta, parametros=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Gerar DataFrames de até `tamanho_bloco` linhas do resultado de `consulta`
+
+    Usa um cursor nomeado (o resultado fica no servidor e é lido com FETCH)
+    com a fábrica de cursores padrão do psycopg2, que devolve tuplas mesmo
+    quando a conexão usa RealDictCursor. A conexão não pode estar em
+    autocommit, pois cursores nomeados vivem dentro de uma transação. Um
+    resultado vazio gera um único DataFrame vazio com as colunas.
+    """
+    nome = f"extracao_{next(_contador_cursores)}"
+    with conn.cursor(name=nome, cursor_factory=psycopg2.extensions.cursor) as cursor:
+        cursor.itersize = tamanho_bloco
+        cursor.execute(consulta, parametros)
+        nomes = None
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if nomes is None:
+                # Em cursores nomeados a descrição só existe após o primeiro FETCH
+                nomes = [coluna[0] for coluna in cursor.description]
+            elif not linhas:
+                break
+            yield bloco_para_dataframe(linhas, nomes)
+            if len(linhas) < tamanho_bloco:
+                break
+
+
+def extrair_dataframe(conn, consulta, parametros=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """DataFrame único com o resultado de `consulta`, lido em blocos e concatenado uma vez"""
+    blocos = list(extrair_em_blocos(conn, consulta, parametros, tamanho_bloco))
+    return blocos[0] if len(blocos) == 1 else pd.concat(blocos, ignore_index=True)
+
+
+def extrair_em_paralelo(pool, consultas, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Extrair várias consultas ao mesmo tempo, uma conexão do `pool` por consulta
+
+    `pool` é um `PoolPostgreSQL` (scripts/conexao_postgresql.py); `consultas`
+    é um dict nome -> SQL. Retorna um dict nome -> DataFrame.
+    """
+    def extrair(consulta):
+        with pool.conexao() as conn:
+            return extrair_dataframe(conn, consulta, tamanho_bloco=tamanho_bloco)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(consultas), pool.maximo))) as executor:
+        futuros = {nome: executor.submit(extrair, consulta) for nome, consulta in consultas.items()}
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+
+def consulta_binaria(consulta, colunas):
+    """COPY binário de `consulta` com cada coluna convertida para o tipo de `colunas`
+
+    `colunas` é um dict ordenado nome -> tipo de `TIPOS_BINARIOS`.
+    """
+    expressoes = []
+    for nome, tipo in colunas.items():
+        conversao, _, nulo = TIPOS_BINARIOS[tipo]
+        expressao = f'q."{nome}"::{conversao}'
+        expressoes.append(f"COALESCE({expressao}, {nulo})" if nulo else expressao)
+    selecao = ', '.join(expressoes)
+    return f"COPY (SELECT {selecao} FROM ({consulta}) q) TO STDOUT WITH (FORMAT binary)"
+
+
+def _inicio_dados(dados):
+    """Posição da primeira tupla, depois do cabeçalho e da sua extensão"""
+    if dados[:len(ASSINATURA_PGCOPY)] != ASSINATURA_PGCOPY:
+        raise ValueError("fluxo não é um COPY binário do PostgreSQL")
+    posicao = len(ASSINATURA_PGCOPY) + 4
+    (extensao,) = struct.unpack_from('>i', dados, posicao)
+    return posicao + 4 + extensao
+
+
+def _finalizar(tipo, valores, nulos=None):
+    """Converter os valores brutos de uma coluna para o dtype final"""
+    if tipo in ('timestamp', 'timestamptz', 'date'):
+        brutos = valores.astype(np.int64)
+        # -infinity/infinity (NULL substituído no servidor) viram NaT
+        limites = np.iinfo(np.int64 if tipo != 'date' else np.int32)
+        infinitos = (brutos == limites.min) | (brutos == limites.max)
+        if tipo == 'date':
+            resultado = (brutos + EPOCA_2000_DIAS).astype('datetime64[D]')
+        else:
+            resultado = (np.where(infinitos, 0, brutos) + EPOCA_2000_US).astype('datetime64[us]')
+        resultado[infinitos] = np.datetime64('NaT')
+    elif tipo == 'text':
+        resultado = valores
+    else:
+        resultado = valores.astype(np.dtype(TIPOS_BINARIOS[tipo][1]).newbyteorder('='))
+
+    if nulos is None or not nulos.any():
+        return resultado
+    if resultado.dtype.kind == 'M':
+        resultado[nulos] = np.datetime64('NaT')
+    elif resultado.dtype.kind == 'b':
+        resultado = resultado.astype(object)
+        resultado[nulos] = None
+    elif resultado.dtype.kind in 'iuf':
+        resultado = resultado.astype(np.float64)
+        resultado[nulos] = np.nan
+    return resultado
+
+
+def _registro(colunas):
+    """dtype estruturado de uma tupla de largura fixa: 2 bytes de contagem e,
+    por campo, 4 de tamanho + o valor"""
+    campos = [('n', '>i2')]
+    for i, tipo in enumerate(colunas.values()):
+        campos += [(f't{i}', '>i4'), (f'v{i}', TIPOS_BINARIOS[tipo][1])]
+    return np.dtype(campos)
+
+
+def _primeira_tupla_invalida(linhas, registro):
+    """Índice da primeira tupla fora da largura fixa esperada, ou None"""
+    n_campos = (len(registro.names) - 1) // 2
+    erradas = linhas['n'] != n_campos
+    for i in range(n_campos):
+        erradas |= linhas[f't{i}'] != registro[f'v{i}'].itemsize
+    return int(np.argmax(erradas)) if erradas.any() else None
+
+
+def _coluna_nula(dados, inicio, colunas):
+    """Nome da primeira coluna NULL na tupla que começa em `inicio`, ou None"""
+    if len(dados) < inicio + 2 or struct.unpack_from('>h', dados, inicio)[0] != len(colunas):
+        return None
+    posicao = inicio + 2
+    for nome in colunas:
+        if len(dados) < posicao + 4:
+            return None
+        tamanho = struct.unpack_from('>i', dados, posicao)[0]
+        if tamanho < 0:
+            return nome
+        posicao += 4 + tamanho
+    return None
+
+
+def _decodificar_vetorizado(dados, inicio, colunas):
+    """Decodificar tuplas de largura fixa com um dtype estruturado, ou None
+
+    Sem NULLs e sem colunas de texto, toda tupla tem o mesmo tamanho
+    (2 bytes de contagem e, por campo, 4 de tamanho + o valor), então o
+    corpo inteiro é lido por `np.frombuffer` sem laço em Python.
+    """
+    if 'text' in colunas.values():
+        return None
+    registro = _registro(colunas)
+
+    corpo = len(dados) - inicio - 2
+    if corpo < 0 or corpo % registro.itemsize:
+        return None
+    linhas = np.frombuffer(dados, dtype=registro, count=corpo // registro.itemsize, offset=inicio)
+    if _primeira_tupla_invalida(linhas, registro) is not None:
+        return None
+    return {nome: _finalizar(tipo, linhas[f'v{i}']) for i, (nome, tipo) in enumerate(colunas.items())}
+
+
+def _decodificar_linhas(dados, inicio, colunas):
+    """Decodificação tupla a tupla, para fluxos com NULLs ou texto
+
+    Cria objetos Python por valor (como o fetch pelo cursor); só é usada
+    por `decodificar_pgcopy`, e não pelo `exportar_binario` em fluxo.
+    """
+    tipos = list(colunas.values())
+    formatos = [TIPOS_BINARIOS[tipo][1] for tipo in tipos]
+    formatos_struct = [FORMATOS_STRUCT.get(f) for f in formatos]
+    valores = [[] for _ in tipos]
+    nulos = [[] for _ in tipos]
+    posicao = inicio
+    while True:
+        (n_campos,) = struct.unpack_from('>h', dados, posicao)
+        posicao += 2
+        if n_campos == -1:
+            break
+        for i, formato in enumerate(formatos_struct):
+            (tamanho,) = struct.unpack_from('>i', dados, posicao)
+            posicao += 4
+            nulos[i].append(tamanho == -1)
+            if tamanho == -1:
+                valores[i].append(None if formato is None else 0)
+                continue
+            if formato is None:
+                valores[i].append(bytes(dados[posicao:posicao + tamanho]).decode('utf-8'))
+            else:
+                valores[i].append(struct.unpack_from(formato, dados, posicao)[0])
+            posicao += tamanho
+
+    resultado = {}
+    for i, (nome, tipo) in enumerate(colunas.items()):
+        if tipo == 'text':
+            brutos = np.empty(len(valores[i]), dtype=object)
+            brutos[:] = valores[i]
+        else:
+            brutos = np.array(valores[i], dtype=np.dtype(formatos[i]).newbyteorder('='))
+        resultado[nome] = _finalizar(tipo, brutos, np.array(nulos[i], dtype=bool))
+    return resultado
+
+
+def decodificar_pgcopy(dados, colunas):
+    """Arrays NumPy (nome -> array) de um fluxo `COPY ... (FORMAT binary)`
+
+    Decodifica um fluxo já inteiro em memória. Tenta o caminho vetorizado
+    de largura fixa e recorre à leitura tupla a tupla (um objeto Python por
+    valor, tão lenta quanto o fetch) quando há NULLs ou texto. Inteiros com
+    NULL viram float64 (NaN), datas com NULL viram NaT e `timestamptz` vira
+    datetime64 sem fuso em UTC.
+    """
+    inicio = _inicio_dados(dados)
+    arrays = _decodificar_vetorizado(dados, inicio, colunas)
+    return arrays if arrays is not None else _decodificar_linhas(dados, inicio, colunas)
+
+
+class DecodificadorPgcopy:
+    """Destino de `copy_expert` que decodifica o COPY binário em blocos
+
+    Os bytes recebidos são acumulados até `bytes_por_bloco` e as tuplas
+    completas viram arrays NumPy com um único `np.frombuffer`; só o resto
+    de uma tupla incompleta fica pendente. Aceita apenas tipos de largura
+    fixa sem NULL: texto é recusado na criação, e um NULL numa coluna sem
+    valor substituto no servidor (inteiros e bool) gera ValueError em vez
+    de cair na leitura tupla a tupla (use float8/numeric para inteiros
+    anuláveis).
+    """
+
+    def __init__(self, colunas, bytes_por_bloco=BYTES_POR_BLOCO_COPY):
+        largura_variavel = [nome for nome, tipo in colunas.items() if TIPOS_BINARIOS[tipo][1] is None]
+        if largura_variavel:
+            raise ValueError(f"colunas de largura variável no COPY binário: {largura_variavel}")
+        self.colunas = colunas
+        self.registro = _registro(colunas)
+        self.bytes_por_bloco = bytes_por_bloco
+        self._pendente = bytearray()
+        self._cabecalho_lido = False
+        self._blocos = []
+        self._tuplas = 0
+
+    def write(self, dados):
+        self._pendente += dados
+        if len(self._pendente) >= self.bytes_por_bloco:
+            self._decodificar_bloco()
+        return len(dados)
+
+    def _decodificar_bloco(self):
+        if not self._cabecalho_lido:
+            if len(self._pendente) < len(ASSINATURA_PGCOPY) + 8:
+                return
+            inicio = _inicio_dados(self._pendente)
+            if len(self._pendente) < inicio:
+                return
+            del self._pendente[:inicio]
+            self._cabecalho_lido = True
+
+        n = len(self._pendente) // self.registro.itemsize
+        if not n:
+            return
+        tamanho = n * self.registro.itemsize
+        linhas = np.frombuffer(bytes(self._pendente[:tamanho]), dtype=self.registro)
+        tupla = _primeira_tupla_invalida(linhas, self.registro)
+        if tupla is not None:
+            self._recusar(tupla * self.registro.itemsize, self._tuplas + tupla)
+        self._blocos.append(linhas)
+        self._tuplas += n
+        del self._pendente[:tamanho]
+
+    def _recusar(self, inicio, tupla):
+        nome = _coluna_nula(self._pendente, inicio, self.colunas)
+        if nome is None:
+            raise ValueError(f"fluxo COPY binário incompleto ou malformado na tupla {tupla}")
+        raise ValueError(f"tupla {tupla}: NULL na coluna {nome!r} ({self.colunas[nome]}), que não tem "
+                         "valor substituto no COPY binário; converta-a para float8 ou numeric")
+
+    def resultado(self):
+        """Arrays NumPy (nome -> array) de todas as tuplas recebidas"""
+        self._decodificar_bloco()
+        if bytes(self._pendente) != struct.pack('>h', -1):
+            self._recusar(0, self._tuplas)
+        linhas = (np.concatenate(self._blocos) if self._blocos
+                  else np.empty(0, dtype=self.registro))
+        return {nome: _finalizar(tipo, linhas[f'v{i}']) for i, (nome, tipo) in enumerate(self.colunas.items())}
+
+
+def exportar_binario(cursor, consulta, colunas, bytes_por_bloco=BYTES_POR_BLOCO_COPY):
+    """Rodar `consulta` como COPY binário e devolver um DataFrame com as `colunas`
+
+    O fluxo é decodificado em blocos enquanto chega (`DecodificadorPgcopy`),
+    sem guardar o COPY inteiro em memória nem criar objetos por valor.
+    """
+    decodificador = DecodificadorPgcopy(colunas, bytes_por_bloco)
+    cursor.copy_expert(consulta_binaria(consulta, colunas), decodificador)
+    return pd.DataFrame(decodificador.resultado(), columns=list(colunas))
+
+
+# Tabela numérica larga gerada no servidor para o benchmark
+CONSULTA_BENCHMARK = """
+    SELECT i AS id,
+           random() * 1000 AS valor_total,
+           (random() * 100)::numeric(12, 2) AS ticket_medio,
+           (random() * 50)::int4 AS total_pedidos,
+           random() AS taxa_conversao,
+           now() - i * interval '1 second' AS ultima_compra
+    FROM generate_series(1, {linhas}) i
+"""
+
+COLUNAS_BENCHMARK = {
+    'id': 'int8',
+    'valor_total': 'float8',
+    'ticket_medio': 'numeric',
+    'total_pedidos': 'int4',
+    'taxa_conversao': 'float8',
+    'ultima_compra': 'timestamptz',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: fetch por cursor x COPY binário")
+    # Sem os argumentos, valem PGHOST, PGDATABASE, PGUSER e PGPASSWORD (ou os padrões)
+    parser.add_argument('--host')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    from scripts.conexao_postgresql import obter_pool
+
+    pool = obter_pool(tempo_limite_ms=0, host=args.host, database=args.database,
+                      user=args.user, password=args.password)
+    conn = pool.obter()
+    consulta = CONSULTA_BENCHMARK.format(linhas=args.linhas)
+    try:
+        cursor = conn.cursor()
+        comeco = time.time()
+        cursor.execute(consulta)
+        pd.DataFrame(cursor.fetchall(), columns=list(COLUNAS_BENCHMARK))
+        tempo_fetch = time.time() - comeco
+
+        comeco = time.time()
+        extrair_dataframe(conn, consulta)
+        tempo_blocos = time.time() - comeco
+
+        comeco = time.time()
+        exportar_binario(cursor, consulta, COLUNAS_BENCHMARK)
+        tempo_binario = time.time() - comeco
+
+        print(f"📊 {args.linhas:,} linhas x {len(COLUNAS_BENCHMARK)} colunas")
+        print(f"  fetchall:        {tempo_fetch:.2f}s")
+        print(f"  cursor nomeado:  {tempo_blocos:.2f}s")
+        print(f"  COPY binário:    {tempo_binario:.2f}s ({tempo_fetch / tempo_binario:.1f}x mais rápido que fetchall)")
+    finally:
+        conn.rollback()
+        pool.devolver(conn)
+
+
+if __name__ == "__main__":
+    main()
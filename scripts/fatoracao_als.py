@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Fatoração de Matrizes ALS (feedback implícito) - Análise Preditiva E-commerce
+Treina fatores latentes de usuários e produtos a partir da matriz de
+interações de `eventos_buckets` (Hu, Koren & Volinsky, 2008)
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from scipy import sparse
+
+from scripts.selecao_top_k import top_k
+
+# Hiperparâmetros padrão
+FATORES_PADRAO = 32
+REGULARIZACAO_PADRAO = 0.1
+ALPHA_PADRAO = 40.0
+ITERACOES_PADRAO = 10
+PASSOS_CG_PADRAO = 3
+
+# Limite de elementos (interações x fatores) processados por bloco de linhas
+# (2**22 floats = 16 MB em float32 por matriz temporária)
+ELEMENTOS_POR_BLOCO = 2 ** 22
+
+ARQUIVO_FATORES_USUARIOS = 'fatores_usuarios.npy'
+ARQUIVO_FATORES_PRODUTOS = 'fatores_produtos.npy'
+ARQUIVO_IDS_USUARIOS = 'ids_usuarios.npy'
+ARQUIVO_IDS_PRODUTOS = 'ids_produtos.npy'
+ARQUIVO_METADADOS = 'metadados.json'
+
+
+@dataclass
+class ModeloALS:
+    """Fatores latentes treinados e os ids que indexam suas linhas"""
+    fatores_usuarios: np.ndarray
+    fatores_produtos: np.ndarray
+    ids_usuarios: np.ndarray
+    ids_produtos: np.ndarray
+
+    def __post_init__(self):
+        self._posicao_usuario = {str(u): i for i, u in enumerate(self.ids_usuarios)}
+        self._posicao_produto = {str(p): i for i, p in enumerate(self.ids_produtos)}
+
+    def indice_usuario(self, usuario_id):
+        """Linha do usuário nas matrizes de fatores (None se desconhecido)"""
+        return self._posicao_usuario.get(str(usuario_id))
+
+    def indice_produto(self, produto_id):
+        """Linha do produto nas matrizes de fatores (None se desconhecido)"""
+        return self._posicao_produto.get(str(produto_id))
+
+    def recomendar(self, usuario_id, k=5, excluir=None, indice=None):
+        """Recomendar k produtos com um único produto matriz-vetor
+
+        `excluir` é uma coleção opcional de índices de produtos (por exemplo,
+        os já comprados) que não devem ser recomendados. Com um `indice`
+        (`indice_ann.IndiceIVF` sobre os fatores de produtos), os candidatos
+        vêm da busca aproximada em vez do catálogo inteiro.
+        """
+        i = self.indice_usuario(usuario_id)
+        if i is None:
+            return []
+
+        return self._buscar(self.fatores_usuarios[i], k, excluir, indice)
+
+    def similares(self, produto_id, k=5, indice=None):
+        """Listar os k produtos mais próximos de um produto no espaço latente"""
+        j = self.indice_produto(produto_id)
+        if j is None:
+            return []
+
+        return self._buscar(self.fatores_produtos[j], k, [j], indice)
+
+    def _buscar(self, consulta, k, excluir, indice):
+        """Top-k por produto interno, exato ou via índice aproximado"""
+        if indice is not None:
+            indices, valores = indice.buscar(consulta, k, excluir=excluir)
+        else:
+            scores = self.fatores_produtos @ consulta
+            if excluir is not None and len(excluir):
+                scores[np.asarray(list(excluir), dtype=np.intp)] = -np.inf
+            indices, valores = top_k(scores, k)
+
+        return [(str(self.ids_produtos[j]), float(v)) for j, v in zip(indices, valores) if np.isfinite(v)]
+
+
+def _blocos_por_nnz(indptr, limite_nnz):
+    """Dividir as linhas em blocos contíguos com até `limite_nnz` interações"""
+    n_linhas = len(indptr) - 1
+    inicio = 0
+    while inicio < n_linhas:
+        fim = int(np.searchsorted(indptr, indptr[inicio] + limite_nnz, side='right')) - 1
+        fim = min(max(fim, inicio + 1), n_linhas)
+        yield inicio, fim
+        inicio = fim
+
+
+def _resolver_bloco(confianca, fixos, gram, regularizacao, passos_cg, inicio, fim, saida):
+    """Atualizar um bloco de linhas com gradiente conjugado em lote
+
+    Para cada linha u resolve (YtY + Yu^T (Cu - I) Yu + λI) x_u = Yu^T Cu p_u
+    sem montar as matrizes f x f por usuário: o produto A·x é calculado com
+    operações esparsas sobre todas as interações do bloco. A solução atual
+    em `saida` serve de ponto de partida (warm start).
+    """
+    bloco = confianca[inicio:fim]
+    n_linhas = fim - inicio
+    tamanhos = np.diff(bloco.indptr)
+    linhas = np.repeat(np.arange(n_linhas), tamanhos)
+    Yu = fixos[bloco.indices]
+    excesso = bloco.data - 1
+
+    def aplicar_A(x):
+        projecao = np.einsum('nf,nf->n', Yu, x[linhas])
+        pesos = sparse.csr_matrix((excesso * projecao, bloco.indices, bloco.indptr), shape=bloco.shape)
+        return x @ gram + regularizacao * x + pesos @ fixos
+
+    x = np.array(saida[inicio:fim])
+    b = bloco @ fixos
+    r = b - aplicar_A(x)
+    p = r.copy()
+    rs_antigo = np.einsum('nf,nf->n', r, r)
+
+    for _ in range(passos_cg):
+        if not np.any(rs_antigo > 1e-20):
+            break
+        Ap = aplicar_A(p)
+        pAp = np.einsum('nf,nf->n', p, Ap)
+        alpha = np.divide(rs_antigo, pAp, out=np.zeros_like(rs_antigo), where=pAp > 0)
+        x += alpha[:, None] * p
+        r -= alpha[:, None] * Ap
+        rs_novo = np.einsum('nf,nf->n', r, r)
+        beta = np.divide(rs_novo, rs_antigo, out=np.zeros_like(rs_novo), where=rs_antigo > 0)
+        p = r + beta[:, None] * p
+        rs_antigo = rs_novo
+
+    # Linhas sem interações têm solução exata zero
+    x[tamanhos == 0] = 0
+    saida[inicio:fim] = x
+
+
+def _passo_als(confianca, fixos, saida, regularizacao, passos_cg, executor):
+    """Atualizar todas as linhas de `saida` mantendo `fixos` constantes"""
+    gram = fixos.T @ fixos
+    limite_nnz = max(1, ELEMENTOS_POR_BLOCO // fixos.shape[1])
+    tarefas = [
+        executor.submit(_resolver_bloco, confianca, fixos, gram, regularizacao, passos_cg, inicio, fim, saida)
+        for inicio, fim in _blocos_por_nnz(confianca.indptr, limite_nnz)
+    ]
+    for tarefa in tarefas:
+        tarefa.result()
+
+
+def treinar_als(matriz, fatores=FATORES_PADRAO, regularizacao=REGULARIZACAO_PADRAO,
+                alpha=ALPHA_PADRAO, iteracoes=ITERACOES_PADRAO, passos_cg=PASSOS_CG_PADRAO,
+                n_threads=None, seed=42, verbose=True):
+    """Treinar fatores de usuários e produtos por mínimos quadrados alternados
+
+    `matriz` é a matriz esparsa usuário x produto de pesos de interação
+    (ver `filtragem_colaborativa.construir_matriz_interacoes`). Cada metade
+    da iteração resolve os sistemas de todas as linhas com `passos_cg` passos
+    de gradiente conjugado; os blocos de linhas são processados em paralelo
+    por um pool de threads, já que NumPy/SciPy liberam o GIL no cálculo.
+    """
+    usuarios_produtos = sparse.csr_matrix(matriz, dtype=np.float32)
+    usuarios_produtos.sort_indices()
+    usuarios_produtos.data = 1.0 + alpha * usuarios_produtos.data
+    produtos_usuarios = usuarios_produtos.T.tocsr()
+    produtos_usuarios.sort_indices()
+
+    n_usuarios, n_produtos = usuarios_produtos.shape
+    rng = np.random.default_rng(seed)
+    X = (rng.standard_normal((n_usuarios, fatores)) * 0.01).astype(np.float32)
+    Y = (rng.standard_normal((n_produtos, fatores)) * 0.01).astype(np.float32)
+
+    n_threads = n_threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for iteracao in range(1, iteracoes + 1):
+            inicio = time.time()
+            _passo_als(usuarios_produtos, Y, X, regularizacao, passos_cg, executor)
+            _passo_als(produtos_usuarios, X, Y, regularizacao, passos_cg, executor)
+            if verbose:
+                print(f"  Iteração {iteracao}/{iteracoes}: {time.time() - inicio:.2f}s")
+
+    return X, Y
+
+
+def salvar_modelo(diretorio, modelo, **metadados):
+    """Salvar os fatores (float32) e os ids em arquivos .npy"""
+    os.makedirs(diretorio, exist_ok=True)
+    np.save(os.path.join(diretorio, ARQUIVO_FATORES_USUARIOS), modelo.fatores_usuarios.astype(np.float32))
+    np.save(os.path.join(diretorio, ARQUIVO_FATORES_PRODUTOS), modelo.fatores_produtos.astype(np.float32))
+    np.save(os.path.join(diretorio, ARQUIVO_IDS_USUARIOS), np.asarray(modelo.ids_usuarios, dtype=str))
+    np.save(os.path.join(diretorio, ARQUIVO_IDS_PRODUTOS), np.asarray(modelo.ids_produtos, dtype=str))
+
+    metadados.update({
+        "fatores": int(modelo.fatores_usuarios.shape[1]),
+        "usuarios": int(modelo.fatores_usuarios.shape[0]),
+        "produtos": int(modelo.fatores_produtos.shape[0]),
+    })
+    with open(os.path.join(diretorio, ARQUIVO_METADADOS), 'w', encoding='utf-8') as f:
+        json.dump(metadados, f, ensure_ascii=False, indent=2, default=str)
+
+
+def carregar_modelo(diretorio, mmap=True):
+    """Carregar um modelo salvo; com `mmap` os fatores ficam mapeados em memória"""
+    modo = 'r' if mmap else None
+    return ModeloALS(
+        fatores_usuarios=np.load(os.path.join(diretorio, ARQUIVO_FATORES_USUARIOS), mmap_mode=modo),
+        fatores_produtos=np.load(os.path.join(diretorio, ARQUIVO_FATORES_PRODUTOS), mmap_mode=modo),
+        ids_usuarios=np.load(os.path.join(diretorio, ARQUIVO_IDS_USUARIOS)),
+        ids_produtos=np.load(os.path.join(diretorio, ARQUIVO_IDS_PRODUTOS))
+    )
+
+
+def treinar_de_mongodb(db, diretorio=None, **parametros):
+    """Treinar o modelo com os eventos de `eventos_buckets`"""
+    from scripts.eventos_buckets import COLECAO_BUCKETS
+    from scripts.filtragem_colaborativa import carregar_interacoes, construir_matriz_interacoes
+
+    interacoes = carregar_interacoes(db[COLECAO_BUCKETS])
+    matriz, ids_usuarios, ids_produtos = construir_matriz_interacoes(interacoes)
+
+    print(f"🧮 Treinando ALS: {matriz.shape[0]} usuários x {matriz.shape[1]} produtos, "
+          f"{matriz.nnz} interações")
+    X, Y = treinar_als(matriz, **parametros)
+    modelo = ModeloALS(X, Y, ids_usuarios, ids_produtos)
+
+    if diretorio:
+        salvar_modelo(diretorio, modelo, **parametros)
+        print(f"✅ Modelo salvo em '{diretorio}'")
+
+    return modelo
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Features de Comportamento - Análise Preditiva E-commerce
+Agrega os eventos uma vez por carga e grava o resultado na coleção
+materializada `features_comportamento` (um documento por `usuario_id`, via
+`$merge`); as análises leem essa coleção. Os eventos vêm dos buckets de
+`eventos_buckets` (somando os contadores de cada bucket) quando essa
+coleção está populada, e de `usuarios_comportamento` caso contrário. No modo
+incremental só os eventos posteriores à marca d'água da última execução
+são agregados e somados às features gravadas. Opcionalmente,
+`produtos_unicos` é estimado por HyperLogLog em vez de `$addToSet`
+(montado dos conjuntos `produtos` dos buckets e gravado esparso enquanto o
+usuário tem poucos produtos)
+"""
+
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from scripts.hyperloglog import HyperLogLog, precisao_para_erro
+
+COLECAO_FEATURES = 'features_comportamento'
+INDICE_FEATURES = 'idx_features_usuario'
+COLECAO_CONTROLE = 'controle_features'
+COLECAO_EVENTOS_LEGADA = 'usuarios_comportamento'
+
+# Contadores aditivos, somados entre execuções no modo incremental
+CONTADORES_ADITIVOS = ["total_eventos", "page_views", "clicks", "add_to_cart",
+                       "searches", "view_product", "tempo_total"]
+
+# Campo de saída -> tipo de evento contado
+CONTADORES_EVENTOS = {
+    "page_views": "page_view",
+    "clicks": "click",
+    "add_to_cart": "add_to_cart",
+    "searches": "search",
+    "view_product": "view_product",
+}
+
+
+def criar_indice_features(db):
+    """Índice único em `usuario_id`, exigido pelo `$merge ... on: usuario_id`"""
+    db[COLECAO_FEATURES].create_index([("usuario_id", ASCENDING)], unique=True, name=INDICE_FEATURES)
+
+
+def _razao(numerador, denominador):
+    return {"$cond": [{"$gt": [denominador, 0]}, {"$divide": [numerador, denominador]}, 0]}
+
+
+# Razões derivadas, recalculadas a partir dos contadores
+RAZOES = {
+    "taxa_conversao": _razao("$add_to_cart", "$page_views"),
+    "tempo_medio_evento": _razao("$tempo_total", "$total_eventos"),
+}
+
+
+def _faixa(marca=None, limite=None):
+    """Condição sobre `eventos.timestamp` para o intervalo (`marca`, `limite`]"""
+    faixa = {}
+    if marca is not None:
+        faixa["$gt"] = marca
+    if limite is not None:
+        faixa["$lte"] = limite
+    return faixa or None
+
+
+def _estagios_agregacao(faixa=None, distintos=True):
+    """Estágios `$unwind` / `$group` / `$project` comuns aos dois modos
+
+    `faixa` é uma condição sobre `eventos.timestamp` (por exemplo
+    `{"$gt": marca, "$lte": limite}`); ela filtra os documentos antes do
+    `$unwind` (pelo índice em `eventos.timestamp`) e os eventos depois dele.
+    Sem `distintos`, `produtos_unicos` fica fora do `$group` (e é
+    preenchido por `atualizar_distintos_hll`).
+    """
+    contadores = {
+        campo: {"$sum": {"$cond": [{"$eq": ["$eventos.tipo", tipo]}, 1, 0]}}
+        for campo, tipo in CONTADORES_EVENTOS.items()
+    }
+    filtro = [{"$match": {"eventos.timestamp": faixa}}] if faixa else []
+    conjunto = {"produtos_unicos": {"$addToSet": "$eventos.produto_id"}} if distintos else {}
+    tamanho = {"produtos_unicos": {"$size": "$produtos_unicos"}} if distintos else {}
+    return filtro + [
+        {"$unwind": "$eventos"},
+        *filtro,
+        {"$group": {
+            "_id": "$usuario_id",
+            "total_eventos": {"$sum": 1},
+            **contadores,
+            "tempo_total": {"$sum": "$eventos.tempo_pagina"},
+            **conjunto
+        }},
+        # Sem o _id do $group, o destino mantém os próprios _id
+        {"$project": {
+            "_id": 0,
+            "usuario_id": "$_id",
+            "total_eventos": 1,
+            **{campo: 1 for campo in CONTADORES_EVENTOS},
+            "tempo_total": 1,
+            **tamanho,
+            **RAZOES,
+            "atualizado_em": "$$NOW"
+        }},
+    ]
+
+
+def _estagios(marca, limite, distintos, buckets):
+    if buckets:
+        # Import local: eventos_buckets importa deste módulo
+        from scripts.eventos_buckets import estagios_features_buckets
+        return estagios_features_buckets(marca, limite, distintos)
+    return _estagios_agregacao(_faixa(marca, limite), distintos)
+
+
+def pipeline_features(destino=COLECAO_FEATURES, limite=None, distintos=True, buckets=False):
+    """Pipeline que agrega os eventos por usuário e faz `$merge` no destino
+
+    Com `limite`, só entram eventos com `timestamp <= limite`. Com
+    `buckets`, o pipeline roda sobre `eventos_buckets`.
+    """
+    return _estagios(None, limite, distintos, buckets) + [
+        {"$merge": {
+            "into": destino,
+            "on": "usuario_id",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+def pipeline_features_incremental(marca, limite, destino=COLECAO_FEATURES, distintos=True, buckets=False):
+    """Pipeline que agrega os eventos em (`marca`, `limite`] e os soma ao destino
+
+    Usuários novos entram com as features parciais; nos já existentes os
+    contadores aditivos são somados (`$$new` é o documento parcial) e as
+    razões recalculadas. `produtos_unicos` não é aditivo: com `distintos`
+    fica o maior valor entre o gravado e o parcial, um limite inferior até
+    a próxima materialização completa; sem `distintos` ele não é tocado
+    (o HyperLogLog gravado é mesclado por `atualizar_distintos_hll`).
+    """
+    somas = {
+        campo: {"$add": [{"$ifNull": [f"${campo}", 0]}, f"$$new.{campo}"]}
+        for campo in CONTADORES_ADITIVOS
+    }
+    if distintos:
+        somas["produtos_unicos"] = {"$max": [{"$ifNull": ["$produtos_unicos", 0]}, "$$new.produtos_unicos"]}
+    return _estagios(marca, limite, distintos, buckets) + [
+        {"$merge": {
+            "into": destino,
+            "on": "usuario_id",
+            "whenMatched": [
+                {"$set": {
+                    **somas,
+                    "atualizado_em": "$$new.atualizado_em"
+                }},
+                {"$set": RAZOES}
+            ],
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+def _origem(db):
+    """Coleção de eventos lida pelas features: `eventos_buckets` se populada"""
+    from scripts.eventos_buckets import COLECAO_BUCKETS
+    if db[COLECAO_BUCKETS].estimated_document_count():
+        return COLECAO_BUCKETS
+    return COLECAO_EVENTOS_LEGADA
+
+
+def _filtro_origem(origem, marca=None, limite=None):
+    """Documentos de `origem` com algum evento em (`marca`, `limite`]"""
+    if origem == COLECAO_EVENTOS_LEGADA:
+        faixa = _faixa(marca, limite)
+        return {"eventos.timestamp": faixa} if faixa else {}
+    from scripts.eventos_buckets import filtro_buckets
+    return filtro_buckets(marca, limite)
+
+
+def _produtos_legados(marca, limite):
+    """Produtos dos eventos de um documento legado dentro de (`marca`, `limite`]"""
+    def produtos(documento):
+        return (
+            evento["produto_id"] for evento in documento.get("eventos", [])
+            if evento.get("produto_id") is not None
+            and (marca is None or evento["timestamp"] > marca)
+            and (limite is None or evento["timestamp"] <= limite)
+        )
+    return produtos
+
+
+def _hll_por_usuario(documentos, precisao, produtos):
+    """(usuario_id, HyperLogLog) a partir de documentos ordenados por usuário"""
+    for usuario_id, grupo in groupby(documentos, key=itemgetter("usuario_id")):
+        hll = HyperLogLog(precisao)
+        for documento in grupo:
+            hll.atualizar(produtos(documento))
+        yield usuario_id, hll
+
+
+def atualizar_distintos_hll(db, precisao, marca=None, limite=None, tamanho_lote=1000, origem=None):
+    """Estimar `produtos_unicos` com HyperLogLog lendo os produtos em fluxo
+
+    Os documentos de `origem` com eventos em (`marca`, `limite`] são lidos
+    ordenados por `usuario_id` (pelo índice), então só o HyperLogLog do
+    usuário corrente fica em construção. Dos buckets chega só o conjunto de
+    produtos de cada um (`estagios_produtos_buckets`); do comportamento
+    legado, os eventos. Com `marca`, cada HyperLogLog é mesclado ao gravado
+    em `produtos_hll`, o que mantém a contagem exata entre execuções
+    incrementais. Retorna o número de usuários atualizados.
+    """
+    origem = origem or _origem(db)
+    if origem == COLECAO_EVENTOS_LEGADA:
+        documentos = db[origem].find(
+            _filtro_origem(origem, marca, limite),
+            {"_id": 0, "usuario_id": 1, "eventos.produto_id": 1, "eventos.timestamp": 1}
+        ).sort("usuario_id", ASCENDING)
+        produtos = _produtos_legados(marca, limite)
+    else:
+        from scripts.eventos_buckets import estagios_produtos_buckets
+        documentos = db[origem].aggregate(estagios_produtos_buckets(marca, limite), allowDiskUse=True)
+        produtos = itemgetter("produtos")
+
+    atualizados = 0
+    lote = []
+
+    def gravar(lote):
+        anteriores = {}
+        if marca is not None:
+            anteriores = {
+                documento["usuario_id"]: documento["produtos_hll"]
+                for documento in db[COLECAO_FEATURES].find(
+                    {"usuario_id": {"$in": [usuario_id for usuario_id, _ in lote]},
+                     "produtos_hll": {"$exists": True}},
+                    {"_id": 0, "usuario_id": 1, "produtos_hll": 1})
+            }
+        operacoes = []
+        for usuario_id, hll in lote:
+            if usuario_id in anteriores:
+                hll.mesclar(HyperLogLog.de_bytes(anteriores[usuario_id]))
+            operacoes.append(UpdateOne(
+                {"usuario_id": usuario_id},
+                {"$set": {"produtos_unicos": len(hll), "produtos_hll": hll.para_bytes()}}
+            ))
+        db[COLECAO_FEATURES].bulk_write(operacoes, ordered=False)
+        return len(operacoes)
+
+    for item in _hll_por_usuario(documentos, precisao, produtos):
+        lote.append(item)
+        if len(lote) >= tamanho_lote:
+            atualizados += gravar(lote)
+            lote = []
+    if lote:
+        atualizados += gravar(lote)
+    return atualizados
+
+
+def _ler_controle(db):
+    return db[COLECAO_CONTROLE].find_one({"_id": COLECAO_FEATURES}) or {}
+
+
+def obter_marca(db):
+    """Marca d'água (maior `eventos.timestamp` já agregado) ou None"""
+    return _ler_controle(db).get("marca_dagua")
+
+
+def _gravar_marca(db, marca, modo, precisao_hll=None):
+    db[COLECAO_CONTROLE].update_one(
+        {"_id": COLECAO_FEATURES},
+        {"$set": {"marca_dagua": marca, "modo": modo, "precisao_hll": precisao_hll,
+                  "executado_em": datetime.now()}},
+        upsert=True
+    )
+
+
+def _materializar(db, recriar, precisao_hll):
+    criar_indice_features(db)
+    if recriar:
+        db[COLECAO_FEATURES].delete_many({})
+    limite = datetime.now()
+    origem = _origem(db)
+    pipeline = pipeline_features(limite=limite, distintos=precisao_hll is None,
+                                 buckets=origem != COLECAO_EVENTOS_LEGADA)
+    db[origem].aggregate(pipeline, allowDiskUse=True)
+    if precisao_hll is not None:
+        atualizar_distintos_hll(db, precisao_hll, limite=limite, origem=origem)
+    _gravar_marca(db, limite, 'completo', precisao_hll)
+    return db[COLECAO_FEATURES].count_documents({})
+
+
+def materializar_features(db, recriar=False, erro_distintos=None):
+    """Recalcular `features_comportamento` a partir de todos os eventos
+
+    Com `recriar`, a coleção é esvaziada antes (para quando os eventos de
+    origem foram apagados e recarregados). Com `erro_distintos` (por
+    exemplo 0.02), `produtos_unicos` é estimado por HyperLogLog com esse
+    erro padrão em vez de um `$addToSet` por usuário no `$group`. Grava a
+    marca d'água (e o modo) usados pelo modo incremental. Retorna o número
+    de usuários na coleção materializada.
+    """
+    precisao_hll = precisao_para_erro(erro_distintos) if erro_distintos else None
+    return _materializar(db, recriar, precisao_hll)
+
+
+def atualizar_features_incremental(db):
+    """Agregar só os eventos novos desde a última execução
+
+    Supõe eventos somente anexados, com `timestamp` não anterior à marca
+    d'água: eventos gravados depois com data retroativa não são vistos
+    (use `materializar_features(db, recriar=True)` após recargas). Sem
+    marca gravada, faz a materialização completa. Retorna o número de
+    documentos de eventos (buckets ou comportamento legado) com eventos
+    novos (ou, na materialização completa, o de usuários).
+    """
+    controle = _ler_controle(db)
+    marca = controle.get("marca_dagua")
+    precisao_hll = controle.get("precisao_hll")
+    if marca is None or db[COLECAO_FEATURES].estimated_document_count() == 0:
+        return _materializar(db, False, precisao_hll)
+
+    limite = datetime.now()
+    origem = _origem(db)
+    afetados = db[origem].count_documents(_filtro_origem(origem, marca, limite))
+    if afetados:
+        pipeline = pipeline_features_incremental(marca, limite, distintos=precisao_hll is None,
+                                                 buckets=origem != COLECAO_EVENTOS_LEGADA)
+        db[origem].aggregate(pipeline, allowDiskUse=True)
+        if precisao_hll is not None:
+            atualizar_distintos_hll(db, precisao_hll, marca, limite, origem=origem)
+    _gravar_marca(db, limite, 'incremental', precisao_hll)
+    return afetados
+
+
+def carregar_features(db, filtro=None):
+    """Ler as features materializadas, ordenadas pelo total de eventos"""
+    cursor = db[COLECAO_FEATURES].find(filtro or {}, {"_id": 0, "atualizado_em": 0, "produtos_hll": 0})
+    return list(cursor.sort("total_eventos", DESCENDING))
+
+
+def obter_features(db, incremental=False):
+    """Ler as features, materializando-as antes se a coleção estiver vazia
+
+    Com `incremental`, os eventos posteriores à marca d'água são agregados
+    antes da leitura.
+    """
+    if incremental:
+        atualizar_features_incremental(db)
+    elif db[COLECAO_FEATURES].estimated_document_count() == 0:
+        materializar_features(db)
+    return carregar_features(db)
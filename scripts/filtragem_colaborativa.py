@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Filtragem Colaborativa Item-Item - Análise Preditiva E-commerce
+Similaridade entre produtos a partir da matriz esparsa usuário x produto
+construída com os eventos de `eventos_buckets`
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Peso de cada tipo de evento na matriz de interações
+PESOS_EVENTOS = {
+    "page_view": 1.0,
+    "click": 2.0,
+    "add_to_cart": 4.0,
+}
+
+# Quantidade de produtos similares guardados por produto
+N_SIMILARES_PADRAO = 20
+
+# Produtos processados por bloco no produto de matrizes esparsas
+TAMANHO_BLOCO_ITENS = 512
+
+
+def pipeline_interacoes(pesos=PESOS_EVENTOS):
+    """Pipeline que soma, no servidor, o peso de cada par (usuário, produto)"""
+    ramos = [
+        {"case": {"$eq": ["$eventos.tipo", tipo]}, "then": peso}
+        for tipo, peso in pesos.items()
+    ]
+    return [
+        {"$unwind": "$eventos"},
+        {"$match": {
+            "eventos.tipo": {"$in": list(pesos)},
+            "eventos.produto_id": {"$exists": True}
+        }},
+        {"$group": {
+            "_id": {"usuario_id": "$usuario_id", "produto_id": "$eventos.produto_id"},
+            "peso": {"$sum": {"$switch": {"branches": ramos, "default": 0}}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "usuario_id": "$_id.usuario_id",
+            "produto_id": "$_id.produto_id",
+            "peso": 1
+        }}
+    ]
+
+
+def carregar_interacoes(collection, pesos=PESOS_EVENTOS, batch_size=10000):
+    """Ler os pares (usuário, produto, peso) agregados pelo MongoDB
+
+    `collection` é a de eventos (`eventos_buckets`): o pipeline desenrola o
+    array `eventos` de cada documento, seja ele um bucket ou um documento
+    legado de `usuarios_comportamento`.
+    """
+    cursor = collection.aggregate(pipeline_interacoes(pesos), allowDiskUse=True, batchSize=batch_size)
+    interacoes = pd.DataFrame(list(cursor), columns=['usuario_id', 'produto_id', 'peso'])
+    return interacoes
+
+
+def construir_matriz_interacoes(interacoes, ids_produtos=None):
+    """Construir a matriz esparsa CSR usuário x produto
+
+    Pares repetidos são somados. Retorna a matriz e os arrays de ids que
+    mapeiam linhas (usuários) e colunas (produtos).
+    """
+    codigos_usuarios, ids_usuarios = pd.factorize(interacoes['usuario_id'])
+    if ids_produtos is None:
+        codigos_produtos, ids_produtos = pd.factorize(interacoes['produto_id'])
+    else:
+        ids_produtos = pd.Index(ids_produtos)
+        codigos_produtos = ids_produtos.get_indexer(interacoes['produto_id'])
+        validos = codigos_produtos >= 0
+        codigos_usuarios, codigos_produtos = codigos_usuarios[validos], codigos_produtos[validos]
+        interacoes = interacoes[validos]
+
+    matriz = sparse.csr_matrix(
+        (interacoes['peso'].to_numpy(dtype=np.float32), (codigos_usuarios, codigos_produtos)),
+        shape=(len(ids_usuarios), len(ids_produtos))
+    )
+    matriz.sum_duplicates()
+    return matriz, np.asarray(ids_usuarios, dtype=object), np.asarray(ids_produtos, dtype=object)
+
+
+def _top_n_por_linha(bloco, n, offset_diagonal=None):
+    """Manter os n maiores valores de cada linha de um bloco CSR
+
+    Se `offset_diagonal` for informado, descarta a coluna igual a
+    `linha + offset_diagonal` (o próprio produto). Retorna linhas locais,
+    colunas, valores e a posição de cada valor no ranking da linha.
+    """
+    bloco = bloco.tocsr()
+    linhas = np.repeat(np.arange(bloco.shape[0]), np.diff(bloco.indptr))
+    colunas, valores = bloco.indices, bloco.data
+
+    if offset_diagonal is not None:
+        fora_diagonal = colunas != linhas + offset_diagonal
+        linhas, colunas, valores = linhas[fora_diagonal], colunas[fora_diagonal], valores[fora_diagonal]
+
+    # Ordenar por linha e, dentro da linha, por valor decrescente
+    ordem = np.lexsort((-valores, linhas))
+    linhas, colunas, valores = linhas[ordem], colunas[ordem], valores[ordem]
+
+    inicio_linha = np.searchsorted(linhas, np.arange(bloco.shape[0]))
+    posicao = np.arange(len(linhas)) - inicio_linha[linhas]
+    manter = posicao < n
+    return linhas[manter], colunas[manter], valores[manter], posicao[manter]
+
+
+def calcular_similares(matriz, n_similares=N_SIMILARES_PADRAO, tamanho_bloco=TAMANHO_BLOCO_ITENS):
+    """Calcular os N produtos mais similares (cosseno) de cada produto
+
+    A similaridade é calculada por blocos de produtos com produtos de
+    matrizes esparsas; a matriz densa produtos x produtos nunca é criada.
+    Retorna uma matriz CSR produtos x produtos com até N valores por linha.
+    """
+    matriz = sparse.csr_matrix(matriz, dtype=np.float32)
+    n_produtos = matriz.shape[1]
+
+    # Normalizar as colunas para que o produto interno seja o cosseno
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=0)).ravel())
+    inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+    normalizada = (matriz @ sparse.diags(inversas.astype(np.float32))).tocsc()
+    transposta = normalizada.T.tocsr()
+
+    linhas, colunas, valores = [], [], []
+    for inicio in range(0, n_produtos, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n_produtos)
+        bloco = transposta[inicio:fim] @ normalizada
+        l, c, v, _ = _top_n_por_linha(bloco, n_similares, offset_diagonal=inicio)
+        linhas.append(l + inicio)
+        colunas.append(c)
+        valores.append(v)
+
+    return sparse.csr_matrix(
+        (np.concatenate(valores).astype(np.float32), (np.concatenate(linhas), np.concatenate(colunas))),
+        shape=(n_produtos, n_produtos)
+    )
+
+
+def produtos_similares(similares, ids_produtos, produto_id, n=5):
+    """Listar (produto_id, score) dos produtos mais similares a um produto"""
+    posicoes = np.flatnonzero(ids_produtos == produto_id)
+    if len(posicoes) == 0:
+        return []
+
+    linha = similares.getrow(posicoes[0])
+    ordem = np.argsort(-linha.data, kind='stable')[:n]
+    return [(ids_produtos[linha.indices[i]], float(linha.data[i])) for i in ordem]
+
+
+def recomendar_por_similaridade(matriz, similares, k=5, excluir_vistos=True, tamanho_bloco=TAMANHO_BLOCO_ITENS * 8):
+    """Recomendar k produtos por usuário somando as similaridades dos itens vistos
+
+    O score é a média das similaridades ponderada pelos pesos das
+    interações do usuário, ficando entre 0 e 1. Retorna (indices, scores) com shape (usuarios, k); posições sem
+    candidato ficam com índice -1 e score 0.
+    """
+    n_usuarios = matriz.shape[0]
+    indices = np.full((n_usuarios, k), -1, dtype=np.int64)
+    scores = np.zeros((n_usuarios, k), dtype=np.float32)
+
+    for inicio in range(0, n_usuarios, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n_usuarios)
+        usuarios = matriz[inicio:fim]
+        totais = np.asarray(usuarios.sum(axis=1)).ravel()
+        inversos = np.divide(1.0, totais, out=np.zeros_like(totais), where=totais > 0)
+        candidatos = (sparse.diags(inversos.astype(np.float32)) @ (usuarios @ similares)).tocsr()
+
+        if excluir_vistos:
+            # Zerar os produtos com que o usuário já interagiu
+            candidatos = candidatos - candidatos.multiply(usuarios.astype(bool))
+            candidatos.eliminate_zeros()
+
+        linhas, colunas, valores, posicao = _top_n_por_linha(candidatos, k)
+        indices[inicio + linhas, posicao] = colunas
+        scores[inicio + linhas, posicao] = valores
+
+    return indices, scores
+
+
+def documentos_recomendacao(ids_usuarios, ids_produtos, indices, scores, versao="v3.0",
+                             algoritmo="collaborative_filtering", motivo="produtos_similares"):
+    """Montar os documentos da coleção `recomendacoes` a partir do top-k"""
+    agora = datetime.now(timezone.utc)
+    documentos = []
+    for i, usuario_id in enumerate(ids_usuarios):
+        recomendacoes = [
+            {
+                "produto_id": ids_produtos[j],
+                "score": float(score),
+                "motivo": motivo,
+                "timestamp": agora
+            }
+            for j, score in zip(indices[i], scores[i]) if j >= 0
+        ]
+        documentos.append({
+            "usuario_id": usuario_id,
+            "algoritmo": algoritmo,
+            "versao": versao,
+            "recomendacoes": recomendacoes,
+            "data_geracao": agora
+        })
+    return documentos
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Fluxo de Documentos de Comportamento - Análise Preditiva E-commerce
+Gera os documentos aninhados de `usuarios_comportamento` um a um e os
+agrupa em lotes limitados por quantidade ou por tamanho BSON aproximado,
+para que a memória fique constante independentemente do volume sintetizado
+"""
+
+import random
+from datetime import datetime, timedelta
+
+TIPOS_EVENTO = ["page_view", "click", "add_to_cart", "search", "view_product"]
+TIPOS_COM_PRODUTO = {"page_view", "click", "add_to_cart", "view_product"}
+
+ESTADOS = ["São Paulo", "Rio de Janeiro", "Minas Gerais", "Bahia", "Paraná"]
+CIDADES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Salvador", "Curitiba"]
+REFERRERS = ["https://google.com/search", "https://facebook.com", "https://instagram.com", "direct"]
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Limites padrão de um lote enviado ao banco
+DOCUMENTOS_POR_LOTE = 1000
+BYTES_POR_LOTE = 8 * 1024 * 1024
+
+
+def gerar_documentos_comportamento(n_usuarios, produtos, termos, tipos_evento=TIPOS_EVENTO,
+                                   eventos_por_usuario=(5, 30), tempo_pagina=(10, 180),
+                                   estados=ESTADOS, cidades=CIDADES, referrers=REFERRERS,
+                                   detalhado=True, inicio=1):
+    """Gerar (lazy) um documento de comportamento por usuário
+
+    `detalhado` inclui `sessao_id` em cada evento e os campos de
+    dispositivo e navegador, como na demonstração do MongoDB Atlas.
+    """
+    agora = datetime.now()
+    for i in range(inicio, inicio + n_usuarios):
+        eventos = []
+        for j in range(random.randint(*eventos_por_usuario)):
+            tipo = random.choice(tipos_evento)
+            evento = {
+                "tipo": tipo,
+                "timestamp": agora - timedelta(days=random.randint(0, 30)),
+                "tempo_pagina": random.randint(*tempo_pagina)
+            }
+            if detalhado:
+                evento["sessao_id"] = f"S{i:03d}_{j}"
+
+            if tipo in TIPOS_COM_PRODUTO:
+                evento["produto_id"] = random.choice(produtos)
+
+            if tipo == "search":
+                evento["termo"] = random.choice(termos)
+
+            eventos.append(evento)
+
+        documento = {
+            "usuario_id": f"U{i:03d}",
+            "sessao_id": f"S{i:03d}",
+            "timestamp": agora,
+            "eventos": eventos,
+            "pagina_atual": f"/produto/{random.choice(produtos)}",
+            "referrer": random.choice(referrers),
+            "user_agent": USER_AGENT,
+            "localizacao": {
+                "pais": "Brasil",
+                "estado": random.choice(estados),
+                "cidade": random.choice(cidades)
+            }
+        }
+        if detalhado:
+            documento["dispositivo"] = random.choice(["desktop", "mobile", "tablet"])
+            documento["navegador"] = random.choice(["Chrome", "Firefox", "Safari", "Edge"])
+
+        yield documento
+
+
+def tamanho_bson_aproximado(valor):
+    """Estimar o tamanho BSON de um valor sem serializá-lo"""
+    if isinstance(valor, dict):
+        return 5 + sum(len(chave) + 2 + tamanho_bson_aproximado(v) for chave, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        # Em BSON, listas são documentos com chaves "0", "1", ...
+        return 5 + sum(len(str(i)) + 2 + tamanho_bson_aproximado(v) for i, v in enumerate(valor))
+    if isinstance(valor, str):
+        return 5 + len(valor.encode('utf-8'))
+    if isinstance(valor, bool) or valor is None:
+        return 1
+    if isinstance(valor, int):
+        return 4 if -2 ** 31 <= valor < 2 ** 31 else 8
+    # float, datetime, ObjectId (12) e demais tipos de tamanho fixo
+    return 12 if type(valor).__name__ == 'ObjectId' else 8
+
+
+def agrupar_em_lotes(documentos, max_documentos=DOCUMENTOS_POR_LOTE, max_bytes=BYTES_POR_LOTE):
+    """Agrupar um iterável de documentos em listas limitadas
+
+    Um lote é fechado ao atingir `max_documentos` ou quando o próximo
+    documento ultrapassaria `max_bytes` (tamanho BSON estimado). Qualquer
+    um dos limites pode ser None.
+    """
+    lote, bytes_lote = [], 0
+    for documento in documentos:
+        tamanho = tamanho_bson_aproximado(documento) if max_bytes else 0
+        if lote and max_bytes and bytes_lote + tamanho > max_bytes:
+            yield lote
+            lote, bytes_lote = [], 0
+
+        lote.append(documento)
+        bytes_lote += tamanho
+        if max_documentos and len(lote) >= max_documentos:
+            yield lote
+            lote, bytes_lote = [], 0
+
+    if lote:
+        yield lote
+
+
+def gravar_em_lotes(collection, documentos, max_documentos=DOCUMENTOS_POR_LOTE, max_bytes=BYTES_POR_LOTE):
+    """Inserir os documentos de um iterável lote a lote; retorna o total inserido"""
+    total = 0
+    for lote in agrupar_em_lotes(documentos, max_documentos, max_bytes):
+        collection.insert_many(lote, ordered=False)
+        total += len(lote)
+    return total
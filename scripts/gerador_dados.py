@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Gerador de Dados Simulados - Análise Preditiva E-commerce
+Gera usuários, comportamento e produtos com os mesmos esquemas de
+`demo_simulado`, sorteando colunas inteiras com NumPy, em volumes de até
+dezenas de milhões de linhas (opcionalmente em blocos)
+"""
+
+import numpy as np
+import pandas as pd
+
+SEGMENTOS = ['high_value', 'medium_value', 'low_value', 'new_user']
+CATEGORIAS = ['Smartphones', 'Notebooks', 'Tablets', 'Acessórios']
+MARCAS = ['Samsung', 'Apple', 'Dell', 'Xiaomi', 'LG']
+
+# Usuários por bloco em `gerar_em_blocos`
+TAMANHO_BLOCO_GERACAO = 1_000_000
+
+
+def _largura_ids(total):
+    """Dígitos dos ids (mínimo 3, como em U001/P001)"""
+    return max(3, len(str(total)))
+
+
+def _ids(prefixo, inicio, fim, largura):
+    """Ids sequenciais `prefixo + número` (1-based) para as linhas [inicio, fim)"""
+    return [f'{prefixo}{i:0{largura}d}' for i in range(inicio + 1, fim + 1)]
+
+
+def gerar_usuarios(rng, inicio, fim, largura=None):
+    """Gerar o DataFrame de usuários das linhas [inicio, fim)"""
+    n = fim - inicio
+    largura = largura or _largura_ids(fim)
+    numeros = range(inicio + 1, fim + 1)
+    return pd.DataFrame({
+        'usuario_id': _ids('U', inicio, fim, largura),
+        'nome': [f'Usuário {i}' for i in numeros],
+        'email': [f'usuario{i}@exemplo.com' for i in numeros],
+        'segmento': pd.Categorical.from_codes(rng.integers(0, len(SEGMENTOS), n), SEGMENTOS),
+        'valor_total_compras': rng.exponential(2000, n),
+        'total_pedidos': rng.poisson(5, n),
+        'ticket_medio': rng.normal(500, 200, n),
+        'produtos_unicos': rng.integers(1, 15, n),
+        'dias_sem_comprar': rng.exponential(30, n),
+        'pedidos_concluidos': rng.poisson(4, n),
+        'pedidos_pendentes': rng.poisson(1, n),
+        'variabilidade_gastos': rng.exponential(100, n),
+    })
+
+
+def gerar_comportamento(rng, inicio, fim, largura=None):
+    """Gerar o DataFrame de comportamento dos usuários das linhas [inicio, fim)"""
+    n = fim - inicio
+    largura = largura or _largura_ids(fim)
+    return pd.DataFrame({
+        'usuario_id': _ids('U', inicio, fim, largura),
+        'total_eventos': rng.poisson(15, n),
+        'page_views': rng.poisson(10, n),
+        'clicks': rng.poisson(8, n),
+        'add_to_cart': rng.poisson(2, n),
+        'searches': rng.poisson(3, n),
+        'produtos_unicos': rng.integers(1, 8, n),
+        'taxa_conversao': rng.beta(2, 8, n),
+        'tempo_medio_evento': rng.normal(45, 15, n),
+    })
+
+
+def gerar_produtos(rng, n_produtos):
+    """Gerar o DataFrame de produtos"""
+    largura = _largura_ids(n_produtos)
+    return pd.DataFrame({
+        'produto_id': _ids('P', 0, n_produtos, largura),
+        'nome': [f'Produto {i}' for i in range(1, n_produtos + 1)],
+        'categoria': pd.Categorical.from_codes(rng.integers(0, len(CATEGORIAS), n_produtos), CATEGORIAS),
+        'marca': pd.Categorical.from_codes(rng.integers(0, len(MARCAS), n_produtos), MARCAS),
+        'preco': rng.uniform(100, 5000, n_produtos),
+        'estoque': rng.integers(0, 100, n_produtos),
+        'avaliacao_media': rng.uniform(3, 5, n_produtos),
+        'total_avaliacoes': rng.integers(10, 1000, n_produtos),
+        'total_vendas': rng.integers(0, 500, n_produtos),
+        'receita_total': rng.uniform(1000, 50000, n_produtos),
+    })
+
+
+def gerar_em_blocos(n_usuarios, tamanho_bloco=TAMANHO_BLOCO_GERACAO, seed=42):
+    """Gerar (usuarios_df, comportamento_df) em blocos de `tamanho_bloco` usuários
+
+    Cada bloco usa um gerador derivado de `seed` e do número do bloco, de
+    modo que o conteúdo de um bloco não depende dos anteriores.
+    """
+    largura = _largura_ids(n_usuarios)
+    sementes = np.random.SeedSequence(seed).spawn((n_usuarios + tamanho_bloco - 1) // tamanho_bloco)
+    for semente, inicio in zip(sementes, range(0, n_usuarios, tamanho_bloco)):
+        fim = min(inicio + tamanho_bloco, n_usuarios)
+        rng = np.random.default_rng(semente)
+        yield gerar_usuarios(rng, inicio, fim, largura), gerar_comportamento(rng, inicio, fim, largura)
+
+
+def gerar_dados(n_usuarios=100, n_produtos=20, seed=42, tamanho_bloco=TAMANHO_BLOCO_GERACAO):
+    """Gerar os três DataFrames completos (usuários, comportamento, produtos)"""
+    blocos = list(gerar_em_blocos(n_usuarios, tamanho_bloco, seed))
+    usuarios_df = pd.concat([u for u, _ in blocos], ignore_index=True)
+    comportamento_df = pd.concat([c for _, c in blocos], ignore_index=True)
+    produtos_df = gerar_produtos(np.random.default_rng([seed, n_produtos]), n_produtos)
+    return usuarios_df, comportamento_df, produtos_df
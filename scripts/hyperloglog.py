@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+HyperLogLog - Análise Preditiva E-commerce
+Contador aproximado de valores distintos com memória fixa (2^precisao
+registradores de um byte), serializável em um campo binário do documento
+de features e mesclável entre execuções. Enquanto poucos registradores
+estão preenchidos, a serialização é esparsa (só os pares índice/valor)
+"""
+
+import hashlib
+import math
+
+import numpy as np
+
+PRECISAO_MINIMA = 4
+PRECISAO_MAXIMA = 16
+
+# Erro relativo padrão aceito pelas features de clusterização
+ERRO_PADRAO = 0.02
+
+# Serialização esparsa: marcador, precisão e pares (índice u16, valor u8).
+# Um registrador denso nunca passa de 61, então o marcador não é ambíguo
+MARCADOR_ESPARSO = b'S'
+PAR_ESPARSO = np.dtype([('indice', '<u2'), ('valor', 'u1')])
+
+
+def precisao_para_erro(erro=ERRO_PADRAO):
+    """Menor precisão cujo erro padrão (1.04 / sqrt(2^p)) não passa de `erro`"""
+    precisao = math.ceil(math.log2((1.04 / erro) ** 2))
+    return min(max(precisao, PRECISAO_MINIMA), PRECISAO_MAXIMA)
+
+
+def _hash64(valor):
+    return int.from_bytes(hashlib.blake2b(str(valor).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """Estimador HyperLogLog com hash de 64 bits"""
+
+    def __init__(self, precisao=None, registros=None):
+        self.precisao = precisao if precisao is not None else precisao_para_erro()
+        if not PRECISAO_MINIMA <= self.precisao <= PRECISAO_MAXIMA:
+            raise ValueError(f"precisao deve estar entre {PRECISAO_MINIMA} e {PRECISAO_MAXIMA}")
+        self.m = 1 << self.precisao
+        if registros is None:
+            self.registros = np.zeros(self.m, dtype=np.uint8)
+        else:
+            self.registros = np.frombuffer(bytes(registros), dtype=np.uint8).copy()
+            if len(self.registros) != self.m:
+                raise ValueError(f"esperados {self.m} registradores, recebidos {len(self.registros)}")
+
+    @classmethod
+    def com_erro(cls, erro=ERRO_PADRAO):
+        return cls(precisao_para_erro(erro))
+
+    @property
+    def erro_padrao(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def adicionar(self, valor):
+        h = _hash64(valor)
+        indice = h & (self.m - 1)
+        resto = h >> self.precisao
+        # Posição do primeiro bit 1 nos 64 - p bits restantes
+        rank = (64 - self.precisao) - resto.bit_length() + 1
+        if rank > self.registros[indice]:
+            self.registros[indice] = rank
+
+    def atualizar(self, valores):
+        for valor in valores:
+            self.adicionar(valor)
+        return self
+
+    def mesclar(self, outro):
+        """União com outro HyperLogLog de mesma precisão (máximo por registrador)"""
+        if outro.precisao != self.precisao:
+            raise ValueError("HyperLogLog com precisões diferentes não podem ser mesclados")
+        np.maximum(self.registros, outro.registros, out=self.registros)
+        return self
+
+    def estimar(self):
+        """Número estimado de valores distintos"""
+        m = self.m
+        if m >= 128:
+            alfa = 0.7213 / (1 + 1.079 / m)
+        else:
+            alfa = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimativa = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(np.int32)))
+
+        zeros = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            estimativa = m * math.log(m / zeros)
+        return estimativa
+
+    def __len__(self):
+        return int(round(self.estimar()))
+
+    def para_bytes(self):
+        """Registradores serializados: esparsos se ocuparem menos que os densos
+
+        Um usuário com poucos produtos distintos grava alguns bytes em vez
+        dos 2^precisao registradores.
+        """
+        indices = np.flatnonzero(self.registros)
+        if len(MARCADOR_ESPARSO) + 1 + len(indices) * PAR_ESPARSO.itemsize >= self.m:
+            return self.registros.tobytes()
+        pares = np.empty(len(indices), dtype=PAR_ESPARSO)
+        pares['indice'] = indices
+        pares['valor'] = self.registros[indices]
+        return MARCADOR_ESPARSO + bytes([self.precisao]) + pares.tobytes()
+
+    @classmethod
+    def de_bytes(cls, dados):
+        """Reconstruir a partir de `para_bytes` (esparso ou denso; no denso a
+        precisão vem do tamanho)"""
+        dados = bytes(dados)
+        if dados[:1] == MARCADOR_ESPARSO:
+            hll = cls(dados[1])
+            pares = np.frombuffer(dados, dtype=PAR_ESPARSO, offset=2)
+            hll.registros[pares['indice']] = pares['valor']
+            return hll
+        return cls(int(math.log2(len(dados))), dados)
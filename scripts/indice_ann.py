@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Índice de Vizinhos Aproximados (IVF) - Análise Preditiva E-commerce
+Índice de arquivos invertidos com quantizador k-means para buscar produtos
+por similaridade de vetores (fatores ALS ou atributos do catálogo) sem
+percorrer o catálogo inteiro a cada consulta
+"""
+
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from scripts.selecao_top_k import top_k
+
+ARQUIVO_CENTROIDES = 'centroides.npy'
+ARQUIVO_VETORES = 'vetores.npy'
+ARQUIVO_ORDEM = 'ordem.npy'
+ARQUIVO_OFFSETS = 'offsets.npy'
+ARQUIVO_METADADOS = 'indice.json'
+
+# Sondas (listas visitadas) por consulta
+N_SONDAS_PADRAO = 8
+
+# Dimensão dos vetores gerados a partir dos atributos dos produtos
+DIMENSAO_ATRIBUTOS = 256
+
+# Vetores processados por vez na atribuição aos centróides
+TAMANHO_BLOCO_ATRIBUICAO = 65536
+
+
+def _atribuir(vetores, centroides):
+    """Índice do centróide mais próximo (distância L2) de cada vetor"""
+    normas_centroides = np.einsum('ij,ij->i', centroides, centroides)
+    atribuicao = np.empty(len(vetores), dtype=np.int32)
+    for inicio in range(0, len(vetores), TAMANHO_BLOCO_ATRIBUICAO):
+        bloco = vetores[inicio:inicio + TAMANHO_BLOCO_ATRIBUICAO]
+        # ||x - c||² = ||x||² - 2 x·c + ||c||²; ||x||² não altera o argmin
+        distancias = normas_centroides - 2 * (bloco @ centroides.T)
+        atribuicao[inicio:inicio + len(bloco)] = np.argmin(distancias, axis=1)
+    return atribuicao
+
+
+def kmeans(vetores, n_clusters, iteracoes=10, tamanho_amostra=None, seed=42):
+    """K-means de Lloyd (opcionalmente treinado sobre uma amostra)"""
+    rng = np.random.default_rng(seed)
+    if tamanho_amostra is None:
+        tamanho_amostra = min(len(vetores), n_clusters * 256)
+    amostra = vetores[rng.choice(len(vetores), size=tamanho_amostra, replace=False)]
+    amostra = np.asarray(amostra, dtype=np.float32)
+
+    centroides = amostra[rng.choice(len(amostra), size=n_clusters, replace=False)].copy()
+    for _ in range(iteracoes):
+        atribuicao = _atribuir(amostra, centroides)
+        contagens = np.bincount(atribuicao, minlength=n_clusters)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, atribuicao, amostra)
+
+        vazios = contagens == 0
+        centroides[~vazios] = somas[~vazios] / contagens[~vazios, None]
+        # Reiniciar clusters vazios com pontos aleatórios da amostra
+        if vazios.any():
+            centroides[vazios] = amostra[rng.choice(len(amostra), size=int(vazios.sum()))]
+
+    return centroides
+
+
+class IndiceIVF:
+    """Índice IVF por produto interno: vetores agrupados por lista invertida
+
+    Os vetores ficam reordenados de forma contígua por lista, de modo que
+    cada lista é uma fatia de `vetores[offsets[l]:offsets[l + 1]]`; `ordem`
+    devolve a posição original de cada vetor.
+    """
+
+    def __init__(self, centroides, vetores, ordem, offsets):
+        self.centroides = centroides
+        self.vetores = vetores
+        self.ordem = ordem
+        self.offsets = offsets
+
+    @property
+    def n_listas(self):
+        return len(self.centroides)
+
+    def __len__(self):
+        return len(self.vetores)
+
+    @classmethod
+    def construir(cls, vetores, n_listas=None, iteracoes=10, seed=42):
+        """Treinar o quantizador e distribuir os vetores nas listas"""
+        vetores = np.asarray(vetores, dtype=np.float32)
+        if n_listas is None:
+            n_listas = max(1, int(np.sqrt(len(vetores))))
+        n_listas = min(n_listas, len(vetores))
+
+        centroides = kmeans(vetores, n_listas, iteracoes=iteracoes, seed=seed)
+        atribuicao = _atribuir(vetores, centroides)
+
+        ordem = np.argsort(atribuicao, kind='stable').astype(np.int64)
+        offsets = np.zeros(n_listas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(atribuicao, minlength=n_listas), out=offsets[1:])
+        return cls(centroides, vetores[ordem], ordem, offsets)
+
+    def buscar(self, consulta, k=10, n_sondas=N_SONDAS_PADRAO, excluir=None):
+        """Buscar os k vetores de maior produto interno com a consulta
+
+        Visita apenas as `n_sondas` listas cujos centróides têm maior produto
+        interno com a consulta. Retorna (posições originais, scores).
+        """
+        consulta = np.asarray(consulta, dtype=np.float32)
+        listas, _ = top_k(self.centroides @ consulta, n_sondas)
+
+        fatias = [(self.offsets[l], self.offsets[l + 1]) for l in listas]
+        candidatos = np.concatenate([np.arange(ini, fim) for ini, fim in fatias])
+        scores = np.concatenate([self.vetores[ini:fim] @ consulta for ini, fim in fatias])
+        posicoes = self.ordem[candidatos]
+
+        if excluir is not None and len(excluir):
+            mantidos = ~np.isin(posicoes, np.asarray(list(excluir)))
+            posicoes, scores = posicoes[mantidos], scores[mantidos]
+
+        melhores, valores = top_k(scores, k)
+        return posicoes[melhores], valores
+
+    def salvar(self, diretorio):
+        """Salvar o índice em arquivos .npy (carregáveis com mmap)"""
+        os.makedirs(diretorio, exist_ok=True)
+        np.save(os.path.join(diretorio, ARQUIVO_CENTROIDES), self.centroides)
+        np.save(os.path.join(diretorio, ARQUIVO_VETORES), np.ascontiguousarray(self.vetores))
+        np.save(os.path.join(diretorio, ARQUIVO_ORDEM), self.ordem)
+        np.save(os.path.join(diretorio, ARQUIVO_OFFSETS), self.offsets)
+        with open(os.path.join(diretorio, ARQUIVO_METADADOS), 'w', encoding='utf-8') as f:
+            json.dump({"n_listas": self.n_listas, "n_vetores": len(self),
+                       "dimensao": int(self.vetores.shape[1])}, f, indent=2)
+
+    @classmethod
+    def carregar(cls, diretorio, mmap=True):
+        """Carregar um índice salvo; com `mmap` os vetores não são lidos para a RAM"""
+        modo = 'r' if mmap else None
+        return cls(
+            centroides=np.load(os.path.join(diretorio, ARQUIVO_CENTROIDES)),
+            vetores=np.load(os.path.join(diretorio, ARQUIVO_VETORES), mmap_mode=modo),
+            ordem=np.load(os.path.join(diretorio, ARQUIVO_ORDEM), mmap_mode=modo),
+            offsets=np.load(os.path.join(diretorio, ARQUIVO_OFFSETS))
+        )
+
+
+def busca_forca_bruta(vetores, consulta, k=10, excluir=None):
+    """Busca exata por produto interno em todo o catálogo (referência)"""
+    scores = vetores @ np.asarray(consulta, dtype=np.float32)
+    if excluir is not None and len(excluir):
+        scores[np.asarray(list(excluir))] = -np.inf
+    return top_k(scores, k)
+
+
+def avaliar_indice(indice, vetores, consultas, k=10, sondas=(1, 2, 4, 8, 16)):
+    """Comparar recall@k e latência do índice com a busca por força bruta"""
+    vetores = np.asarray(vetores, dtype=np.float32)
+    exatos, tempos_exatos = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        posicoes, _ = busca_forca_bruta(vetores, consulta, k)
+        tempos_exatos.append(time.perf_counter() - inicio)
+        exatos.append(set(posicoes.tolist()))
+
+    resultados = [{
+        "metodo": "forca_bruta",
+        "n_sondas": None,
+        "recall": 1.0,
+        "latencia_p50_ms": float(np.percentile(tempos_exatos, 50) * 1000),
+        "latencia_p99_ms": float(np.percentile(tempos_exatos, 99) * 1000),
+    }]
+
+    for n_sondas in sondas:
+        acertos, tempos = 0, []
+        for consulta, exato in zip(consultas, exatos):
+            inicio = time.perf_counter()
+            posicoes, _ = indice.buscar(consulta, k, n_sondas=n_sondas)
+            tempos.append(time.perf_counter() - inicio)
+            acertos += len(exato.intersection(posicoes.tolist()))
+
+        resultados.append({
+            "metodo": "ivf",
+            "n_sondas": n_sondas,
+            "recall": acertos / (k * len(consultas)),
+            "latencia_p50_ms": float(np.percentile(tempos, 50) * 1000),
+            "latencia_p99_ms": float(np.percentile(tempos, 99) * 1000),
+        })
+
+    return resultados
+
+
+def _posicao_hash(texto, dimensao):
+    """Posição estável (entre processos) de um atributo no vetor"""
+    return zlib.crc32(texto.encode('utf-8')) % dimensao
+
+
+def vetores_por_atributos(produtos, dimensao=DIMENSAO_ATRIBUTOS):
+    """Vetorizar produtos pelos atributos do catálogo (hashing trick)
+
+    Usa categoria, marca, `tags` e os pares chave/valor de `caracteristicas`
+    dos documentos da coleção `produtos`. Os vetores são normalizados, de modo
+    que o produto interno é a similaridade de cosseno.
+    """
+    vetores = np.zeros((len(produtos), dimensao), dtype=np.float32)
+    for i, produto in enumerate(produtos):
+        atributos = [f"categoria={produto.get('categoria', '')}", f"marca={produto.get('marca', '')}"]
+        atributos += [f"tag={tag}" for tag in produto.get('tags', [])]
+        atributos += [f"{chave}={valor}" for chave, valor in produto.get('caracteristicas', {}).items()]
+        for atributo in atributos:
+            vetores[i, _posicao_hash(atributo.lower(), dimensao)] += 1.0
+
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    np.divide(vetores, normas, out=vetores, where=normas > 0)
+    return vetores
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Índices do MongoDB - Análise Preditiva E-commerce
+Provisionamento idempotente dos índices das coleções e relatório que roda
+`explain()` nas consultas conhecidas do projeto, sinalizando as que ainda
+fazem varredura completa da coleção (COLLSCAN)
+"""
+
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from scripts.armazem_recomendacoes import ArmazemRecomendacoes
+from scripts.eventos_buckets import COLECAO_BUCKETS, EVENTOS_POR_BUCKET, INDICES_BUCKETS
+from scripts.features_comportamento import COLECAO_FEATURES, INDICE_FEATURES, criar_indice_features
+
+# (coleção, chaves, nome, opções)
+INDICES = [
+    ('produtos', [("produto_id", ASCENDING)], 'idx_produtos_produto_id', {"unique": True}),
+    # Filtros por `ativo` com ordenação/faixa de preço e busca por categoria
+    ('produtos', [("ativo", ASCENDING), ("preco", DESCENDING)], 'idx_produtos_ativo_preco', {}),
+    ('produtos', [("ativo", ASCENDING), ("categoria", ASCENDING)], 'idx_produtos_ativo_categoria', {}),
+    # Sessões; os eventos ficam em `eventos_buckets` (INDICES_BUCKETS)
+    ('usuarios_comportamento', [("usuario_id", ASCENDING)], 'idx_comportamento_usuario', {}),
+    ('usuarios_perfil', [("segmento", ASCENDING)], 'idx_perfil_segmento', {}),
+] + INDICES_BUCKETS
+
+
+def provisionar_indices(db, indices=INDICES, verbose=True):
+    """Criar os índices que faltam (índices existentes e idênticos são ignorados)
+
+    Falhas individuais (por exemplo, um índice único sobre dados já
+    duplicados) são reportadas sem interromper os demais. Os índices de
+    `recomendacoes` (único por usuário + TTL) vêm de `ArmazemRecomendacoes`
+    e o de `features_comportamento` do módulo de features.
+    Retorna a lista de nomes criados ou confirmados.
+    """
+    criados = []
+
+    def criar(descricao, nomes, funcao):
+        try:
+            funcao()
+            criados.extend(nomes)
+        except OperationFailure as e:
+            if verbose:
+                print(f"⚠️ Índice {descricao} não criado: {e}")
+
+    for colecao, chaves, nome, opcoes in indices:
+        criar(f"{colecao}.{nome}", [nome], lambda: db[colecao].create_index(chaves, name=nome, **opcoes))
+    criar("recomendacoes", ['idx_recomendacoes_usuario', 'ttl_recomendacoes_valido_ate'],
+          ArmazemRecomendacoes(db).criar_indices)
+    criar(f"{COLECAO_FEATURES}.{INDICE_FEATURES}", [INDICE_FEATURES], lambda: criar_indice_features(db))
+
+    if verbose:
+        print(f"✅ {len(criados)} índices provisionados")
+    return criados
+
+
+def consultas_conhecidas():
+    """Consultas usadas pelos scripts e demonstrações: (descrição, coleção, tipo, argumentos)"""
+    semana_passada = datetime.now() - timedelta(days=7)
+    return [
+        ("produto por produto_id", 'produtos', 'find',
+         {"filtro": {"produto_id": "P001"}}),
+        ("produtos ativos por categoria (regex)", 'produtos', 'find',
+         {"filtro": {"categoria": {"$regex": "Smartphones", "$options": "i"}, "ativo": True}}),
+        ("produtos ativos por faixa de preço", 'produtos', 'find',
+         {"filtro": {"preco": {"$gte": 1000, "$lte": 5000}, "ativo": True}, "ordem": [("preco", ASCENDING)]}),
+        ("produtos ativos mais caros", 'produtos', 'find',
+         {"filtro": {"ativo": True}, "ordem": [("preco", DESCENDING)], "limite": 3}),
+        ("sessões de um usuário", 'usuarios_comportamento', 'find',
+         {"filtro": {"usuario_id": "U001"}}),
+        ("eventos da última semana", COLECAO_BUCKETS, 'find',
+         {"filtro": {"fim": {"$gte": semana_passada}}}),
+        ("eventos de um usuário agregados", COLECAO_BUCKETS, 'aggregate',
+         {"pipeline": [{"$match": {"usuario_id": "U001"}}, {"$unwind": "$eventos"},
+                       {"$group": {"_id": "$eventos.tipo", "total": {"$sum": 1}}}]}),
+        ("bucket corrente de um usuário", COLECAO_BUCKETS, 'find',
+         {"filtro": {"usuario_id": "U001", "dia": datetime.combine(datetime.now().date(), datetime.min.time()),
+                     "n": {"$lt": EVENTOS_POR_BUCKET}}}),
+        ("perfis por segmento", 'usuarios_perfil', 'find',
+         {"filtro": {"segmento": "high_value"}}),
+        ("recomendações de um usuário", 'recomendacoes', 'find',
+         {"filtro": {"usuario_id": "U001"}}),
+        ("features de um usuário", 'features_comportamento', 'find',
+         {"filtro": {"usuario_id": "U001"}}),
+    ]
+
+
+def estagios_plano(explain):
+    """Nomes de todos os estágios do plano vencedor de um `explain`
+
+    Percorre o documento inteiro, o que funciona tanto para o formato
+    clássico (`queryPlanner.winningPlan`) quanto para o do slot-based
+    engine e para o explain de agregações (`stages[0].$cursor`).
+    """
+    estagios = []
+
+    def visitar(no, chave=None):
+        if isinstance(no, dict):
+            if chave == 'rejectedPlans':
+                return
+            if isinstance(no.get('stage'), str):
+                estagios.append(no['stage'])
+            for k, v in no.items():
+                visitar(v, k)
+        elif isinstance(no, list):
+            if chave == 'rejectedPlans':
+                return
+            for item in no:
+                visitar(item, chave)
+
+    visitar(explain)
+    return estagios
+
+
+def _explicar(db, colecao, tipo, argumentos):
+    if tipo == 'aggregate':
+        return db.command('aggregate', colecao, pipeline=argumentos["pipeline"], explain=True)
+
+    cursor = db[colecao].find(argumentos["filtro"])
+    if argumentos.get("ordem"):
+        cursor = cursor.sort(argumentos["ordem"])
+    if argumentos.get("limite"):
+        cursor = cursor.limit(argumentos["limite"])
+    return cursor.explain()
+
+
+def relatorio_explain(db, consultas=None, verbose=True):
+    """Rodar `explain()` em cada consulta e sinalizar planos com COLLSCAN"""
+    relatorio = []
+    for descricao, colecao, tipo, argumentos in consultas or consultas_conhecidas():
+        try:
+            estagios = estagios_plano(_explicar(db, colecao, tipo, argumentos))
+            erro = None
+        except Exception as e:
+            estagios, erro = [], str(e)
+
+        item = {
+            "consulta": descricao,
+            "colecao": colecao,
+            "estagios": estagios,
+            "collscan": 'COLLSCAN' in estagios,
+            "erro": erro,
+        }
+        relatorio.append(item)
+
+        if verbose:
+            if erro:
+                print(f"  ❓ {descricao}: explain indisponível ({erro})")
+            elif item["collscan"]:
+                print(f"  ⚠️ {descricao}: COLLSCAN em {colecao}")
+            else:
+                print(f"  ✅ {descricao}: {' > '.join(dict.fromkeys(estagios))}")
+
+    return relatorio
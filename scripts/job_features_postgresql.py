@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Job de Features PostgreSQL - Análise Preditiva E-commerce
+Atualiza a view materializada `mv_usuario_features` com
+REFRESH MATERIALIZED VIEW CONCURRENTLY, uma vez (para cron) ou em laço a
+cada `--intervalo` segundos; as leituras seguem usando a versão anterior
+enquanto a nova é calculada
+
+Uso:
+    python scripts/job_features_postgresql.py
+    python scripts/job_features_postgresql.py --intervalo 900
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.conexao_postgresql import obter_pool
+from scripts.consultas_postgresql import VIEW_FEATURES, atualizar_view_features, criar_view_features, view_existe
+
+
+def executar_refresh(conn):
+    """Atualizar a view (criando-a se ainda não existir); retorna os segundos gastos"""
+    comeco = time.time()
+    with conn.cursor() as cursor:
+        if view_existe(cursor):
+            atualizar_view_features(cursor, concorrente=True)
+        else:
+            criar_view_features(cursor)
+    conn.commit()
+    return time.time() - comeco
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Atualização periódica de {VIEW_FEATURES}")
+    # Sem os argumentos, valem PGHOST, PGDATABASE, PGUSER e PGPASSWORD (ou os padrões)
+    parser.add_argument('--host')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--intervalo', type=float, default=0,
+                        help="segundos entre atualizações (0 = atualizar uma vez e sair)")
+    args = parser.parse_args()
+
+    import psycopg2
+
+    # REFRESH pode passar do statement_timeout padrão das consultas
+    pool = obter_pool(maximo=1, tempo_limite_ms=0, host=args.host, database=args.database,
+                      user=args.user, password=args.password)
+    try:
+        while True:
+            try:
+                # Uma conexão (verificada pelo pool) por atualização
+                with pool.conexao() as conn:
+                    segundos = executar_refresh(conn)
+                print(f"✅ {VIEW_FEATURES} atualizada em {segundos:.1f}s")
+            except psycopg2.Error as e:
+                print(f"❌ Erro ao atualizar {VIEW_FEATURES}: {e}")
+                if not args.intervalo:
+                    return False
+            if not args.intervalo:
+                return True
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        return True
+    finally:
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Job de Recomendações em Lote - Análise Preditiva E-commerce
+Regenera as recomendações de todos os usuários do modelo ALS dividindo as
+linhas de usuários em shards processados por um pool de processos; cada
+worker mapeia os fatores (.npy) em memória e grava seu shard com upserts
+em lote na coleção `recomendacoes`
+
+Uso:
+    python scripts/job_recomendacoes.py models/als --processos 4
+    python scripts/job_recomendacoes.py models/als --sem-gravacao
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.fatoracao_als import carregar_modelo
+from scripts.filtragem_colaborativa import documentos_recomendacao
+from scripts.selecao_top_k import TAMANHO_BLOCO_PADRAO, top_k
+
+MONGODB_URI_PADRAO = 'mongodb://localhost:27017'
+BANCO_PADRAO = 'ecommerce_demo'
+VERSAO_PADRAO = 'als-v1'
+
+# Usuários por shard (unidade de trabalho enviada a um processo)
+TAMANHO_SHARD_PADRAO = 50000
+
+# Variáveis que limitam o BLAS a uma thread por processo
+VARIAVEIS_THREADS_BLAS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+# Estado de cada worker, preenchido uma vez pelo inicializador do pool
+_estado_worker = {}
+
+
+def dividir_shards(n_usuarios, tamanho_shard=TAMANHO_SHARD_PADRAO):
+    """Intervalos contíguos [inicio, fim) de linhas de usuários"""
+    return [(inicio, min(inicio + tamanho_shard, n_usuarios))
+            for inicio in range(0, n_usuarios, tamanho_shard)]
+
+
+@contextmanager
+def _blas_uma_thread():
+    """Limitar o BLAS dos processos criados no bloco a uma thread
+
+    Os processos `spawn` herdam o ambiente ao serem criados e carregam o
+    NumPy ao importar este módulo, antes do inicializador; por isso as
+    variáveis são definidas no pai durante o bloco e restauradas ao sair.
+    """
+    anteriores = {variavel: os.environ.get(variavel) for variavel in VARIAVEIS_THREADS_BLAS}
+    for variavel in VARIAVEIS_THREADS_BLAS:
+        os.environ.setdefault(variavel, '1')
+    try:
+        yield
+    finally:
+        for variavel, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(variavel, None)
+            else:
+                os.environ[variavel] = valor
+
+
+def _inicializar_worker(diretorio, mongodb_uri, banco, versao):
+    """Mapear o modelo e abrir a conexão uma única vez por processo"""
+    modelo = carregar_modelo(diretorio, mmap=True)
+    _estado_worker['modelo'] = modelo
+    # Ids como str do Python (e não np.str_) para os documentos BSON
+    _estado_worker['ids_usuarios'] = modelo.ids_usuarios.tolist()
+    _estado_worker['ids_produtos'] = modelo.ids_produtos.tolist()
+    _estado_worker['versao'] = versao
+    _estado_worker['armazem'] = None
+    if mongodb_uri:
+        from pymongo import MongoClient
+        from scripts.armazem_recomendacoes import ArmazemRecomendacoes
+
+        client = MongoClient(mongodb_uri, tz_aware=True)
+        _estado_worker['armazem'] = ArmazemRecomendacoes(client[banco], versao=versao)
+
+
+def processar_shard(inicio, fim, k=5, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Pontuar e gravar as recomendações das linhas [inicio, fim)
+
+    Retorna (inicio, fim, documentos gravados, segundos).
+    """
+    modelo = _estado_worker['modelo']
+    armazem = _estado_worker['armazem']
+    fatores_produtos = modelo.fatores_produtos
+    comeco = time.time()
+    gravados = 0
+
+    for bloco in range(inicio, fim, tamanho_bloco):
+        limite = min(bloco + tamanho_bloco, fim)
+        scores = modelo.fatores_usuarios[bloco:limite] @ fatores_produtos.T
+        indices, valores = top_k(scores, k)
+        if armazem is None:
+            gravados += limite - bloco
+            continue
+
+        documentos = documentos_recomendacao(
+            _estado_worker['ids_usuarios'][bloco:limite], _estado_worker['ids_produtos'], indices, valores,
+            versao=_estado_worker['versao'], algoritmo="als", motivo="fatores_latentes"
+        )
+        gravados += armazem.gravar_lote(documentos, versao=_estado_worker['versao'])
+
+    return inicio, fim, gravados, time.time() - comeco
+
+
+def executar_job(diretorio, n_processos=None, k=5, tamanho_shard=TAMANHO_SHARD_PADRAO,
+                 mongodb_uri=MONGODB_URI_PADRAO, banco=BANCO_PADRAO, versao=VERSAO_PADRAO):
+    """Executar o job completo e retornar o total de recomendações geradas
+
+    Com `mongodb_uri=None` nada é gravado (útil para medir a escalabilidade).
+    Os processos são criados com `spawn` e cada um usa uma única thread de
+    BLAS, para que o paralelismo venha dos shards e não de threads competindo.
+    """
+    n_processos = n_processos or os.cpu_count() or 1
+    modelo = carregar_modelo(diretorio, mmap=True)
+    shards = dividir_shards(len(modelo.ids_usuarios), tamanho_shard)
+    del modelo
+
+    if mongodb_uri:
+        from pymongo import MongoClient
+        from scripts.armazem_recomendacoes import ArmazemRecomendacoes
+
+        client = MongoClient(mongodb_uri)
+        ArmazemRecomendacoes(client[banco]).criar_indices()
+        client.close()
+
+    print(f"🚀 Gerando recomendações: {len(shards)} shards em {n_processos} processos")
+    comeco = time.time()
+    total = 0
+    with _blas_uma_thread(), ProcessPoolExecutor(max_workers=n_processos,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_inicializar_worker,
+                                                 initargs=(diretorio, mongodb_uri, banco, versao)) as executor:
+        tarefas = [executor.submit(processar_shard, inicio, fim, k) for inicio, fim in shards]
+        for tarefa in as_completed(tarefas):
+            inicio, fim, gravados, segundos = tarefa.result()
+            total += gravados
+            print(f"  ✅ Shard {inicio}-{fim}: {gravados} usuários em {segundos:.2f}s")
+
+    duracao = time.time() - comeco
+    print(f"🎉 {total} usuários processados em {duracao:.2f}s ({total / max(duracao, 1e-9):.0f} usuários/s)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job de recomendações em lote")
+    parser.add_argument('diretorio', help="diretório com os artefatos do modelo ALS")
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--tamanho-shard', type=int, default=TAMANHO_SHARD_PADRAO)
+    parser.add_argument('--mongodb-uri', default=MONGODB_URI_PADRAO)
+    parser.add_argument('--banco', default=BANCO_PADRAO)
+    parser.add_argument('--versao', default=VERSAO_PADRAO)
+    parser.add_argument('--sem-gravacao', action='store_true',
+                        help="apenas pontuar, sem gravar no MongoDB")
+    args = parser.parse_args()
+
+    executar_job(args.diretorio, args.processos, args.k, args.tamanho_shard,
+                 None if args.sem_gravacao else args.mongodb_uri, args.banco, args.versao)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Recomendação em Lote - Análise Preditiva E-commerce
+Motor vetorizado que aplica as regras de `sistema_recomendacoes` a todos os
+usuários de uma vez, usando matrizes de features de usuários e produtos
+"""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from scripts.estatisticas_populacao import obter_estatisticas
+from scripts.selecao_top_k import TAMANHO_BLOCO_PADRAO, top_k_em_blocos
+
+# Limiares de preço usados pelas regras de recomendação
+PRECO_PREMIUM = 2000
+PRECO_CLUSTER_BAIXA_CONV = 1500
+PRECO_CLUSTER_PASSIVO = 1000
+
+# Amplitude do ruído adicionado ao score (simula variação)
+AMPLITUDE_RUIDO = 0.1
+
+# Constantes do SplitMix64, o hash que gera o ruído a partir de contadores
+INCREMENTO_SPLITMIX = 0x9E3779B97F4A7C15
+MULTIPLICADORES_SPLITMIX = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+MASCARA_64 = 2 ** 64 - 1
+
+# Valores do ruído calculados por passo (o uint64 intermediário fica no cache)
+ELEMENTOS_POR_PASSO_RUIDO = 1 << 15
+
+# Regras do motor: cada coluna da matriz de usuários é um indicador (0/1) e a
+# coluna correspondente da matriz de produtos é o peso da regra para o produto
+REGRAS = [
+    'usuário_ativo',
+    'alta_conversao',
+    'segmento_high_value',
+    'cliente_frequente',
+    'cluster_ativo_convertido',
+    'cluster_ativo_baixa_conv',
+    'cluster_passivo',
+]
+
+
+def preparar_features_usuarios(usuarios_df, comportamento_df, estatisticas=None):
+    """Montar a matriz de indicadores das regras (uma linha por usuário)
+
+    Os limiares vêm de um snapshot `EstatisticasPopulacao`; se nenhum for
+    informado, usa o snapshot em cache para a versão atual dos dados.
+    """
+    if estatisticas is None:
+        estatisticas = obter_estatisticas(usuarios_df, comportamento_df)
+
+    ids = pd.unique(np.concatenate([
+        usuarios_df['usuario_id'].to_numpy(dtype=object),
+        comportamento_df['usuario_id'].to_numpy(dtype=object)
+    ]))
+
+    # Alinhar os dois DataFrames pelo usuario_id (NaN onde não há registro)
+    trans = usuarios_df.drop_duplicates('usuario_id').set_index('usuario_id').reindex(ids)
+    comp = comportamento_df.drop_duplicates('usuario_id').set_index('usuario_id').reindex(ids)
+
+    # Comparações com NaN resultam em False, como no caminho por usuário
+    if 'cluster' in comp.columns:
+        cluster = comp['cluster'].to_numpy(dtype=float)
+    else:
+        cluster = np.full(len(ids), np.nan)
+
+    U = np.column_stack([
+        comp['total_eventos'].to_numpy(dtype=float) > estatisticas.media_eventos,
+        comp['taxa_conversao'].to_numpy(dtype=float) > estatisticas.media_conversao,
+        trans['segmento'].to_numpy(dtype=object) == 'high_value',
+        trans['total_pedidos'].to_numpy(dtype=float) > estatisticas.media_pedidos,
+        cluster == 2,
+        cluster == 1,
+        cluster == 0,
+    ]).astype(np.float32)
+
+    return ids, U
+
+
+def preparar_features_produtos(produtos_df):
+    """Montar a matriz de pesos das regras (uma linha por produto)"""
+    ids = produtos_df['produto_id'].to_numpy(dtype=object)
+    preco = produtos_df['preco'].to_numpy(dtype=float)
+    premium = (preco > PRECO_PREMIUM).astype(np.float32)
+    uns = np.ones(len(ids), dtype=np.float32)
+
+    P = np.column_stack([
+        0.3 * uns,
+        0.1 + 0.1 * premium,
+        0.1 + 0.3 * premium,
+        0.2 * uns,
+        0.25 * uns,
+        0.2 * (preco < PRECO_CLUSTER_BAIXA_CONV),
+        0.15 * (preco < PRECO_CLUSTER_PASSIVO),
+    ]).astype(np.float32)
+
+    return ids, P
+
+
+def _misturar(z):
+    """Finalizador do SplitMix64, aplicado em place a um array uint64"""
+    z ^= z >> np.uint64(30)
+    z *= MULTIPLICADORES_SPLITMIX[0]
+    z ^= z >> np.uint64(27)
+    z *= MULTIPLICADORES_SPLITMIX[1]
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def chaves_usuarios(ids_usuarios, execucao):
+    """Chave de 64 bits do ruído de cada usuário em uma execução (estável entre processos)"""
+    crc = np.fromiter((zlib.crc32(str(usuario_id).encode('utf-8')) for usuario_id in ids_usuarios),
+                      dtype=np.uint64, count=len(ids_usuarios))
+    crc ^= np.uint64((int(execucao) * INCREMENTO_SPLITMIX) & MASCARA_64)
+    return _misturar(crc)
+
+
+def gerar_ruido(ids_usuarios, n_produtos, execucao, elementos_por_passo=ELEMENTOS_POR_PASSO_RUIDO):
+    """Gerar o ruído (usuários x produtos) de um bloco de usuários
+
+    Cada valor é um hash (SplitMix64) da chave do usuário, derivada de
+    (execucao, crc32 do usuario_id), e do índice do produto, calculado com
+    operações vetorizadas sobre faixas de linhas de ~`elementos_por_passo`
+    valores, que cabem no cache. O ruído de um usuário não depende do
+    bloco, do shard ou da ordem em que ele é processado.
+    """
+    chaves = chaves_usuarios(ids_usuarios, execucao)
+    contadores = np.arange(1, n_produtos + 1, dtype=np.uint64)
+    contadores *= np.uint64(INCREMENTO_SPLITMIX)
+
+    ruido = np.empty((len(ids_usuarios), n_produtos), dtype=np.float32)
+    passo = max(1, elementos_por_passo // max(n_produtos, 1))
+    z = np.empty((min(passo, len(ids_usuarios)), n_produtos), dtype=np.uint64)
+    for inicio in range(0, len(ids_usuarios), passo):
+        fim = min(inicio + passo, len(ids_usuarios))
+        parcial = z[:fim - inicio]
+        np.add(chaves[inicio:fim, None], contadores, out=parcial)
+        _misturar(parcial)
+        # 24 bits altos -> inteiros exatos em float32
+        parcial >>= np.uint64(40)
+        ruido[inicio:fim] = parcial
+
+    ruido *= np.float32(2 * AMPLITUDE_RUIDO / 2 ** 24)
+    ruido -= np.float32(AMPLITUDE_RUIDO)
+    return ruido
+
+
+def calcular_scores(U, P, ids_usuarios=None, execucao=None):
+    """Calcular a matriz de scores usuários x produtos
+
+    Com `execucao` (id inteiro da execução), soma o ruído determinístico
+    de `gerar_ruido` às linhas de `ids_usuarios`.
+    """
+    scores = U @ P.T
+
+    if execucao is not None:
+        scores += gerar_ruido(ids_usuarios, P.shape[0], execucao)
+
+    np.clip(scores, 0, 1, out=scores)
+    return scores
+
+
+def motivos_recomendacao(U, P, i_usuario, i_produto, precos):
+    """Listar os motivos (regras ativas) de uma recomendação"""
+    motivos = []
+    for j, regra in enumerate(REGRAS):
+        if U[i_usuario, j] == 0 or P[i_produto, j] == 0:
+            continue
+
+        premium = precos[i_produto] > PRECO_PREMIUM
+        if regra == 'alta_conversao':
+            motivos.append('preferencia_premium' if premium else 'produto_acessivel')
+        elif regra == 'segmento_high_value':
+            motivos.append('segmento_high_value' if premium else 'produto_economico')
+        else:
+            motivos.append(regra)
+
+    return motivos
+
+
+def recomendar_lote(usuarios_df, comportamento_df, produtos_df, k=5, execucao=None,
+                    tamanho_bloco=TAMANHO_BLOCO_PADRAO, estatisticas=None):
+    """Gerar o top-k de recomendações para todos os usuários
+
+    Os scores são calculados em blocos de `tamanho_bloco` usuários, de modo
+    que apenas um bloco da matriz usuários x produtos existe por vez.
+    Com o mesmo `execucao`, o resultado de cada usuário é idêntico
+    independentemente do tamanho do bloco ou da divisão em shards.
+    Retorna um DataFrame no formato longo com as colunas usuario_id,
+    posicao, produto_id e score.
+    """
+    ids_usuarios, U = preparar_features_usuarios(usuarios_df, comportamento_df, estatisticas)
+    ids_produtos, P = preparar_features_produtos(produtos_df)
+
+    n_usuarios = len(ids_usuarios)
+    k = min(k, len(ids_produtos))
+    indices = np.empty((n_usuarios, k), dtype=np.intp)
+    top_scores = np.empty((n_usuarios, k), dtype=np.float32)
+
+    def calcular_bloco(inicio, fim):
+        return calcular_scores(U[inicio:fim], P, ids_usuarios[inicio:fim], execucao)
+
+    blocos = top_k_em_blocos(calcular_bloco, n_usuarios, k, tamanho_bloco)
+    for inicio, indices_bloco, scores_bloco in blocos:
+        fim = inicio + len(indices_bloco)
+        indices[inicio:fim] = indices_bloco
+        top_scores[inicio:fim] = scores_bloco
+
+    return pd.DataFrame({
+        'usuario_id': np.repeat(ids_usuarios, k),
+        'posicao': np.tile(np.arange(1, k + 1), n_usuarios),
+        'produto_id': ids_produtos[indices.ravel()],
+        'score': top_scores.ravel()
+    })
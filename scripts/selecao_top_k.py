@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Seleção Top-K - Análise Preditiva E-commerce
+Seleção parcial dos k maiores scores e processamento da matriz
+usuários x produtos em blocos de tamanho fixo
+"""
+
+import numpy as np
+
+# Quantidade padrão de usuários pontuados por bloco
+TAMANHO_BLOCO_PADRAO = 2048
+
+
+def top_k(scores, k):
+    """Selecionar os k maiores scores de cada linha, em ordem decrescente
+
+    Usa `np.argpartition` para separar os k melhores em O(n) e ordena
+    apenas esses k itens. Aceita um vetor (um usuário) ou uma matriz.
+    """
+    if scores.ndim == 1:
+        indices, valores = top_k(scores[np.newaxis, :], k)
+        return indices[0], valores[0]
+
+    n_itens = scores.shape[1]
+    k = min(k, n_itens)
+    if k <= 0:
+        vazio = np.empty((scores.shape[0], 0), dtype=np.intp)
+        return vazio, np.empty((scores.shape[0], 0), dtype=scores.dtype)
+
+    if k < n_itens:
+        indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.broadcast_to(np.arange(n_itens), scores.shape).copy()
+
+    valores = np.take_along_axis(scores, indices, axis=1)
+    ordem = np.argsort(-valores, axis=1, kind='stable')
+    indices = np.take_along_axis(indices, ordem, axis=1)
+    valores = np.take_along_axis(valores, ordem, axis=1)
+    return indices, valores
+
+
+def top_k_em_blocos(calcular_bloco, n_usuarios, k, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Percorrer os usuários em blocos, mantendo só o top-k de cada bloco
+
+    `calcular_bloco(inicio, fim)` deve devolver a matriz de scores das linhas
+    `inicio:fim`; assim a matriz completa nunca precisa caber na memória.
+    Gera tuplas (inicio, indices, valores).
+    """
+    for inicio in range(0, n_usuarios, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n_usuarios)
+        indices, valores = top_k(calcular_bloco(inicio, fim), k)
+        yield inicio, indices, valores
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Servidor de Recomendações - Análise Preditiva E-commerce
+Serviço HTTP assíncrono (somente biblioteca padrão + NumPy) que carrega os
+artefatos do modelo ALS uma única vez e agrupa requisições concorrentes em
+micro-lotes pontuados com um único produto de matrizes
+
+Rotas:
+    GET /recommendations/{usuario_id}?k=5
+    GET /similar/{produto_id}?k=5
+    GET /metrics
+    GET /health
+
+Uso:
+    python scripts/servidor_recomendacoes.py models/als --porta 8080
+    python scripts/servidor_recomendacoes.py /tmp/als_sintetico --sintetico
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+# Adicionar o diretório raiz ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.fatoracao_als import ModeloALS, carregar_modelo, salvar_modelo
+from scripts.indice_ann import IndiceIVF
+from scripts.selecao_top_k import top_k
+
+PORTA_PADRAO = 8080
+K_PADRAO = 5
+K_MAXIMO = 100
+
+# Micro-lotes: tamanho máximo e espera máxima pelo preenchimento
+TAMANHO_MAXIMO_LOTE = 256
+ESPERA_MAXIMA_LOTE = 0.002
+
+# Subdiretório opcional com o índice IVF dos fatores de produtos
+SUBDIRETORIO_INDICE = 'indice'
+
+# Limites superiores (ms) dos baldes do histograma de latência
+LIMITES_LATENCIA_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+STATUS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class HistogramaLatencia:
+    """Histograma de latências com baldes fixos (em milissegundos)"""
+
+    def __init__(self, limites=LIMITES_LATENCIA_MS):
+        self.limites = list(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.soma_ms = 0.0
+
+    def registrar(self, segundos):
+        ms = segundos * 1000
+        self.contagens[bisect_left(self.limites, ms)] += 1
+        self.total += 1
+        self.soma_ms += ms
+
+    def percentil(self, p):
+        """Estimativa do percentil p (limite superior do balde que o contém)"""
+        if self.total == 0:
+            return None
+        alvo = p / 100 * self.total
+        acumulado = 0
+        for limite, contagem in zip(self.limites + [float('inf')], self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+    def resumo(self):
+        baldes = {f"<={limite}": c for limite, c in zip(self.limites, self.contagens)}
+        baldes[f">{self.limites[-1]}"] = self.contagens[-1]
+        return {
+            "total": self.total,
+            "media_ms": self.soma_ms / self.total if self.total else None,
+            "p50_ms": self.percentil(50),
+            "p90_ms": self.percentil(90),
+            "p99_ms": self.percentil(99),
+            "baldes_ms": baldes,
+        }
+
+
+class AgrupadorConsultas:
+    """Agrupa consultas concorrentes em micro-lotes para pontuação vetorizada
+
+    Cada consulta é a linha `i` de `vetores_consulta`; o lote inteiro é
+    pontuado contra os fatores de produtos com um único produto de matrizes
+    (ou, havendo índice IVF, com uma busca aproximada por consulta) fora do
+    loop de eventos, em uma thread do executor padrão.
+    """
+
+    def __init__(self, vetores_consulta, fatores_produtos, indice=None,
+                 tamanho_maximo=TAMANHO_MAXIMO_LOTE, espera_maxima=ESPERA_MAXIMA_LOTE):
+        self.vetores_consulta = vetores_consulta
+        self.fatores_produtos = fatores_produtos
+        self.indice = indice
+        self.tamanho_maximo = tamanho_maximo
+        self.espera_maxima = espera_maxima
+        self.tamanhos_lote = Counter()
+        self._fila = None
+        self._tarefa = None
+
+    def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.get_running_loop().create_task(self._processar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+
+    async def consultar(self, i, k, excluir=None):
+        """Enfileirar uma consulta e aguardar (índices, scores) do seu lote"""
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((i, k, excluir, futuro))
+        return await futuro
+
+    async def _processar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._fila.get()]
+            limite = loop.time() + self.espera_maxima
+            while len(lote) < self.tamanho_maximo:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            self.tamanhos_lote[len(lote)] += 1
+            try:
+                resultados = await loop.run_in_executor(None, self._pontuar, lote)
+            except Exception as e:
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            for (*_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    def _pontuar(self, lote):
+        """Pontuar um lote inteiro (executado fora do loop de eventos)"""
+        linhas = np.fromiter((i for i, *_ in lote), dtype=np.intp, count=len(lote))
+        consultas = np.asarray(self.vetores_consulta[linhas], dtype=np.float32)
+        k_lote = max(k for _, k, *_ in lote)
+
+        if self.indice is not None:
+            return [self.indice.buscar(consulta, k, excluir=excluir)
+                    for consulta, (_, k, excluir, _) in zip(consultas, lote)]
+
+        scores = consultas @ self.fatores_produtos.T
+        for linha, (_, _, excluir, _) in enumerate(lote):
+            if excluir:
+                scores[linha, np.asarray(excluir, dtype=np.intp)] = -np.inf
+
+        indices, valores = top_k(scores, k_lote)
+        return [(indices[linha, :k], valores[linha, :k]) for linha, (_, k, *_) in enumerate(lote)]
+
+
+class ServidorRecomendacoes:
+    """Servidor HTTP/1.1 mínimo sobre asyncio com rotas de recomendação"""
+
+    def __init__(self, modelo, indice=None, tamanho_maximo_lote=TAMANHO_MAXIMO_LOTE,
+                 espera_maxima_lote=ESPERA_MAXIMA_LOTE):
+        self.modelo = modelo
+        fatores_produtos = np.ascontiguousarray(modelo.fatores_produtos, dtype=np.float32)
+        self.recomendacoes = AgrupadorConsultas(modelo.fatores_usuarios, fatores_produtos, None,
+                                                tamanho_maximo_lote, espera_maxima_lote)
+        self.similares = AgrupadorConsultas(fatores_produtos, fatores_produtos, indice,
+                                            tamanho_maximo_lote, espera_maxima_lote)
+        self.latencias = {rota: HistogramaLatencia() for rota in ('recommendations', 'similar')}
+        self.inicio = time.time()
+
+    async def executar(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        self.recomendacoes.iniciar()
+        self.similares.iniciar()
+        servidor = await asyncio.start_server(self._atender, host, porta)
+        print(f"🚀 Servindo recomendações em http://{host}:{porta} "
+              f"({len(self.modelo.ids_usuarios)} usuários, {len(self.modelo.ids_produtos)} produtos)")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await self.recomendacoes.parar()
+            await self.similares.parar()
+
+    async def _atender(self, reader, writer):
+        """Atender requisições de uma conexão (com keep-alive)"""
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    await self._responder(writer, 400, {"erro": "requisição inválida"}, False)
+                    break
+
+                cabecalhos = {}
+                while True:
+                    cabecalho = await reader.readline()
+                    if cabecalho in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                tamanho_corpo = int(cabecalhos.get('content-length', 0) or 0)
+                if tamanho_corpo:
+                    await reader.readexactly(tamanho_corpo)
+
+                manter = cabecalhos.get('connection', '').lower() != 'close' and versao == 'HTTP/1.1'
+                status, corpo = await self._rotear(metodo, alvo)
+                await self._responder(writer, status, corpo, manter)
+                if not manter:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer, status, corpo, manter):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_HTTP.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode('latin-1') + dados
+        )
+        await writer.drain()
+
+    async def _rotear(self, metodo, alvo):
+        if metodo != 'GET':
+            return 405, {"erro": "apenas GET é suportado"}
+
+        url = urlsplit(alvo)
+        partes = [unquote(p) for p in url.path.strip('/').split('/')]
+        parametros = parse_qs(url.query)
+        try:
+            k = int(parametros.get('k', [K_PADRAO])[0])
+        except ValueError:
+            return 400, {"erro": "k deve ser inteiro"}
+        k = max(1, min(k, K_MAXIMO))
+
+        if partes == ['health']:
+            return 200, {"status": "ok"}
+        if partes == ['metrics']:
+            return 200, self.metricas()
+        if len(partes) == 2 and partes[0] == 'recommendations':
+            return await self._medir('recommendations', self._recomendar(partes[1], k))
+        if len(partes) == 2 and partes[0] == 'similar':
+            return await self._medir('similar', self._similares(partes[1], k))
+        return 404, {"erro": f"rota não encontrada: {url.path}"}
+
+    async def _medir(self, rota, corrotina):
+        inicio = time.perf_counter()
+        try:
+            return await corrotina
+        except Exception as e:
+            return 500, {"erro": str(e)}
+        finally:
+            self.latencias[rota].registrar(time.perf_counter() - inicio)
+
+    async def _recomendar(self, usuario_id, k):
+        i = self.modelo.indice_usuario(usuario_id)
+        if i is None:
+            return 404, {"erro": f"usuário desconhecido: {usuario_id}"}
+        indices, scores = await self.recomendacoes.consultar(i, k)
+        return 200, {"usuario_id": usuario_id, "recomendacoes": self._itens(indices, scores)}
+
+    async def _similares(self, produto_id, k):
+        j = self.modelo.indice_produto(produto_id)
+        if j is None:
+            return 404, {"erro": f"produto desconhecido: {produto_id}"}
+        indices, scores = await self.similares.consultar(j, k, excluir=[j])
+        return 200, {"produto_id": produto_id, "similares": self._itens(indices, scores)}
+
+    def _itens(self, indices, scores):
+        return [{"produto_id": str(self.modelo.ids_produtos[j]), "score": float(s)}
+                for j, s in zip(indices, scores) if np.isfinite(s)]
+
+    def metricas(self):
+        return {
+            "uptime_s": time.time() - self.inicio,
+            "latencia": {rota: h.resumo() for rota, h in self.latencias.items()},
+            "tamanho_lote": {
+                "recommendations": _resumo_lotes(self.recomendacoes.tamanhos_lote),
+                "similar": _resumo_lotes(self.similares.tamanhos_lote),
+            },
+        }
+
+
+def _resumo_lotes(tamanhos):
+    """Quantidade de lotes, tamanho médio e distribuição dos tamanhos"""
+    lotes = sum(tamanhos.values())
+    consultas = sum(t * c for t, c in tamanhos.items())
+    return {
+        "lotes": lotes,
+        "tamanho_medio": consultas / lotes if lotes else None,
+        "distribuicao": {str(t): c for t, c in sorted(tamanhos.items())},
+    }
+
+
+def carregar_artefatos(diretorio):
+    """Carregar o modelo ALS (mmap) e, se existir, o índice IVF em `diretorio/indice`"""
+    modelo = carregar_modelo(diretorio, mmap=True)
+    diretorio_indice = os.path.join(diretorio, SUBDIRETORIO_INDICE)
+    indice = IndiceIVF.carregar(diretorio_indice) if os.path.isdir(diretorio_indice) else None
+    return modelo, indice
+
+
+def criar_artefatos_sinteticos(diretorio, n_usuarios=100000, n_produtos=50000, fatores=32, seed=42):
+    """Gerar fatores aleatórios para testes de carga sem banco de dados"""
+    rng = np.random.default_rng(seed)
+    modelo = ModeloALS(
+        fatores_usuarios=rng.standard_normal((n_usuarios, fatores), dtype=np.float32),
+        fatores_produtos=rng.standard_normal((n_produtos, fatores), dtype=np.float32),
+        ids_usuarios=np.array([f"U{i:06d}" for i in range(1, n_usuarios + 1)]),
+        ids_produtos=np.array([f"P{j:06d}" for j in range(1, n_produtos + 1)])
+    )
+    salvar_modelo(diretorio, modelo, sintetico=True, seed=seed)
+    IndiceIVF.construir(modelo.fatores_produtos, seed=seed).salvar(
+        os.path.join(diretorio, SUBDIRETORIO_INDICE))
+    print(f"✅ Artefatos sintéticos salvos em '{diretorio}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP de recomendações")
+    parser.add_argument('diretorio', help="diretório com os artefatos do modelo ALS")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--lote', type=int, default=TAMANHO_MAXIMO_LOTE,
+                        help="tamanho máximo do micro-lote")
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_MAXIMA_LOTE * 1000,
+                        help="espera máxima para completar um micro-lote")
+    parser.add_argument('--sintetico', action='store_true',
+                        help="gerar artefatos aleatórios no diretório antes de servir")
+    args = parser.parse_args()
+
+    if args.sintetico:
+        criar_artefatos_sinteticos(args.diretorio)
+
+    print(f"📦 Carregando artefatos de '{args.diretorio}'...")
+    modelo, indice = carregar_artefatos(args.diretorio)
+    servidor = ServidorRecomendacoes(modelo, indice, args.lote, args.espera_ms / 1000)
+    try:
+        asyncio.run(servidor.executar(args.host, args.porta))
+    except KeyboardInterrupt:
+        print("\n👋 Servidor encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,15 @@ def setup_mongodb():
     """Configurar MongoDB com dados de exemplo"""
     try:
         from pymongo import MongoClient
+        from scripts.filtragem_colaborativa import (
+            carregar_interacoes, construir_matriz_interacoes, calcular_similares,
+            recomendar_por_similaridade, documentos_recomendacao
+        )
+        from scripts.armazem_recomendacoes import ArmazemRecomendacoes
+        from scripts.carga_mongodb import carregar_documentos
+        from scripts.indices_mongodb import provisionar_indices, relatorio_explain
+        from scripts.features_comportamento import materializar_features
+        from scripts.eventos_buckets import COLECAO_BUCKETS, gravar_comportamento
         
         print("🔌 Conectando ao MongoDB...")
         client = MongoClient('mongodb://localhost:27017')
@@ -26,6 +35,10 @@ def setup_mongodb():
         db.command('ping')
         print("✅ MongoDB conectado com sucesso!")
         
+        # Índices antes da carga: o índice único de produtos descarta duplicatas
+        print("🔍 Provisionando índices no MongoDB...")
+        provisionar_indices(db)
+        
         # Criar coleções e inserir dados de exemplo
         print("📊 Criando dados de exemplo no MongoDB...")
         
@@ -102,11 +115,10 @@ def setup_mongodb():
         ]
         
         # Inserir produtos
-        produtos_collection.insert_many(produtos_exemplo)
-        print(f"✅ {len(produtos_exemplo)} produtos inseridos")
+        carga = carregar_documentos(produtos_collection, produtos_exemplo, verbose=False)
+        print(f"✅ {carga.inseridos} produtos inseridos")
         
-        # Coleção: usuarios_comportamento
-        comportamento_collection = db['usuarios_comportamento']
+        # Coleções: usuarios_comportamento (sessões) e eventos_buckets (eventos)
         comportamento_exemplo = []
         
         # Gerar dados de comportamento para 20 usuários
@@ -153,53 +165,41 @@ def setup_mongodb():
             
             comportamento_exemplo.append(comportamento)
         
-        # Inserir comportamento
-        comportamento_collection.insert_many(comportamento_exemplo)
-        print(f"✅ {len(comportamento_exemplo)} registros de comportamento inseridos")
+        # Inserir comportamento: a sessão sem o array `eventos` e cada
+        # evento no bucket corrente do usuário (buckets refeitos a cada setup)
+        total_sessoes, total_eventos = gravar_comportamento(db, comportamento_exemplo, recriar=True)
+        print(f"✅ {total_sessoes} registros de comportamento inseridos")
+        print(f"✅ {total_eventos} eventos gravados em buckets")
         
-        # Coleção: recomendacoes
-        recomendacoes_collection = db['recomendacoes']
-        recomendacoes_exemplo = []
+        # Coleção: features_comportamento (agregação materializada via $merge)
+        total_features = materializar_features(db)
+        print(f"✅ Features de comportamento materializadas para {total_features} usuários")
         
-        for i in range(1, 11):  # Recomendações para 10 usuários
-            usuario_id = f"U{i:03d}"
-            recomendacoes = []
-            
-            # Gerar recomendações aleatórias
-            produtos_ids = ["P001", "P002", "P003"]
-            random.shuffle(produtos_ids)
-            
-            for j, produto_id in enumerate(produtos_ids[:3]):
-                score = random.uniform(0.6, 0.95)
-                motivos = random.sample(["usuarios_similares", "produtos_similares", "categoria_preferida", "tendencia"], 1)
-                
-                recomendacao = {
-                    "produto_id": produto_id,
-                    "score": score,
-                    "motivo": motivos[0],
-                    "timestamp": datetime.now()
-                }
-                recomendacoes.append(recomendacao)
-            
-            doc_recomendacao = {
-                "usuario_id": usuario_id,
-                "algoritmo": "collaborative_filtering",
-                "versao": "v2.1",
-                "recomendacoes": recomendacoes,
-                "contexto": {
-                    "pagina": "home",
-                    "categoria_filtro": "eletrônicos",
-                    "preco_maximo": 10000.00
-                },
-                "data_geracao": datetime.now(),
-                "valido_ate": datetime.now()
+        # Coleção: recomendacoes
+        # Filtragem colaborativa item-item calculada a partir dos eventos inseridos
+        armazem = ArmazemRecomendacoes(db)
+        interacoes = carregar_interacoes(db[COLECAO_BUCKETS])
+        matriz, ids_usuarios, ids_produtos = construir_matriz_interacoes(interacoes)
+        similares = calcular_similares(matriz)
+        
+        # O catálogo de exemplo tem só 3 produtos: manter os já visualizados
+        indices, scores = recomendar_por_similaridade(matriz, similares, k=3, excluir_vistos=False)
+        recomendacoes_exemplo = documentos_recomendacao(ids_usuarios, ids_produtos, indices, scores)
+        
+        for doc_recomendacao in recomendacoes_exemplo:
+            doc_recomendacao["contexto"] = {
+                "pagina": "home",
+                "categoria_filtro": "eletrônicos",
+                "preco_maximo": 10000.00
             }
-            
-            recomendacoes_exemplo.append(doc_recomendacao)
         
-        # Inserir recomendações
-        recomendacoes_collection.insert_many(recomendacoes_exemplo)
-        print(f"✅ {len(recomendacoes_exemplo)} recomendações inseridas")
+        # Gravar recomendações (um documento por usuário, expira via TTL)
+        total_gravadas = armazem.gravar_lote(recomendacoes_exemplo, versao="v2.1")
+        print(f"✅ {total_gravadas} recomendações inseridas")
+        
+        # Conferir os planos das consultas conhecidas
+        print("🔍 Planos de execução das consultas conhecidas:")
+        relatorio_explain(db)
         
         client.close()
         print("🎉 MongoDB configurado com sucesso!")
@@ -212,272 +212,214 @@ def setup_mongodb():
 def setup_postgresql():
     """Configurar PostgreSQL com dados de exemplo"""
     try:
-        import psycopg2
         from psycopg2.extras import RealDictCursor
+        import pandas as pd
+        from scripts.carga_postgresql import (
+            copiar_com_conflito, mapa_ids, semear_pedidos, criar_indices
+        )
+        from scripts.consultas_postgresql import criar_view_features
+        from scripts.conexao_postgresql import obter_pool
         
         print("🔌 Conectando ao PostgreSQL...")
-        conn = psycopg2.connect(
-            host='localhost',
-            database='ecommerce_demo',
-            user='postgres',
-            password='postgres'
-        )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        print("✅ PostgreSQL conectado com sucesso!")
-        
-        # Criar tabelas
-        print("📊 Criando tabelas no PostgreSQL...")
-        
-        # Tabela: usuarios
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id SERIAL PRIMARY KEY,
-                usuario_id VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                nome VARCHAR(255) NOT NULL,
-                sobrenome VARCHAR(255),
-                data_nascimento DATE,
-                genero VARCHAR(10),
-                telefone VARCHAR(20),
-                cpf VARCHAR(14) UNIQUE,
-                endereco JSONB,
-                data_cadastro TIMESTAMP DEFAULT NOW(),
-                ultimo_login TIMESTAMP,
-                ativo BOOLEAN DEFAULT TRUE,
-                segmento VARCHAR(50),
-                valor_total_compras DECIMAL(12,2) DEFAULT 0.00
-            )
-        """)
-        
-        # Tabela: categorias
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS categorias (
-                id SERIAL PRIMARY KEY,
-                categoria_id VARCHAR(50) UNIQUE NOT NULL,
-                nome VARCHAR(255) NOT NULL,
-                descricao TEXT,
-                categoria_pai_id INTEGER REFERENCES categorias(id),
-                nivel INTEGER NOT NULL DEFAULT 1,
-                ordem INTEGER DEFAULT 0,
-                ativo BOOLEAN DEFAULT TRUE,
-                data_criacao TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Tabela: produtos_relacional
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS produtos_relacional (
-                id SERIAL PRIMARY KEY,
-                produto_id VARCHAR(50) UNIQUE NOT NULL,
-                nome VARCHAR(255) NOT NULL,
-                categoria_id INTEGER REFERENCES categorias(id),
-                marca VARCHAR(100),
-                preco DECIMAL(10,2) NOT NULL,
-                preco_original DECIMAL(10,2),
-                moeda VARCHAR(3) DEFAULT 'BRL',
-                descricao TEXT,
-                descricao_curta VARCHAR(500),
-                sku VARCHAR(100) UNIQUE,
-                peso DECIMAL(8,3),
-                dimensoes JSONB,
-                estoque INTEGER DEFAULT 0,
-                estoque_minimo INTEGER DEFAULT 5,
-                ativo BOOLEAN DEFAULT TRUE,
-                destaque BOOLEAN DEFAULT FALSE,
-                data_criacao TIMESTAMP DEFAULT NOW(),
-                data_atualizacao TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Tabela: pedidos
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pedidos (
-                id SERIAL PRIMARY KEY,
-                pedido_id VARCHAR(50) UNIQUE NOT NULL,
-                usuario_id INTEGER REFERENCES usuarios(id),
-                status VARCHAR(50) NOT NULL DEFAULT 'pendente',
-                valor_total DECIMAL(12,2) NOT NULL,
-                valor_desconto DECIMAL(12,2) DEFAULT 0.00,
-                valor_frete DECIMAL(10,2) DEFAULT 0.00,
-                metodo_pagamento VARCHAR(50),
-                endereco_entrega JSONB,
-                observacoes TEXT,
-                data_pedido TIMESTAMP DEFAULT NOW(),
-                data_pagamento TIMESTAMP,
-                data_entrega TIMESTAMP,
-                data_cancelamento TIMESTAMP,
-                motivo_cancelamento TEXT
-            )
-        """)
-        
-        # Tabela: itens_pedido
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS itens_pedido (
-                id SERIAL PRIMARY KEY,
-                pedido_id INTEGER REFERENCES pedidos(id),
-                produto_id VARCHAR(50) NOT NULL,
-                nome_produto VARCHAR(255) NOT NULL,
-                preco_unitario DECIMAL(10,2) NOT NULL,
-                quantidade INTEGER NOT NULL,
-                valor_total DECIMAL(12,2) NOT NULL,
-                desconto DECIMAL(10,2) DEFAULT 0.00
-            )
-        """)
-        
-        # Tabela: carrinho_compras
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS carrinho_compras (
-                id SERIAL PRIMARY KEY,
-                usuario_id INTEGER REFERENCES usuarios(id),
-                produto_id VARCHAR(50) NOT NULL,
-                quantidade INTEGER NOT NULL DEFAULT 1,
-                preco_unitario DECIMAL(10,2) NOT NULL,
-                data_adicao TIMESTAMP DEFAULT NOW(),
-                data_atualizacao TIMESTAMP DEFAULT NOW(),
-                UNIQUE(usuario_id, produto_id)
-            )
-        """)
-        
-        conn.commit()
-        print("✅ Tabelas criadas com sucesso!")
-        
-        # Inserir dados de exemplo
-        print("📊 Inserindo dados de exemplo...")
-        
-        # Inserir categorias
-        cursor.execute("""
-            INSERT INTO categorias (categoria_id, nome, descricao, nivel) 
-            VALUES ('CAT001', 'Eletrônicos', 'Produtos eletrônicos em geral', 1)
-            ON CONFLICT (categoria_id) DO NOTHING
-        """)
-        
-        cursor.execute("""
-            INSERT INTO categorias (categoria_id, nome, categoria_pai_id, nivel) 
-            VALUES ('CAT002', 'Smartphones', (SELECT id FROM categorias WHERE categoria_id = 'CAT001'), 2)
-            ON CONFLICT (categoria_id) DO NOTHING
-        """)
-        
-        cursor.execute("""
-            INSERT INTO categorias (categoria_id, nome, categoria_pai_id, nivel) 
-            VALUES ('CAT003', 'Notebooks', (SELECT id FROM categorias WHERE categoria_id = 'CAT001'), 2)
-            ON CONFLICT (categoria_id) DO NOTHING
-        """)
-        
-        # Inserir usuários
-        usuarios_exemplo = []
-        for i in range(1, 21):
-            usuario_id = f"U{i:03d}"
-            email = f"usuario{i}@exemplo.com"
-            nome = f"Usuário {i}"
-            
-            # Gerar dados aleatórios
-            import random
-            segmentos = ['high_value', 'medium_value', 'low_value', 'new_user']
-            segmento = random.choice(segmentos)
-            
-            valor_compras = random.uniform(0, 10000)
-            
-            cursor.execute("""
-                INSERT INTO usuarios (usuario_id, email, nome, segmento, valor_total_compras, endereco)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (usuario_id) DO NOTHING
-            """, (
-                usuario_id,
-                email,
-                nome,
-                segmento,
-                valor_compras,
-                json.dumps({
-                    "rua": f"Rua {i}, {random.randint(1, 999)}",
-                    "cidade": random.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte"]),
-                    "estado": random.choice(["SP", "RJ", "MG"]),
-                    "cep": f"{random.randint(10000, 99999)}-{random.randint(100, 999)}"
-                })
-            ))
+        # Conexão do pool devolvida (com commit ou rollback) ao sair do bloco;
+        # a carga inicial não fica sujeita ao statement_timeout do pool
+        with obter_pool().conexao(tempo_limite_ms=0) as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        # Inserir produtos
-        produtos_exemplo = [
-            ('P001', 'Smartphone Galaxy S24', 'CAT002', 'Samsung', 2999.99, 3299.99, 'Smartphone premium', 'SAM-GAL-S24-128', 168.0, json.dumps({"largura": 70.6, "altura": 147.0, "profundidade": 7.6}), 45),
-            ('P002', 'iPhone 15 Pro', 'CAT002', 'Apple', 8999.99, 9999.99, 'Smartphone premium Apple', 'APP-IPH-15P-128', 187.0, json.dumps({"largura": 71.6, "altura": 146.6, "profundidade": 8.25}), 30),
-            ('P003', 'Notebook Dell XPS 13', 'CAT003', 'Dell', 5999.99, 6999.99, 'Notebook premium', 'DEL-XPS-13-512', 1270.0, json.dumps({"largura": 295.7, "altura": 199.0, "profundidade": 14.8}), 20)
-        ]
+            print("✅ PostgreSQL conectado com sucesso!")
         
-        for produto in produtos_exemplo:
+            # Criar tabelas
+            print("📊 Criando tabelas no PostgreSQL...")
+        
+            # Tabela: usuarios
             cursor.execute("""
-                INSERT INTO produtos_relacional (produto_id, nome, categoria_id, marca, preco, preco_original, descricao, sku, peso, dimensoes, estoque)
-                VALUES (%s, %s, (SELECT id FROM categorias WHERE categoria_id = %s), %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (produto_id) DO NOTHING
-            """, produto)
-        
-        # Inserir pedidos de exemplo
-        import random
-        for i in range(1, 16):  # 15 pedidos
-            usuario_id = random.randint(1, 20)
-            valor_total = random.uniform(100, 5000)
-            status = random.choice(['concluido', 'pendente', 'cancelado'])
-            
+                CREATE TABLE IF NOT EXISTS usuarios (
+                    id SERIAL PRIMARY KEY,
+                    usuario_id VARCHAR(50) UNIQUE NOT NULL,
+                    email VARCHAR(255) UNIQUE NOT NULL,
+                    nome VARCHAR(255) NOT NULL,
+                    sobrenome VARCHAR(255),
+                    data_nascimento DATE,
+                    genero VARCHAR(10),
+                    telefone VARCHAR(20),
+                    cpf VARCHAR(14) UNIQUE,
+                    endereco JSONB,
+                    data_cadastro TIMESTAMP DEFAULT NOW(),
+                    ultimo_login TIMESTAMP,
+                    ativo BOOLEAN DEFAULT TRUE,
+                    segmento VARCHAR(50),
+                    valor_total_compras DECIMAL(12,2) DEFAULT 0.00
+                )
+            """)
+        
+            # Tabela: categorias
             cursor.execute("""
-                INSERT INTO pedidos (pedido_id, usuario_id, status, valor_total, metodo_pagamento, endereco_entrega)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                f'PED{i:03d}',
-                usuario_id,
-                status,
-                valor_total,
-                random.choice(['cartao_credito', 'pix', 'boleto']),
-                json.dumps({
-                    "rua": f"Rua {i}, {random.randint(1, 999)}",
-                    "cidade": random.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte"]),
-                    "estado": random.choice(["SP", "RJ", "MG"]),
-                    "cep": f"{random.randint(10000, 99999)}-{random.randint(100, 999)}"
-                })
-            ))
-            
-            # Inserir itens do pedido
-            produto_id = random.choice(['P001', 'P002', 'P003'])
-            quantidade = random.randint(1, 3)
-            preco_unitario = random.uniform(100, 3000)
-            valor_total_item = preco_unitario * quantidade
-            
+                CREATE TABLE IF NOT EXISTS categorias (
+                    id SERIAL PRIMARY KEY,
+                    categoria_id VARCHAR(50) UNIQUE NOT NULL,
+                    nome VARCHAR(255) NOT NULL,
+                    descricao TEXT,
+                    categoria_pai_id INTEGER REFERENCES categorias(id),
+                    nivel INTEGER NOT NULL DEFAULT 1,
+                    ordem INTEGER DEFAULT 0,
+                    ativo BOOLEAN DEFAULT TRUE,
+                    data_criacao TIMESTAMP DEFAULT NOW()
+                )
+            """)
+        
+            # Tabela: produtos_relacional
             cursor.execute("""
-                INSERT INTO itens_pedido (pedido_id, produto_id, nome_produto, preco_unitario, quantidade, valor_total)
-                VALUES ((SELECT id FROM pedidos WHERE pedido_id = %s), %s, %s, %s, %s, %s)
-            """, (
-                f'PED{i:03d}',
-                produto_id,
-                f'Produto {produto_id}',
-                preco_unitario,
-                quantidade,
-                valor_total_item
-            ))
-        
-        conn.commit()
-        print("✅ Dados de exemplo inseridos com sucesso!")
-        
-        # Criar índices para performance
-        print("🔍 Criando índices para performance...")
-        
-        indices = [
-            "CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)",
-            "CREATE INDEX IF NOT EXISTS idx_usuarios_usuario_id ON usuarios(usuario_id)",
-            "CREATE INDEX IF NOT EXISTS idx_usuarios_segmento ON usuarios(segmento)",
-            "CREATE INDEX IF NOT EXISTS idx_pedidos_usuario ON pedidos(usuario_id)",
-            "CREATE INDEX IF NOT EXISTS idx_pedidos_status ON pedidos(status)",
-            "CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos(data_pedido)",
-            "CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos_relacional(categoria_id)",
-            "CREATE INDEX IF NOT EXISTS idx_produtos_marca ON produtos_relacional(marca)",
-            "CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos_relacional(preco)"
-        ]
+                CREATE TABLE IF NOT EXISTS produtos_relacional (
+                    id SERIAL PRIMARY KEY,
+                    produto_id VARCHAR(50) UNIQUE NOT NULL,
+                    nome VARCHAR(255) NOT NULL,
+                    categoria_id INTEGER REFERENCES categorias(id),
+                    marca VARCHAR(100),
+                    preco DECIMAL(10,2) NOT NULL,
+                    preco_original DECIMAL(10,2),
+                    moeda VARCHAR(3) DEFAULT 'BRL',
+                    descricao TEXT,
+                    descricao_curta VARCHAR(500),
+                    sku VARCHAR(100) UNIQUE,
+                    peso DECIMAL(8,3),
+                    dimensoes JSONB,
+                    estoque INTEGER DEFAULT 0,
+                    estoque_minimo INTEGER DEFAULT 5,
+                    ativo BOOLEAN DEFAULT TRUE,
+                    destaque BOOLEAN DEFAULT FALSE,
+                    data_criacao TIMESTAMP DEFAULT NOW(),
+                    data_atualizacao TIMESTAMP DEFAULT NOW()
+                )
+            """)
+        
+            # Tabela: pedidos
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pedidos (
+                    id SERIAL PRIMARY KEY,
+                    pedido_id VARCHAR(50) UNIQUE NOT NULL,
+                    usuario_id INTEGER REFERENCES usuarios(id),
+                    status VARCHAR(50) NOT NULL DEFAULT 'pendente',
+                    valor_total DECIMAL(12,2) NOT NULL,
+                    valor_desconto DECIMAL(12,2) DEFAULT 0.00,
+                    valor_frete DECIMAL(10,2) DEFAULT 0.00,
+                    metodo_pagamento VARCHAR(50),
+                    endereco_entrega JSONB,
+                    observacoes TEXT,
+                    data_pedido TIMESTAMP DEFAULT NOW(),
+                    data_pagamento TIMESTAMP,
+                    data_entrega TIMESTAMP,
+                    data_cancelamento TIMESTAMP,
+                    motivo_cancelamento TEXT
+                )
+            """)
+        
+            # Tabela: itens_pedido
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS itens_pedido (
+                    id SERIAL PRIMARY KEY,
+                    pedido_id INTEGER REFERENCES pedidos(id),
+                    produto_id VARCHAR(50) NOT NULL,
+                    nome_produto VARCHAR(255) NOT NULL,
+                    preco_unitario DECIMAL(10,2) NOT NULL,
+                    quantidade INTEGER NOT NULL,
+                    valor_total DECIMAL(12,2) NOT NULL,
+                    desconto DECIMAL(10,2) DEFAULT 0.00
+                )
+            """)
+        
+            # Tabela: carrinho_compras
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS carrinho_compras (
+                    id SERIAL PRIMARY KEY,
+                    usuario_id INTEGER REFERENCES usuarios(id),
+                    produto_id VARCHAR(50) NOT NULL,
+                    quantidade INTEGER NOT NULL DEFAULT 1,
+                    preco_unitario DECIMAL(10,2) NOT NULL,
+                    data_adicao TIMESTAMP DEFAULT NOW(),
+                    data_atualizacao TIMESTAMP DEFAULT NOW(),
+                    UNIQUE(usuario_id, produto_id)
+                )
+            """)
+        
+            conn.commit()
+            print("✅ Tabelas criadas com sucesso!")
+        
+            # Inserir dados de exemplo
+            print("📊 Inserindo dados de exemplo...")
+        
+            # Inserir categorias
+            cursor.execute("""
+                INSERT INTO categorias (categoria_id, nome, descricao, nivel) 
+                VALUES ('CAT001', 'Eletrônicos', 'Produtos eletrônicos em geral', 1)
+                ON CONFLICT (categoria_id) DO NOTHING
+            """)
+        
+            cursor.execute("""
+                INSERT INTO categorias (categoria_id, nome, categoria_pai_id, nivel) 
+                VALUES ('CAT002', 'Smartphones', (SELECT id FROM categorias WHERE categoria_id = 'CAT001'), 2)
+                ON CONFLICT (categoria_id) DO NOTHING
+            """)
+        
+            cursor.execute("""
+                INSERT INTO categorias (categoria_id, nome, categoria_pai_id, nivel) 
+                VALUES ('CAT003', 'Notebooks', (SELECT id FROM categorias WHERE categoria_id = 'CAT001'), 2)
+                ON CONFLICT (categoria_id) DO NOTHING
+            """)
+        
+            # Inserir usuários (COPY para tabela temporária + ON CONFLICT DO NOTHING)
+            import random
+            usuarios_exemplo = []
+            for i in range(1, 21):
+                usuarios_exemplo.append({
+                    "usuario_id": f"U{i:03d}",
+                    "email": f"usuario{i}@exemplo.com",
+                    "nome": f"Usuário {i}",
+                    "segmento": random.choice(['high_value', 'medium_value', 'low_value', 'new_user']),
+                    "valor_total_compras": round(random.uniform(0, 10000), 2),
+                    "endereco": json.dumps({
+                        "rua": f"Rua {i}, {random.randint(1, 999)}",
+                        "cidade": random.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte"]),
+                        "estado": random.choice(["SP", "RJ", "MG"]),
+                        "cep": f"{random.randint(10000, 99999)}-{random.randint(100, 999)}"
+                    }, ensure_ascii=False)
+                })
+        
+            copiar_com_conflito(cursor, 'usuarios', pd.DataFrame(usuarios_exemplo), 'usuario_id')
+        
+            # Inserir produtos (categoria resolvida no cliente)
+            ids_categorias = mapa_ids(cursor, 'categorias', 'categoria_id')
+            produtos_exemplo = pd.DataFrame([
+                ('P001', 'Smartphone Galaxy S24', 'CAT002', 'Samsung', 2999.99, 3299.99, 'Smartphone premium', 'SAM-GAL-S24-128', 168.0, json.dumps({"largura": 70.6, "altura": 147.0, "profundidade": 7.6}), 45),
+                ('P002', 'iPhone 15 Pro', 'CAT002', 'Apple', 8999.99, 9999.99, 'Smartphone premium Apple', 'APP-IPH-15P-128', 187.0, json.dumps({"largura": 71.6, "altura": 146.6, "profundidade": 8.25}), 30),
+                ('P003', 'Notebook Dell XPS 13', 'CAT003', 'Dell', 5999.99, 6999.99, 'Notebook premium', 'DEL-XPS-13-512', 1270.0, json.dumps({"largura": 295.7, "altura": 199.0, "profundidade": 14.8}), 20)
+            ], columns=['produto_id', 'nome', 'categoria_id', 'marca', 'preco', 'preco_original',
+                        'descricao', 'sku', 'peso', 'dimensoes', 'estoque'])
+            produtos_exemplo['categoria_id'] = produtos_exemplo['categoria_id'].map(ids_categorias)
+        
+            copiar_com_conflito(cursor, 'produtos_relacional', produtos_exemplo, 'produto_id')
+        
+            # Inserir pedidos de exemplo e seus itens (ids de pedidos reservados no cliente)
+            ids_usuarios = list(mapa_ids(cursor, 'usuarios', 'usuario_id').values())
+            total_pedidos, total_itens = semear_pedidos(
+                cursor, ids_usuarios, list(produtos_exemplo['produto_id']), n_pedidos=15
+            )
+        
+            conn.commit()
+            print(f"✅ Dados de exemplo inseridos com sucesso! ({total_pedidos} pedidos, {total_itens} itens)")
+        
+            # Criar índices para performance, depois da carga
+            print("🔍 Criando índices para performance...")
+            criar_indices(cursor)
         
-        for indice in indices:
-            cursor.execute(indice)
+            conn.commit()
+            print("✅ Índices criados com sucesso!")
         
-        conn.commit()
-        print("✅ Índices criados com sucesso!")
+            # View materializada com as features por usuário (lida pelas análises)
+            criada = criar_view_features(cursor)
+            conn.commit()
+            print(f"✅ View mv_usuario_features {'criada' if criada else 'atualizada'}")
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         print("🎉 PostgreSQL configurado com sucesso!")
         return True
         
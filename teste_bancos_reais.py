@@ -5,8 +5,8 @@ MongoDB Atlas + PostgreSQL
 """
 
 from pymongo import MongoClient
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from scripts.conexao_postgresql import obter_pool
 import pandas as pd
 import json
 from datetime import datetime
@@ -86,64 +86,60 @@ def testar_postgresql():
     print("\n🔌 Testando PostgreSQL...")
     
     try:
-        conn = psycopg2.connect(**POSTGRES_CONFIG)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        # Conexão do pool compartilhado: commit ao sair do bloco, rollback em erro
+        with obter_pool(**POSTGRES_CONFIG).cursor(cursor_factory=RealDictCursor) as cursor:
+            # Testar conexão
+            cursor.execute("SELECT version();")
+            version = cursor.fetchone()
+            print("✅ PostgreSQL conectado!")
+            print(f"📊 Versão: {version['version'][:50]}...")
+        
+            # Criar tabela de teste
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS usuarios_teste (
+                    id SERIAL PRIMARY KEY,
+                    usuario_id VARCHAR(50) UNIQUE NOT NULL,
+                    nome VARCHAR(255) NOT NULL,
+                    email VARCHAR(255) UNIQUE NOT NULL,
+                    segmento VARCHAR(50),
+                    valor_total_compras DECIMAL(12,2) DEFAULT 0.00,
+                    data_cadastro TIMESTAMP DEFAULT NOW()
+                )
+            """)
+        
+            # Limpar dados existentes
+            cursor.execute("DELETE FROM usuarios_teste")
+        
+            # Inserir usuário de teste
+            cursor.execute("""
+                INSERT INTO usuarios_teste (usuario_id, nome, email, segmento, valor_total_compras)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                'U001',
+                'João Silva',
+                'joao@exemplo.com',
+                'high_value',
+                5000.00
+            ))
+        
+            user_id = cursor.fetchone()['id']
+            print(f"✅ Usuário inserido com ID: {user_id}")
+        
+            # Buscar usuário
+            cursor.execute("SELECT * FROM usuarios_teste WHERE id = %s", (user_id,))
+            usuario_encontrado = cursor.fetchone()
+            if usuario_encontrado:
+                print(f"✅ Usuário encontrado: {usuario_encontrado['nome']}")
+                print(f"   Email: {usuario_encontrado['email']}")
+                print(f"   Segmento: {usuario_encontrado['segmento']}")
+                print(f"   Valor: R$ {usuario_encontrado['valor_total_compras']}")
+        
+            # Contar usuários
+            cursor.execute("SELECT COUNT(*) as total FROM usuarios_teste")
+            total_usuarios = cursor.fetchone()['total']
+            print(f"📊 Total de usuários no PostgreSQL: {total_usuarios}")
         
-        # Testar conexão
-        cursor.execute("SELECT version();")
-        version = cursor.fetchone()
-        print("✅ PostgreSQL conectado!")
-        print(f"📊 Versão: {version[0][:50]}...")
-        
-        # Criar tabela de teste
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios_teste (
-                id SERIAL PRIMARY KEY,
-                usuario_id VARCHAR(50) UNIQUE NOT NULL,
-                nome VARCHAR(255) NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                segmento VARCHAR(50),
-                valor_total_compras DECIMAL(12,2) DEFAULT 0.00,
-                data_cadastro TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Limpar dados existentes
-        cursor.execute("DELETE FROM usuarios_teste")
-        
-        # Inserir usuário de teste
-        cursor.execute("""
-            INSERT INTO usuarios_teste (usuario_id, nome, email, segmento, valor_total_compras)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            'U001',
-            'João Silva',
-            'joao@exemplo.com',
-            'high_value',
-            5000.00
-        ))
-        
-        user_id = cursor.fetchone()['id']
-        print(f"✅ Usuário inserido com ID: {user_id}")
-        
-        # Buscar usuário
-        cursor.execute("SELECT * FROM usuarios_teste WHERE id = %s", (user_id,))
-        usuario_encontrado = cursor.fetchone()
-        if usuario_encontrado:
-            print(f"✅ Usuário encontrado: {usuario_encontrado['nome']}")
-            print(f"   Email: {usuario_encontrado['email']}")
-            print(f"   Segmento: {usuario_encontrado['segmento']}")
-            print(f"   Valor: R$ {usuario_encontrado['valor_total_compras']}")
-        
-        # Contar usuários
-        cursor.execute("SELECT COUNT(*) as total FROM usuarios_teste")
-        total_usuarios = cursor.fetchone()['total']
-        print(f"📊 Total de usuários no PostgreSQL: {total_usuarios}")
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
         return True
         
     except Exception as e:
@@ -0,0 +1,48 @@
+"""
+Testes do cache de estatísticas da população: o snapshot precisa mudar
+sempre que os dados mudam
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from scripts.estatisticas_populacao import limpar_cache_estatisticas, obter_estatisticas
+from scripts.gerador_dados import gerar_dados
+
+
+@pytest.fixture
+def dados():
+    limpar_cache_estatisticas()
+    usuarios_df, comportamento_df, _ = gerar_dados(200, 5, seed=7)
+    yield usuarios_df, comportamento_df
+    limpar_cache_estatisticas()
+
+
+def test_subconjuntos_com_mesmo_tamanho_tem_snapshots_distintos(dados):
+    usuarios_df, comportamento_df = dados
+    inicio = obter_estatisticas(usuarios_df.head(50), comportamento_df.head(50))
+    fim = obter_estatisticas(usuarios_df.tail(50), comportamento_df.tail(50))
+
+    assert fim.versao != inicio.versao
+    assert fim.media_eventos == pytest.approx(comportamento_df.tail(50)['total_eventos'].mean())
+
+
+def test_alteracao_no_proprio_dataframe_invalida_o_snapshot(dados):
+    usuarios_df, comportamento_df = dados
+    antes = obter_estatisticas(usuarios_df, comportamento_df)
+    comportamento_df['total_eventos'] *= 10
+    depois = obter_estatisticas(usuarios_df, comportamento_df)
+
+    assert depois.versao != antes.versao
+    assert depois.media_eventos == pytest.approx(antes.media_eventos * 10)
+
+
+def test_mesmos_dados_reaproveitam_o_snapshot(dados):
+    usuarios_df, comportamento_df = dados
+    primeiro = obter_estatisticas(usuarios_df, comportamento_df)
+
+    assert obter_estatisticas(usuarios_df.copy(), comportamento_df.copy()) is primeiro